@@ -1,11 +1,13 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+from laliga import profiling
+from laliga.prefetch import prefetch
 
 st.set_page_config(
     page_title="LaLiga Teams Analysis", layout="wide", initial_sidebar_state="expanded"
 )
 
+profiling.start_rerun("Home")
+
 st.title("LaLiga Teams Analysis Dashboard")
 
 st.markdown(
@@ -20,4 +22,11 @@ This dashboard provides a professional, data-driven analysis of LaLiga football
 - **Predictions:** Access machine learning-based forecasts and legacy prediction tools.
 - **Modelling Insights:** Compare investment and sporting models, and simulate match outcomes.
 """
-)
\ No newline at end of file
+)
+
+# Load every page's imports, datasets and models in the background once the
+# landing page is drawn, so the first visit to each page is mostly cache hits.
+profiling.stage("prefetch")
+prefetch()
+
+profiling.finish_rerun()
@@ -0,0 +1 @@
+"""Shared building blocks for the LaLiga dashboard and analysis pipeline."""
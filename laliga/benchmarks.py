@@ -0,0 +1,309 @@
+"""Benchmark suite for the dashboard and build hot paths.
+
+Every case is timed on synthetic data scaled from the real schemas (see
+``laliga.synthetic``): ``matches_5y``, ``matches_detailed`` and
+``players_clean`` for the ``analysis.ipynb`` and ``squadAnalysis.ipynb``
+aggregation steps, and the per-team source tables for the feature merge and
+scoring that ``4_Predictions.py`` and ``5_Modelling_Insights.py`` do on each
+run. Scale-independent cases (cold page loads, single-row ``predict``) run
+once at scale 1.
+
+Each case reports the best of ``--repeat`` wall times and, from one extra
+run under ``tracemalloc``, its peak Python/NumPy allocation. Results are
+written as JSON keyed ``<case>@<scale>`` together with the commit and
+library versions, and ``--compare`` flags cases that got slower (or hungrier)
+than a previous result file by more than ``--threshold``.
+
+Usage::
+
+    python -m laliga.benchmarks                          # scales 10 100 1000
+    python -m laliga.benchmarks --scales 10 --repeat 5 --out before.json
+    python -m laliga.benchmarks --compare before.json --threshold 0.2
+"""
+
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from laliga import features, forest, metrics, squad
+from laliga.data import ROOT, load
+from laliga.models import MODELS, MODELS_DIR, get_model
+from laliga.synthetic import scale_matches, scale_matches_detailed, scale_players, scale_teams
+
+RESULTS_DIR = ROOT / "benchmarks"
+DEFAULT_SCALES = [10, 100, 1000]
+# Differences below this many seconds are treated as noise by --compare.
+MIN_SECONDS = 0.002
+
+MATCH_DTYPES = {"HomeTeam": "category", "AwayTeam": "category", "FTR": "category"}
+DETAILED_COLUMNS = ["team", "opponent", "gf", "ga", "xg", "xga"]
+
+
+class Inputs:
+    """Scaled input tables for one scale, built on first use."""
+
+    def __init__(self, scale, seed=0):
+        self.scale = scale
+        self.seed = seed
+        self._tables = {}
+
+    def _get(self, key, build):
+        if key not in self._tables:
+            self._tables[key] = build()
+        return self._tables[key]
+
+    @property
+    def matches(self):
+        return self._get(
+            "matches",
+            lambda: scale_matches(load("matches_5y", dtype=MATCH_DTYPES), self.scale, self.seed),
+        )
+
+    @property
+    def detailed(self):
+        return self._get(
+            "detailed",
+            lambda: scale_matches_detailed(
+                load("matches_detailed", usecols=DETAILED_COLUMNS, dtype={"team": "category"}),
+                self.scale,
+                self.seed,
+            ),
+        )
+
+    @property
+    def players(self):
+        return self._get(
+            "players",
+            lambda: scale_players(squad.read_players(), self.scale, self.seed),
+        )
+
+    @property
+    def sources(self):
+        return self._get(
+            "sources",
+            lambda: {name: scale_teams(load(name), self.scale) for name in features.SOURCES},
+        )
+
+
+def _analysis_cases(data):
+    m = data.matches
+    view = metrics.team_view(m)
+    positions = metrics.league_positions(m, view)
+    performance = metrics.performance_metrics(m, positions, view)
+    xg = metrics.xg_metrics(data.detailed)
+    home_away = metrics.home_away_metrics(m, view)
+    _, h2h = metrics.h2h_metrics(m, positions, view=view)
+    return {
+        "analysis.team_view": lambda: metrics.team_view(m),
+        "analysis.league_positions": lambda: metrics.league_positions(m, view),
+        "analysis.performance_metrics": lambda: metrics.performance_metrics(m, positions, view),
+        "analysis.xg_metrics": lambda: metrics.xg_metrics(data.detailed),
+        "analysis.home_away_metrics": lambda: metrics.home_away_metrics(m, view),
+        "analysis.h2h_metrics": lambda: metrics.h2h_metrics(m, positions, view=view),
+        "analysis.team_performance_summary": lambda: metrics.team_performance_summary(
+            performance, xg, home_away, h2h
+        ),
+        "analysis.compute_all": lambda: metrics.compute_all(m, data.detailed),
+    }
+
+
+def _squad_cases(data):
+    players = data.players
+    partials = squad.player_partials(players)
+    totals = squad.team_totals(partials)
+    quality = squad.squad_quality_metrics(totals)
+    depth = squad.squad_depth_metrics(totals)
+    ages = squad.age_profile(totals)
+    return {
+        "squad.age_years": lambda: squad.age_years(players["Age"]),
+        "squad.player_partials": lambda: squad.player_partials(players),
+        "squad.team_totals": lambda: squad.team_totals(partials),
+        "squad.quality_metrics": lambda: squad.squad_quality_metrics(totals),
+        "squad.depth_metrics": lambda: squad.squad_depth_metrics(totals),
+        "squad.age_profile": lambda: squad.age_profile(totals),
+        "squad.top_players": lambda: squad.top_players(partials),
+        "squad.value_scores": lambda: squad.squad_value_scores(quality, depth, ages),
+        "squad.compute_all": lambda: squad.compute_all(players),
+    }
+
+
+def _page_cases(data):
+    merged = features.merge_sources(data.sources)
+    cases = {"pages.merge_features": lambda: features.merge_sources(data.sources)}
+    for name in MODELS:
+        artifact = get_model(name)
+        X = merged[artifact.features].fillna(0)
+        cases[f"predict.{name}.batch"] = lambda a=artifact, X=X: a.model.predict(X)
+    return cases
+
+
+def _fixed_cases():
+    """Cases that do not depend on the data scale."""
+    cases = {
+        "pages.load_features_cold": lambda: features._read_feather(features.FEATURES_PATH),
+    }
+    table = features.load_features()
+    for name, fname in MODELS.items():
+        path = forest.array_path(MODELS_DIR / fname)
+        cases[f"pages.load_model_cold.{name}"] = lambda p=path: forest.load(p)
+        artifact = get_model(name)
+        row = table[artifact.features].fillna(0).iloc[[0]]
+        cases[f"predict.{name}.row"] = lambda a=artifact, row=row: a.model.predict(row)
+    return cases
+
+
+def measure(fn, repeat=3, memory=True):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    result = {"seconds": min(times), "median_seconds": float(np.median(times))}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result
+
+
+def run(scales=DEFAULT_SCALES, repeat=3, memory=True, only=None, log=print):
+    """Time every case (or those whose name starts with a prefix in ``only``)."""
+    results = {}
+
+    def wanted(name):
+        return not only or any(name.startswith(p) or p.startswith(name) for p in only)
+
+    def record(groups, build, scale, rows):
+        if not any(wanted(g) for g in groups):
+            return
+        for name, fn in build().items():
+            if not wanted(name):
+                continue
+            entry = measure(fn, repeat, memory)
+            entry.update(scale=scale, rows=rows() if rows else None)
+            key = f"{name}@{scale}"
+            results[key] = entry
+            line = f"{key:<42} {entry['seconds'] * 1e3:10.2f} ms"
+            if memory:
+                line += f" {entry['peak_mb']:9.1f} MB"
+            log(line)
+
+    record(("pages.", "predict."), _fixed_cases, 1, None)
+    for scale in scales:
+        data = Inputs(scale)
+        record(
+            ("analysis.",),
+            lambda: _analysis_cases(data),
+            scale,
+            lambda: len(data.matches) + len(data.detailed),
+        )
+        record(("squad.",), lambda: _squad_cases(data), scale, lambda: len(data.players))
+        record(
+            ("pages.", "predict."),
+            lambda: _page_cases(data),
+            scale,
+            lambda: len(data.sources["performance_metrics"]),
+        )
+        del data
+        gc.collect()
+    return results
+
+
+def _commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def environment():
+    return {
+        "commit": _commit(),
+        "timestamp": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """Rows for cases present in both runs; ``regression`` marks the ones to fix."""
+    rows = []
+    for key in sorted(set(current) & set(baseline)):
+        new, old = current[key], baseline[key]
+        ratio = new["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+        slower = ratio > 1 + threshold and new["seconds"] - old["seconds"] > MIN_SECONDS
+        mem_ratio = None
+        hungrier = False
+        if "peak_mb" in new and "peak_mb" in old and old["peak_mb"]:
+            mem_ratio = new["peak_mb"] / old["peak_mb"]
+            hungrier = mem_ratio > 1 + threshold and new["peak_mb"] - old["peak_mb"] > 1
+        rows.append(
+            {
+                "case": key,
+                "old_ms": old["seconds"] * 1e3,
+                "new_ms": new["seconds"] * 1e3,
+                "time_ratio": ratio,
+                "memory_ratio": mem_ratio,
+                "regression": slower or hungrier,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", metavar="PREFIX", help="e.g. analysis. predict.")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--out", type=Path, help="JSON file (default: benchmarks/<commit>.json)")
+    parser.add_argument("--compare", type=Path, metavar="BASELINE", help="earlier JSON result")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    env = environment()
+    results = run(args.scales, args.repeat, not args.no_memory, args.only)
+    out = args.out or RESULTS_DIR / f"{env['commit'] or 'results'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"environment": env, "results": results}, indent=2))
+    print(f"wrote {out}")
+
+    if args.compare is None:
+        return 0
+    baseline = json.loads(args.compare.read_text())["results"]
+    report = compare(results, baseline, args.threshold)
+    if report.empty:
+        print("no cases in common with the baseline")
+        return 0
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    regressions = report[report["regression"]]
+    if len(regressions):
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
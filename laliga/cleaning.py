@@ -0,0 +1,378 @@
+"""Cleaning stage: raw ``Datasets/`` files -> ``CleanedDatasets/Cleaning/``.
+
+The rules (team name mapping, target seasons, numeric coercion) are shared by
+``cleaning.ipynb`` and the ingestion tools. ``run`` applies them as a
+streaming stage: the raw files are read in chunks with explicit dtypes
+(categorical teams, venue and result, dates parsed at read time), and rows
+outside the target seasons are dropped chunk by chunk, so peak memory is set
+by the chunk size and the kept rows rather than by the whole raw history.
+The outputs are also written as per-season partitions (``laliga.partitions``),
+and the incremental ingestion state (``laliga.incremental``) is rebuilt from
+them.
+
+Usage::
+
+    python -m laliga.cleaning [--chunksize 5000] [--check]
+"""
+
+import argparse
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from laliga import partitions
+from laliga.data import RAW_DIR, diff_against_disk, write_dataset
+from laliga.partitions import season_range
+
+TEAM_MAPPING = {
+    "Ath Bilbao": "Athletic Club",
+    "Ath Madrid": "Atletico Madrid",
+    "Athletic Club": "Athletic Club",
+    "Atletico Madrid": "Atletico Madrid",
+    "Real Madrid": "Real Madrid",
+    "Barcelona": "Barcelona",
+    "Valencia": "Valencia",
+    "Sevilla": "Sevilla",
+    "Real Sociedad": "Real Sociedad",
+    "Villarreal": "Villarreal",
+    "Real Betis": "Real Betis",
+    "Betis": "Real Betis",
+    "Espanyol": "Espanyol",
+    "Celta": "Celta Vigo",
+    "Celta Vigo": "Celta Vigo",
+    "Getafe": "Getafe",
+    "Alaves": "Alavés",
+    "Alavés": "Alavés",
+    "Levante": "Levante",
+    "Osasuna": "Osasuna",
+    "Granada": "Granada",
+    "Cadiz": "Cádiz",
+    "Cádiz": "Cádiz",
+    "Elche": "Elche",
+    "Valladolid": "Valladolid",
+    "Mallorca": "Mallorca",
+    "Rayo Vallecano": "Rayo Vallecano",
+    "Vallecano": "Rayo Vallecano",
+    "Las Palmas": "Las Palmas",
+    "Girona": "Girona",
+    "Leganes": "Leganés",
+    "Leganés": "Leganés",
+    "Eibar": "Eibar",
+    "Huesca": "Huesca",
+    "Oviedo": "Oviedo",
+    "Sociedad": "Real Sociedad",
+}
+
+FIRST_SEASON, LAST_SEASON = 2019, 2025  # start years: 2019-20 to 2025-26
+TARGET_SEASONS = season_range(FIRST_SEASON, LAST_SEASON)
+TARGET_YEARS = list(range(FIRST_SEASON, LAST_SEASON + 2))
+
+DETAILED_NUMERIC = ["gf", "ga", "xg", "xga", "poss", "attendance"]
+
+
+PLAYER_NUMERIC = [
+    "Goals",
+    "Assists",
+    "Expected Goals (xG)",
+    "Non-Penalty xG (npxG)",
+    "Expected Assists (xAG)",
+    "Passes Completed",
+    "Passes Attempted",
+]
+
+DEFAULT_CHUNKSIZE = 5000
+
+
+def _map_categorical(values, mapping):
+    # Map the (few) categories rather than every row; several raw names can
+    # collapse onto one team, so the codes are rebuilt against the new set.
+    cats = values.cat.categories
+    mapped = pd.Index([mapping.get(c, c) for c in cats])
+    new_cats = mapped.unique()
+    lookup = new_cats.get_indexer(mapped)
+    codes = values.cat.codes.to_numpy()
+    new_codes = lookup[codes]
+    new_codes[codes == -1] = -1
+    return pd.Series(
+        pd.Categorical.from_codes(new_codes, new_cats), index=values.index, name=values.name
+    )
+
+
+def standardize_team_names(df, cols):
+    df = df.copy()
+    for col in cols:
+        if col not in df.columns:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = _map_categorical(df[col], TEAM_MAPPING)
+        else:
+            df[col] = df[col].replace(TEAM_MAPPING)
+    return df
+
+
+def clean_matches(raw):
+    """``LaLiga_Matches.csv`` rows -> ``matches_5y`` rows."""
+    df = raw[raw["Season"].isin(TARGET_SEASONS)].copy()
+    df = standardize_team_names(df, ["HomeTeam", "AwayTeam"])
+    if not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+        df["Date"] = pd.to_datetime(df["Date"], format="%d-%m-%Y", errors="coerce")
+    result = df["FTR"].astype(object)
+    df["HomePoints"] = result.map({"H": 3, "D": 1, "A": 0})
+    df["AwayPoints"] = result.map({"H": 0, "D": 1, "A": 3})
+    return df.dropna(subset=["HomeTeam", "AwayTeam", "FTHG", "FTAG"])
+
+
+def clean_detailed(raw):
+    """``matches_full.csv``/``matches_laliga.csv`` rows -> ``matches_detailed`` rows."""
+    df = raw.copy()
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df["year"] = df["date"].dt.year
+    df = df[df["year"].isin(TARGET_YEARS)]
+    df = standardize_team_names(df, ["team", "opponent"])
+    for col in DETAILED_NUMERIC:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def clean_players(raw):
+    """``database.csv`` rows -> ``players_clean`` rows."""
+    df = raw.copy()
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    df["year"] = df["Date"].dt.year
+    df = df[df["year"].isin(TARGET_YEARS)]
+    df = standardize_team_names(df, ["Team"])
+    for col in PLAYER_NUMERIC:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(",", "."), errors="coerce")
+    df["Pass Completion %"] = pd.to_numeric(
+        df["Pass Completion %"].astype(str).str.replace(",", ".").str.replace("%", ""),
+        errors="coerce",
+    )
+    return df
+
+
+# -- streaming readers ------------------------------------------------------
+
+MATCH_DTYPES = {
+    "Season": "category",
+    "HomeTeam": "category",
+    "AwayTeam": "category",
+    "FTR": "category",
+    "HTR": "category",
+    "FTHG": "Int64",
+    "FTAG": "Int64",
+    "HTHG": "float64",
+    "HTAG": "float64",
+}
+
+DETAILED_DTYPES = {
+    "comp": "category",
+    "round": "category",
+    "day": "category",
+    "venue": "category",
+    "result": "category",
+    "team": "category",
+    "opponent": "category",
+    "formation": "category",
+    "opp formation": "category",
+    **dict.fromkeys(DETAILED_NUMERIC, "float64"),
+}
+
+PLAYER_DTYPES = {
+    "Team": "category",
+    "Nation": "category",
+    "Position": "category",
+    "Age": "string",
+}
+
+
+def _concat(chunks):
+    """Concatenate chunks, unioning categories so categorical columns survive."""
+    chunks = [c for c in chunks if len(c)]
+    if not chunks:
+        return pd.DataFrame()
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            cats = union_categoricals(
+                [c[col] for c in chunks], ignore_order=True
+            ).categories
+            for c in chunks:
+                c[col] = c[col].cat.set_categories(cats)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _as_int(df, cols):
+    for col in cols:
+        if df[col].notna().all():
+            df[col] = df[col].astype("int64")
+    return df
+
+
+def read_matches(path=RAW_DIR / "LaLiga_Matches.csv", chunksize=DEFAULT_CHUNKSIZE):
+    chunks = []
+    reader = pd.read_csv(
+        path,
+        dtype=MATCH_DTYPES,
+        parse_dates=["Date"],
+        date_format="%d-%m-%Y",
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        # Filter before any other work so old seasons cost only the parse.
+        chunk = chunk[chunk["Season"].isin(TARGET_SEASONS)]
+        if len(chunk):
+            chunks.append(clean_matches(chunk))
+    df = _concat(chunks)
+    df["Season"] = df["Season"].cat.remove_unused_categories()
+    return _as_int(df, ["FTHG", "FTAG", "HomePoints", "AwayPoints"])
+
+
+def read_detailed(paths=None, chunksize=DEFAULT_CHUNKSIZE):
+    if paths is None:
+        paths = [RAW_DIR / "matches_full.csv", RAW_DIR / "matches_laliga.csv"]
+    chunks = []
+    for path in paths:
+        reader = pd.read_csv(
+            path, dtype=DETAILED_DTYPES, parse_dates=["date"], chunksize=chunksize
+        )
+        for chunk in reader:
+            chunk = chunk[chunk["date"].dt.year.isin(TARGET_YEARS)]
+            if len(chunk):
+                chunks.append(clean_detailed(chunk))
+    return _concat(chunks)
+
+
+def read_players(path=RAW_DIR / "database.csv", chunksize=DEFAULT_CHUNKSIZE):
+    chunks = []
+    reader = pd.read_csv(path, dtype=PLAYER_DTYPES, parse_dates=["Date"], chunksize=chunksize)
+    for chunk in reader:
+        chunk = chunk[chunk["Date"].dt.year.isin(TARGET_YEARS)]
+        if len(chunk):
+            chunks.append(clean_players(chunk))
+    return _concat(chunks)
+
+
+def team_stats(matches, detailed, players):
+    """Per-team, per-season results joined with detailed and player aggregates."""
+    from laliga.metrics import team_view
+    from laliga.squad import age_years
+
+    view = team_view(matches)
+    view["Team"] = view["Team"].astype(object)
+    per_season = view.groupby(["Team", "Season"], observed=True).agg(
+        Matches=("Points", "size"),
+        Wins=("Win", "sum"),
+        Draws=("Draw", "sum"),
+        Losses=("Loss", "sum"),
+        GoalsFor=("GoalsFor", "sum"),
+        GoalsAgainst=("GoalsAgainst", "sum"),
+        Points=("Points", "sum"),
+    )
+    teams = pd.unique(matches["HomeTeam"].astype(object))
+    seasons = [s for s in TARGET_SEASONS if s in set(per_season.index.get_level_values(1))]
+    index = pd.MultiIndex.from_product([teams, seasons], names=["Team", "Season"])
+    stats = per_season.reindex(index).dropna(subset=["Matches"]).astype("int64")
+    stats["WinRate"] = stats["Wins"] / stats["Matches"]
+    stats["PointsPerGame"] = stats["Points"] / stats["Matches"]
+    stats["GoalDifference"] = stats["GoalsFor"] - stats["GoalsAgainst"]
+    stats = stats.reset_index()
+
+    detailed_stats = (
+        detailed.groupby("team", observed=True)
+        .agg(
+            {
+                "attendance": ["mean", "sum", "count"],
+                "xg": "mean",
+                "xga": "mean",
+                "poss": "mean",
+                "gf": "mean",
+                "ga": "mean",
+            }
+        )
+        .reset_index()
+    )
+    detailed_stats.columns = [
+        "Team",
+        "AvgAttendance",
+        "TotalAttendance",
+        "MatchesWithAttendance",
+        "AvgxG",
+        "AvgxGA",
+        "AvgPossession",
+        "AvgGoalsFor",
+        "AvgGoalsAgainst",
+    ]
+    detailed_stats["Team"] = detailed_stats["Team"].astype(object)
+
+    player_stats = (
+        players.assign(AgeYears=age_years(players["Age"]))
+        .groupby("Team", observed=True)
+        .agg(
+            {
+                "Goals": "sum",
+                "Assists": "sum",
+                "Expected Goals (xG)": "sum",
+                "Expected Assists (xAG)": "sum",
+                "Player": "count",
+                "AgeYears": "mean",
+            }
+        )
+        .reset_index()
+    )
+    player_stats.columns = [
+        "Team",
+        "TotalGoals",
+        "TotalAssists",
+        "TotalxG",
+        "TotalxAG",
+        "PlayerCount",
+        "AvgAge",
+    ]
+    player_stats["Team"] = player_stats["Team"].astype(object)
+
+    stats = stats.merge(detailed_stats, on="Team", how="left")
+    return stats.merge(player_stats, on="Team", how="left")
+
+
+def run(chunksize=DEFAULT_CHUNKSIZE):
+    """Run the cleaning stage and return the output tables keyed by dataset name."""
+    matches = read_matches(chunksize=chunksize)
+    detailed = read_detailed(chunksize=chunksize)
+    players = read_players(chunksize=chunksize)
+    return {
+        "team_stats": team_stats(matches, detailed, players),
+        "matches_detailed": detailed,
+        "players_clean": players,
+        "matches_5y": matches,
+    }
+
+
+def build(chunksize=DEFAULT_CHUNKSIZE):
+    for name, df in run(chunksize).items():
+        write_dataset(name, df)
+    # Partitions are cut from the written CSVs so both layouts hold the same values.
+    partitions.build()
+    # A watermark left over from the old tables would make ingest re-append rows.
+    from laliga import incremental
+
+    incremental.init()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--check", action="store_true", help="compare with CSVs on disk")
+    args = parser.parse_args(argv)
+
+    if not args.check:
+        build(args.chunksize)
+        return 0
+    failures = diff_against_disk(run(args.chunksize))
+    for name, message in failures:
+        print(f"{name} differs:\n{message}\n")
+    print("ok" if not failures else f"{len(failures)} table(s) differ")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,247 @@
+"""Process-wide access to the cleaned datasets.
+
+Streamlit reruns a page script on every widget change, so parsing the CSVs
+at module top level costs a full read each time. ``load`` parses a dataset
+once per server process and shares the frame between sessions. Entries are
+revalidated against the file's mtime and size on every call; when those
+change, a content hash decides whether the file really has to be reparsed.
+The cache is bounded by an approximate memory budget and evicts the least
+recently used frames first.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from laliga.profiling import span
+
+ROOT = Path(__file__).resolve().parent.parent
+DATASETS_DIR = ROOT / "Analysis" / "CleanedDatasets"
+RAW_DIR = ROOT / "Datasets"
+
+DATASETS = {
+    "matches_5y": "Cleaning/matches_5y.csv",
+    "matches_detailed": "Cleaning/matches_detailed.csv",
+    "players_clean": "Cleaning/players_clean.csv",
+    "team_stats": "Cleaning/team_stats.csv",
+    "league_positions": "Analysis/league_positions.csv",
+    "performance_metrics": "Analysis/performance_metrics.csv",
+    "xg_metrics": "Analysis/xg_metrics.csv",
+    "home_away_metrics": "Analysis/home_away_metrics.csv",
+    "h2h_details": "Analysis/h2h_details.csv",
+    "h2h_metrics": "Analysis/h2h_metrics.csv",
+    "team_performance_summary": "Analysis/team_performance_summary.csv",
+    "elo_history": "Analysis/elo_history.csv",
+    "elo_ratings": "Analysis/elo_ratings.csv",
+    "attendance_metrics": "Financial/attendance_metrics.csv",
+    "financial_scores": "Financial/financial_scores.csv",
+    "financial_scores_only": "Financial/financial_scoresOnly.csv",
+    "squad_value_scores": "SquadAnalysis/squad_value_scores.csv",
+    "squad_quality_metrics": "SquadAnalysis/squad_quality_metrics.csv",
+    "squad_depth_metrics": "SquadAnalysis/squad_depth_metrics.csv",
+    "top_players": "SquadAnalysis/TopPlayersPerTeam.csv",
+    "age_profile": "SquadAnalysis/AgeProfilePerTeam.csv",
+}
+
+DEFAULT_CACHE_MB = 256
+
+
+def dataset_path(name):
+    """Absolute path of a named dataset, or of a path relative to the repo."""
+    if name in DATASETS:
+        return DATASETS_DIR / DATASETS[name]
+    path = Path(name)
+    return path if path.is_absolute() else ROOT / path
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Entry:
+    __slots__ = ("stamp", "digest", "frame", "nbytes")
+
+    def __init__(self, stamp, digest, frame):
+        self.stamp = stamp
+        self.digest = digest
+        self.frame = frame
+        self.nbytes = int(frame.memory_usage(index=True, deep=True).sum())
+
+
+class DataCache:
+    """Thread-safe LRU of parsed frames keyed by file path and read options."""
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_mb = float(os.environ.get("LALIGA_DATA_CACHE_MB", DEFAULT_CACHE_MB))
+            max_bytes = int(max_mb * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._path_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def get(self, path, reader, options=()):
+        path = Path(path)
+        key = (str(path), options)
+        with self._lock:
+            path_lock = self._path_locks.setdefault(key, threading.Lock())
+
+        # One parse per file at a time; concurrent sessions wait for it
+        # instead of all reading the same CSV.
+        with path_lock:
+            st = path.stat()
+            stamp = (st.st_mtime_ns, st.st_size)
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.stamp == stamp:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.frame
+
+            digest = file_digest(path)
+            if entry is not None and entry.digest == digest:
+                # Touched but unchanged (e.g. a notebook rewrote identical output).
+                with self._lock:
+                    entry.stamp = stamp
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                return entry.frame
+
+            with span("parse", file=path.name):
+                frame = reader(path)
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = _Entry(stamp, digest, frame)
+                self._entries.move_to_end(key)
+                self._evict()
+            return frame
+
+    def _evict(self):
+        total = sum(entry.nbytes for entry in self._entries.values())
+        # Always keep the most recent entry, even if it alone is over budget.
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "nbytes": sum(entry.nbytes for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache = DataCache()
+
+
+def get_cache():
+    return _cache
+
+
+def load(name, **read_kwargs):
+    """Return the parsed frame for a named dataset (or repo-relative CSV path).
+
+    The returned frame is a shallow copy of the cached one: adding or
+    replacing columns is safe, but values must not be edited in place.
+    """
+    path = dataset_path(name)
+    options = tuple(sorted((k, repr(v)) for k, v in read_kwargs.items()))
+    frame = _cache.get(path, lambda p: pd.read_csv(p, **read_kwargs), options)
+    return frame.copy(deep=False)
+
+
+def _stable(df, path, rtol):
+    """``df`` with the dtypes and float text of the CSV at ``path`` where they agree."""
+    old = pd.read_csv(path)
+    if list(old.columns) != [str(c) for c in df.columns]:
+        return df
+    old_text = pd.read_csv(path, dtype=str, keep_default_na=False) if len(old) == len(df) else None
+    out = df.copy()
+    for col in out.columns:
+        new, before = out[col], old[str(col)]
+        if pd.api.types.is_bool_dtype(new) or pd.api.types.is_bool_dtype(before):
+            continue
+        if pd.api.types.is_integer_dtype(new) and pd.api.types.is_float_dtype(before):
+            out[col] = new = new.astype(float)
+        elif pd.api.types.is_float_dtype(new) and pd.api.types.is_integer_dtype(before):
+            if new.notna().all() and (new == np.round(new)).all():
+                out[col] = new.astype(before.dtype)
+            continue
+        if old_text is None or not (
+            pd.api.types.is_float_dtype(new) and pd.api.types.is_float_dtype(before)
+        ):
+            continue
+        values = new.to_numpy(dtype=float)
+        keep = np.isclose(values, before.to_numpy(dtype=float), rtol=rtol, atol=0)
+        if keep.any():
+            text = new.astype(object)
+            text[keep] = old_text[str(col)][keep].to_numpy()
+            out[col] = text
+    return out
+
+
+def write_dataset(name, df, rtol=1e-12):
+    """Write ``df`` to a dataset's CSV without round-off churn.
+
+    Float columns that hold whole numbers where the file on disk has
+    integers are written as integers (and the reverse), and a float cell
+    within ``rtol`` of the value already on disk keeps its on-disk text, so
+    rerunning a stage on unchanged inputs leaves the file byte-identical.
+    The file is not touched at all when nothing changed. Returns whether it
+    was rewritten.
+    """
+    path = dataset_path(name)
+    if path.exists():
+        df = _stable(df, path, rtol)
+    data = df.to_csv(index=False).encode("utf-8")
+    if path.exists() and path.read_bytes() == data:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+    return True
+
+
+def diff_against_disk(tables, rtol=1e-9):
+    """Compare computed tables with the dataset CSVs they would overwrite.
+
+    Each frame goes through a CSV round trip first, so only differences that
+    would survive being written are reported. Returns ``(name, message)``
+    pairs for the tables that differ.
+    """
+    failures = []
+    for name, df in tables.items():
+        actual = pd.read_csv(io.StringIO(df.to_csv(index=False)))
+        expected = pd.read_csv(dataset_path(name))
+        try:
+            pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=rtol)
+        except AssertionError as exc:
+            failures.append((name, str(exc)))
+    return failures
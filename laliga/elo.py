@@ -0,0 +1,325 @@
+"""Elo ratings over the full ``LaLiga_Matches.csv`` history.
+
+The cleaning stage keeps seven seasons, so the team metrics only know
+seven-season averages. ``EloState`` instead replays every match since
+1995-96 in date order:
+
+* the home side's expected score is
+  ``1 / (1 + 10 ** ((away - home - HOME_ADVANTAGE) / 400))``;
+* each match moves both ratings by ``K_FACTOR`` x margin multiplier x
+  (result - expected), with the multiplier 1 for a one-goal margin or a
+  draw, 1.5 for two goals and ``(11 + n) / 8`` for ``n`` >= 3;
+* a team's first match of a season pulls its rating ``SEASON_REGRESSION``
+  of the way back to 1500, and teams new to the league start at
+  ``NEW_TEAM_RATING``.
+
+The constants were chosen by the Brier score of the expected scores from
+2005-06 on. The state (ratings, per-team counters and a date watermark) is
+saved to ``State/elo_state.json``, so a new match is one O(1) update rather
+than a replay. ``elo_history`` gets one row per team per match (the rating
+time series) and ``elo_ratings`` holds the current ratings, which feed the
+``Elo`` feature and the match predictor.
+
+Usage::
+
+    python -m laliga.elo --init                     # replay the full history
+    python -m laliga.elo --matches Datasets/LaLiga_Matches.csv
+    python -m laliga.elo --verify 380               # replay vs incremental
+    python -m laliga.elo "Real Madrid" Barcelona    # ratings and expected score
+"""
+
+import argparse
+import json
+
+import pandas as pd
+
+from laliga.cleaning import standardize_team_names
+from laliga.data import DATASETS_DIR, RAW_DIR, dataset_path, load, write_dataset
+
+STATE_PATH = DATASETS_DIR / "State" / "elo_state.json"
+RAW_MATCHES = RAW_DIR / "LaLiga_Matches.csv"
+
+INITIAL_RATING = 1500.0
+NEW_TEAM_RATING = 1400.0
+K_FACTOR = 15.0
+HOME_ADVANTAGE = 80.0
+SEASON_REGRESSION = 0.2
+
+# Spellings in the raw history that ``TEAM_MAPPING`` does not cover.
+HISTORY_ALIASES = {"Villareal": "Villarreal"}
+
+HISTORY_COLUMNS = [
+    "Date",
+    "Season",
+    "Team",
+    "Opponent",
+    "Venue",
+    "GoalsFor",
+    "GoalsAgainst",
+    "Expected",
+    "EloBefore",
+    "EloAfter",
+]
+
+
+def margin_multiplier(margin):
+    margin = abs(margin)
+    if margin <= 1:
+        return 1.0
+    if margin == 2:
+        return 1.5
+    return (11 + margin) / 8
+
+
+def expected_score(home, away, home_advantage=HOME_ADVANTAGE):
+    """Expected score (win = 1, draw = 0.5) of the home side."""
+    return 1 / (1 + 10 ** ((away - home - home_advantage) / 400))
+
+
+def prepare(raw):
+    """Raw ``LaLiga_Matches.csv`` rows, standardised and in date order."""
+    df = standardize_team_names(raw, ["HomeTeam", "AwayTeam"])
+    df = df.dropna(subset=["HomeTeam", "AwayTeam", "FTHG", "FTAG"])
+    df = df.assign(
+        HomeTeam=df["HomeTeam"].astype(str).replace(HISTORY_ALIASES),
+        AwayTeam=df["AwayTeam"].astype(str).replace(HISTORY_ALIASES),
+    )
+    if not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+        df["Date"] = pd.to_datetime(df["Date"], format="%d-%m-%Y", errors="coerce")
+    df = df.dropna(subset=["Date"])
+    return df.sort_values("Date", kind="stable")[
+        ["Season", "Date", "HomeTeam", "AwayTeam", "FTHG", "FTAG"]
+    ]
+
+
+class EloState:
+    def __init__(self):
+        self.ratings = {}
+        # Per team: [season of last match, date of last match, matches, peak rating].
+        self.teams = {}
+        self.watermark = None
+
+    # -- bootstrapping and persistence ------------------------------------
+
+    @classmethod
+    def replay(cls, matches):
+        """State and history after every match of a ``prepare``d frame."""
+        state = cls()
+        return state, state.apply(matches)
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        raw = json.loads(path.read_text())
+        state = cls()
+        state.ratings = raw["ratings"]
+        state.teams = raw["teams"]
+        state.watermark = raw["watermark"]
+        return state
+
+    def save(self, path=STATE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        raw = {"ratings": self.ratings, "teams": self.teams, "watermark": self.watermark}
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(raw))
+        tmp.replace(path)
+
+    # -- new-row detection -------------------------------------------------
+
+    @staticmethod
+    def _keys(df):
+        return df["HomeTeam"].astype(str) + "|" + df["AwayTeam"].astype(str)
+
+    def new_matches(self, matches):
+        """Rows of a ``prepare``d frame that are newer than the watermark."""
+        if self.watermark is None:
+            return matches
+        dates = matches["Date"].dt.strftime("%Y-%m-%d")
+        mark = self.watermark
+        same_day = (dates == mark["date"]) & ~self._keys(matches).isin(mark["keys"])
+        return matches[(dates > mark["date"]) | same_day]
+
+    # -- applying matches --------------------------------------------------
+
+    def _start(self, team, season):
+        info = self.teams.get(team)
+        if info is None:
+            self.ratings[team] = NEW_TEAM_RATING
+            self.teams[team] = [season, None, 0, NEW_TEAM_RATING]
+        elif info[0] != season:
+            rating = self.ratings[team]
+            self.ratings[team] = rating + SEASON_REGRESSION * (INITIAL_RATING - rating)
+            info[0] = season
+
+    def update(self, season, date, home, away, home_goals, away_goals):
+        """Apply one match; return the home and away history rows."""
+        self._start(home, season)
+        self._start(away, season)
+        before_home, before_away = self.ratings[home], self.ratings[away]
+        expected = expected_score(before_home, before_away)
+        result = 1.0 if home_goals > away_goals else 0.5 if home_goals == away_goals else 0.0
+        delta = K_FACTOR * margin_multiplier(home_goals - away_goals) * (result - expected)
+        self.ratings[home] = before_home + delta
+        self.ratings[away] = before_away - delta
+        for team in (home, away):
+            info = self.teams[team]
+            info[1] = date
+            info[2] += 1
+            info[3] = max(info[3], self.ratings[team])
+        return (
+            (date, season, home, away, "Home", home_goals, away_goals, expected,
+             before_home, self.ratings[home]),
+            (date, season, away, home, "Away", away_goals, home_goals, 1 - expected,
+             before_away, self.ratings[away]),
+        )
+
+    def apply(self, matches):
+        """Apply ``prepare``d rows in order; return their history rows."""
+        rows = []
+        dates = matches["Date"].dt.strftime("%Y-%m-%d")
+        for season, date, home, away, hg, ag in zip(
+            matches["Season"],
+            dates,
+            matches["HomeTeam"],
+            matches["AwayTeam"],
+            matches["FTHG"].astype(int),
+            matches["FTAG"].astype(int),
+        ):
+            rows.extend(self.update(season, date, home, away, int(hg), int(ag)))
+        if len(matches):
+            latest = dates.max()
+            keys = self._keys(matches)[dates == latest].tolist()
+            if self.watermark is not None and self.watermark["date"] == latest:
+                keys = self.watermark["keys"] + keys
+            self.watermark = {"date": latest, "keys": keys}
+        return pd.DataFrame(rows, columns=HISTORY_COLUMNS)
+
+    # -- queries -------------------------------------------------------------
+
+    def expected(self, home, away):
+        return expected_score(self.ratings[home], self.ratings[away])
+
+    def ratings_table(self):
+        """Current rating of every team, strongest first."""
+        df = pd.DataFrame(
+            [
+                {
+                    "Team": team,
+                    "Elo": rating,
+                    "Peak": self.teams[team][3],
+                    "Matches": self.teams[team][2],
+                    "LastSeason": self.teams[team][0],
+                    "LastMatch": self.teams[team][1],
+                }
+                for team, rating in self.ratings.items()
+            ]
+        )
+        df = df.sort_values(["Elo", "Team"], ascending=[False, True], ignore_index=True)
+        df.insert(0, "Rank", range(1, len(df) + 1))
+        return df
+
+
+def build(raw=None, state_path=STATE_PATH):
+    """Replay the whole history and write the state, history and ratings."""
+    raw = pd.read_csv(RAW_MATCHES) if raw is None else raw
+    state, history = EloState.replay(prepare(raw))
+    write_dataset("elo_history", history)
+    write_dataset("elo_ratings", state.ratings_table())
+    state.save(state_path)
+    return state
+
+
+def ingest(raw, state_path=STATE_PATH):
+    """Apply the unseen rows of a raw match file; return how many were new."""
+    state = EloState.load(state_path)
+    new = state.new_matches(prepare(raw))
+    if len(new):
+        history = state.apply(new)
+        history.to_csv(dataset_path("elo_history"), mode="a", header=False, index=False)
+        write_dataset("elo_ratings", state.ratings_table())
+        state.save(state_path)
+    return len(new)
+
+
+def verify(holdout, raw=None):
+    """Replay all but the last ``holdout`` matches, apply the rest one by one,
+    and compare with the tables on disk. Returns the mismatches."""
+    matches = prepare(pd.read_csv(RAW_MATCHES) if raw is None else raw)
+    state, history = EloState.replay(matches.iloc[:-holdout])
+    tail = [state.apply(state.new_matches(matches.iloc[[i]])) for i in range(-holdout, 0)]
+    tables = {
+        "elo_history": pd.concat([history, *tail], ignore_index=True),
+        "elo_ratings": state.ratings_table(),
+    }
+    failures = []
+    for name, df in tables.items():
+        try:
+            pd.testing.assert_frame_equal(
+                df.reset_index(drop=True), load(name), check_dtype=False, rtol=1e-9
+            )
+        except AssertionError as exc:
+            failures.append((name, str(exc)))
+    return failures
+
+
+def rating_history(teams=None, since=None):
+    """Rating after every match of ``teams`` (default: all) from ``since``."""
+    history = load("elo_history")
+    if teams is not None:
+        history = history[history["Team"].isin(teams)]
+    if since is not None:
+        history = history[history["Date"] >= str(since)]
+    return history.reset_index(drop=True)
+
+
+def brier_score(history, since="2005-06"):
+    """Brier score of the home sides' expected scores from ``since`` on."""
+    home = history[(history["Venue"] == "Home") & (history["Season"] >= since)]
+    result = (home["GoalsFor"] > home["GoalsAgainst"]) + 0.5 * (
+        home["GoalsFor"] == home["GoalsAgainst"]
+    )
+    return float(((result - home["Expected"]) ** 2).mean())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("teams", nargs="*", metavar="TEAM", help="show ratings (two: home, away)")
+    parser.add_argument("--init", action="store_true", help="replay the full history")
+    parser.add_argument("--matches", help="raw LaLiga_Matches.csv-style file")
+    parser.add_argument(
+        "--verify", type=int, metavar="N", help="replay the last N matches and compare"
+    )
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        failures = verify(args.verify)
+        for name, message in failures:
+            print(f"{name} differs:\n{message}\n")
+        print("ok" if not failures else f"{len(failures)} table(s) differ")
+        return 1 if failures else 0
+
+    if args.init:
+        state = build()
+        history = load("elo_history")
+        print(
+            f"replayed {len(history) // 2} matches of {len(state.ratings)} teams; "
+            f"Brier score {brier_score(history):.4f}"
+        )
+    if args.matches:
+        print(f"ingested {ingest(pd.read_csv(args.matches))} matches")
+
+    ratings = load("elo_ratings").set_index("Team")
+    if args.teams:
+        unknown = [t for t in args.teams if t not in ratings.index]
+        if unknown:
+            parser.error(f"unknown team(s): {', '.join(unknown)}")
+        print(ratings.loc[args.teams].to_string(float_format=lambda v: f"{v:.1f}"))
+        if len(args.teams) == 2:
+            home, away = (ratings.at[t, "Elo"] for t in args.teams)
+            print(f"expected home score {expected_score(home, away):.3f}")
+    elif not (args.init or args.matches):
+        print(ratings.head(20).to_string(float_format=lambda v: f"{v:.1f}"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,406 @@
+"""Per-team TreeSHAP explanations for both models.
+
+``tree_shap`` computes exact path-dependent TreeSHAP values (Lundberg et
+al., 2018) from the ``laliga.forest`` node arrays. Rather than walking each
+tree recursively per row, every root-to-leaf path is flattened once into
+its distinct features, each with its cover fraction (the share of training
+samples that followed the path at that feature's splits) and the interval
+of values that follows it. A feature split more than once on a path is
+merged into one entry. Paths are padded to a common length with entries
+that cover every value. A padded entry changes neither the leaf's value nor
+the other features' credit, so the result stays exact. A leaf's Shapley
+weights are then a product of per-feature polynomials, evaluated for every
+row and every leaf of every tree in one set of NumPy operations. A missing
+value follows a path only if every split on that feature along it sends
+missing values its way (``ArrayForest.missing_left``), as in
+``ArrayForest.predict``.
+
+``build`` explains every row of the team feature table with both models
+(scored as the pages score them, missing values included) and writes
+``Explanations/<model>.feather``, with ``BaseValue``, ``Prediction`` and one
+contribution column per feature.
+It also writes a manifest that records the model and feature-table versions
+used. ``load_explanations`` reads the stored table and recomputes it first if
+either version has changed.
+
+Usage::
+
+    python -m laliga.explanations                    # rebuild both tables
+    python -m laliga.explanations --check            # additivity, sklearn, brute force
+    python -m laliga.explanations --team Barcelona --model sporting
+"""
+
+import argparse
+import json
+import math
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from laliga.data import DATASETS_DIR, file_digest, get_cache
+from laliga.features import features_version, load_features
+from laliga.models import MODELS, get_model
+from laliga.profiling import span
+
+EXPLANATIONS_DIR = DATASETS_DIR / "Explanations"
+MANIFEST_PATH = EXPLANATIONS_DIR / "explanations.json"
+CHUNK_ROWS = 64
+
+
+def explanation_path(name):
+    return EXPLANATIONS_DIR / f"{name}.feather"
+
+
+def _forest(artifact):
+    from laliga.forest import ArrayForest
+
+    model = artifact.model
+    if not isinstance(model, ArrayForest):
+        model = ArrayForest.from_sklearn(model, artifact.features)
+    if model.cover is None:
+        raise ValueError(
+            f"{artifact.path} has no node cover; re-export it with python -m laliga.forest"
+        )
+    return model
+
+
+def flatten_paths(forest):
+    """Every leaf's path as padded ``(leaf, slot)`` arrays.
+
+    Returns ``value`` (leaves,), and ``feature``, ``zero``, ``low``,
+    ``high`` and ``nan`` (leaves, slots): the path follows ``low < x <= high``
+    for ``feature`` (or a missing ``x`` where ``nan``), and ``zero`` is the
+    product of its cover fractions.
+    """
+    cover = forest.cover
+    missing_left = forest.missing_left
+    leaves = []
+    for root in forest.roots:
+        stack = [(root, {})]
+        while stack:
+            node, path = stack.pop()
+            left, right = forest.left[node], forest.right[node]
+            if left < 0:
+                leaves.append((forest.value[node], path))
+                continue
+            f, t = forest.feature[node], forest.threshold[node]
+            zero, low, high, nan = path.get(f, (1.0, -np.inf, np.inf, True))
+            nan_left = bool(missing_left[node])
+            for child, bounds in (
+                (left, (low, min(high, t), nan and nan_left)),
+                (right, (max(low, t), high, nan and not nan_left)),
+            ):
+                entry = (zero * cover[child] / cover[node],) + bounds
+                stack.append((child, {**path, f: entry}))
+
+    slots = max(1, max(len(path) for _, path in leaves))
+    n = len(leaves)
+    value = np.empty(n)
+    feature = np.zeros((n, slots), dtype=np.intp)
+    zero = np.ones((n, slots))
+    low = np.full((n, slots), -np.inf)
+    high = np.full((n, slots), np.inf)
+    nan = np.ones((n, slots), dtype=bool)
+    for k, (v, path) in enumerate(leaves):
+        value[k] = v
+        for d, (f, (z, lo, hi, na)) in enumerate(path.items()):
+            feature[k, d], zero[k, d], low[k, d], high[k, d], nan[k, d] = f, z, lo, hi, na
+    return {
+        "value": value,
+        "feature": feature,
+        "zero": zero,
+        "low": low,
+        "high": high,
+        "nan": nan,
+    }
+
+
+_paths_lock = threading.Lock()
+_paths = {}
+
+
+def _cached_paths(forest):
+    key = id(forest)
+    with _paths_lock:
+        entry = _paths.get(key)
+        if entry is not None and entry[0] is forest:
+            return entry[1]
+    paths = flatten_paths(forest)
+    with _paths_lock:
+        _paths.clear()  # only the current artifacts are ever explained
+        _paths[key] = (forest, paths)
+    return paths
+
+
+def _chunk_shap(paths, X, n_features):
+    value, feature, zero = paths["value"], paths["feature"], paths["zero"]
+    n_slots = feature.shape[1]
+    x = X[:, feature]
+    one = ((paths["low"] == -np.inf) | (x > paths["low"])) & (x <= paths["high"])
+    one = np.where(np.isnan(x), paths["nan"], one).astype(float)
+
+    # Coefficients of prod_d (zero_d + one_d * t) for every (row, leaf).
+    poly = np.ones(x.shape[:2] + (1,))
+    for d in range(n_slots):
+        grown = np.zeros(poly.shape[:2] + (poly.shape[2] + 1,))
+        grown[..., :-1] = zero[:, d, None] * poly
+        grown[..., 1:] += one[..., d, None] * poly
+        poly = grown
+
+    # Shapley weight of a coalition of k of the other n_slots - 1 features.
+    weights = np.array(
+        [
+            math.factorial(k) * math.factorial(n_slots - k - 1) / math.factorial(n_slots)
+            for k in range(n_slots)
+        ]
+    )
+    phi = np.zeros((len(X), n_features))
+    for d in range(n_slots):
+        z = zero[:, d, None]
+        o = one[..., d]
+        # Divide slot d back out: by the constant zero_d where the row leaves
+        # the path at d, by (zero_d + t) where it follows it.
+        quotient_off = poly[..., :-1] / z
+        quotient_on = np.empty_like(quotient_off)
+        quotient_on[..., -1] = poly[..., -1]
+        for k in range(n_slots - 1, 0, -1):
+            quotient_on[..., k - 1] = poly[..., k] - zero[:, d] * quotient_on[..., k]
+        quotient = np.where(o[..., None] > 0, quotient_on, quotient_off)
+        share = value * (o - zero[:, d]) * (quotient @ weights)
+        onehot = np.zeros((len(value), n_features))
+        onehot[np.arange(len(value)), feature[:, d]] = 1.0
+        phi += share @ onehot
+    return phi
+
+
+def tree_shap(forest, X):
+    """``(contributions, base_value)`` for every row of ``X``.
+
+    ``contributions`` has one column per model feature;
+    ``base_value + contributions.sum(axis=1)`` equals ``forest.predict(X)``.
+    """
+    paths = _cached_paths(forest)
+    X = forest._matrix(X).astype(np.float64)
+    phi = np.concatenate(
+        [
+            _chunk_shap(paths, X[i : i + CHUNK_ROWS], forest.n_features_in_)
+            for i in range(0, len(X), CHUNK_ROWS)
+        ]
+        or [np.zeros((0, forest.n_features_in_))]
+    )
+    base = np.sum(paths["value"] * paths["zero"].prod(axis=1))
+    return phi / forest.n_estimators, base / forest.n_estimators
+
+
+def brute_force_shap(forest, x):
+    """Exact path-dependent Shapley values of one row by enumerating subsets."""
+    n = forest.n_features_in_
+    x = forest._matrix(np.asarray(x, dtype=float)[None, :]).astype(np.float64)[0]
+    masks = (np.arange(2**n)[:, None] >> np.arange(n)) & 1
+    totals = np.zeros(2**n)
+    for root in forest.roots:
+        stack = [(root, np.ones(2**n))]
+        while stack:
+            node, weight = stack.pop()
+            left, right = forest.left[node], forest.right[node]
+            if left < 0:
+                totals += weight * forest.value[node]
+                continue
+            f = forest.feature[node]
+            if np.isnan(x[f]):
+                goes_right = not forest.missing_left[node]
+            else:
+                goes_right = x[f] > forest.threshold[node]
+            known = masks[:, f] == 1
+            share = forest.cover[[left, right]] / forest.cover[node]
+            stack.append((left, weight * np.where(known, not goes_right, share[0])))
+            stack.append((right, weight * np.where(known, goes_right, share[1])))
+    totals /= forest.n_estimators
+
+    sizes = masks.sum(axis=1)
+    phi = np.zeros(n)
+    for i in range(n):
+        without = masks[:, i] == 0
+        s = sizes[without]
+        weight = np.array(
+            [math.factorial(k) * math.factorial(n - k - 1) / math.factorial(n) for k in s]
+        )
+        with_i = np.flatnonzero(without) | (1 << i)
+        phi[i] = np.sum(weight * (totals[with_i] - totals[without]))
+    return phi
+
+
+def model_rows(name, df=None):
+    """Teams and the feature rows ``name`` scores, as the pages score them."""
+    df = load_features() if df is None else df
+    # Both models take missing values as they are and route them as trained.
+    return df["Team"].astype(str), df[get_model(name).features]
+
+
+def explain(name, df=None):
+    """Explanation table for every team: ``Team``, ``BaseValue``, ``Prediction``, features."""
+    artifact = get_model(name)
+    forest = _forest(artifact)
+    teams, X = model_rows(name, df)
+    phi, base = tree_shap(forest, X)
+    out = pd.DataFrame(phi, columns=artifact.features)
+    out.insert(0, "Team", teams.to_numpy())
+    out.insert(1, "BaseValue", base)
+    out.insert(2, "Prediction", base + phi.sum(axis=1))
+    return out
+
+
+def read_manifest():
+    if not MANIFEST_PATH.exists():
+        return None
+    return json.loads(MANIFEST_PATH.read_text())
+
+
+def _versions(name):
+    return {"model_version": get_model(name).version, "features_version": features_version()}
+
+
+def build(names=None):
+    """Explain every team with each model and write the tables and manifest."""
+    manifest = read_manifest() or {"models": {}}
+    EXPLANATIONS_DIR.mkdir(parents=True, exist_ok=True)
+    changed = False
+    for name in names or MODELS:
+        table = explain(name)
+        path = explanation_path(name)
+        tmp = path.with_suffix(".tmp")
+        feather.write_feather(table, tmp, compression="uncompressed")
+        if not is_stale(name, manifest) and file_digest(tmp) == file_digest(path):
+            # Unchanged: keep the table and its manifest entry as they are.
+            tmp.unlink()
+            continue
+        tmp.replace(path)
+        changed = True
+        manifest["models"][name] = dict(
+            _versions(name),
+            built_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            rows=len(table),
+            base_value=float(table["BaseValue"].iloc[0]) if len(table) else None,
+            features=list(table.columns[3:]),
+        )
+    if changed:
+        tmp = MANIFEST_PATH.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest, indent=2))
+        tmp.replace(MANIFEST_PATH)
+    return manifest
+
+
+def is_stale(name, manifest=None):
+    manifest = manifest if manifest is not None else read_manifest()
+    entry = (manifest or {}).get("models", {}).get(name)
+    if entry is None or not explanation_path(name).exists():
+        return True
+    return any(entry.get(k) != v for k, v in _versions(name).items())
+
+
+def _read_table(path):
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
+_build_lock = threading.Lock()
+
+
+def load_explanations(name):
+    """Stored explanations of ``name``, rebuilt first if the model or features changed."""
+    if is_stale(name):
+        with _build_lock:
+            if is_stale(name):
+                with span("build_explanations", model=name):
+                    build([name])
+    frame = get_cache().get(explanation_path(name), _read_table, ("feather",))
+    return frame.copy(deep=False)
+
+
+def team_explanation(name, team):
+    """``(base value, prediction, contributions, inputs)`` of one team.
+
+    ``contributions`` is sorted largest effect first; ``inputs`` are the
+    feature values the model scored.
+    """
+    table = load_explanations(name)
+    row = table.loc[table["Team"] == team].iloc[0]
+    contributions = row.iloc[3:].astype(float)
+    order = contributions.abs().sort_values(ascending=False, kind="stable").index
+    teams, X = model_rows(name)
+    inputs = X.loc[(teams == team).to_numpy()].iloc[0].astype(float)
+    return float(row["BaseValue"]), float(row["Prediction"]), contributions[order], inputs[order]
+
+
+def check(rows=3, tolerance=1e-9):
+    """Additivity on every team, against both the array forest and the sklearn
+    pickle, and brute-force agreement on ``rows`` complete and ``rows``
+    incomplete teams."""
+    import joblib
+
+    from laliga.models import MODELS_DIR, normalise_payload
+
+    report = []
+    for name in MODELS:
+        forest = _forest(get_model(name))
+        sk = normalise_payload(name, joblib.load(MODELS_DIR / MODELS[name])).model
+        _, X = model_rows(name)
+        phi, base = tree_shap(forest, X)
+        explained = base + phi.sum(axis=1)
+        predicted = forest.predict(X)
+        additivity = float(np.max(np.abs(explained - predicted)))
+        sklearn = float(np.max(np.abs(explained - sk.predict(X))))
+        incomplete = X.isna().any(axis=1).to_numpy()
+        sample = np.concatenate(
+            [np.flatnonzero(~incomplete)[:rows], np.flatnonzero(incomplete)[:rows]]
+        )
+        matrix = forest._matrix(X).astype(np.float64)
+        exact = np.array([brute_force_shap(forest, matrix[i]) for i in sample])
+        brute = float(np.max(np.abs(exact - phi[sample])))
+        scale = max(1.0, float(np.max(np.abs(predicted))))
+        report.append(
+            {
+                "model": name,
+                "rows": len(X),
+                "nan_rows": int(incomplete.sum()),
+                "additivity_error": additivity,
+                "sklearn_error": sklearn,
+                "brute_force_error": brute,
+                "ok": max(additivity, sklearn, brute) <= tolerance * scale,
+            }
+        )
+    return pd.DataFrame(report)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--check", action="store_true", help="verify against brute force")
+    parser.add_argument("--team", help="print one team's explanation")
+    parser.add_argument("--model", choices=list(MODELS), default="investment")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        report = check()
+        print(report.to_string(index=False))
+        return 0 if report["ok"].all() else 1
+    if args.team:
+        teams = load_explanations(args.model)["Team"]
+        if args.team not in set(teams):
+            parser.error(f"unknown team: {args.team}")
+        base, prediction, contributions, inputs = team_explanation(args.model, args.team)
+        print(f"{args.model} base value {base:.4f}")
+        table = pd.DataFrame({"value": inputs, "contribution": contributions})
+        formatters = {"value": "{:.4g}".format, "contribution": "{:+.4f}".format}
+        print(table.to_string(formatters=formatters))
+        print(f"prediction {prediction:.4f}")
+        return 0
+    manifest = build()
+    for name, entry in manifest["models"].items():
+        print(f"{name}: {entry['rows']} teams, base value {entry['base_value']:.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,305 @@
+"""Materialised team feature table shared by the pages and model training.
+
+The Predictions page, the Modelling page and ``modelling.ipynb`` each used to
+merge performance, squad, financial and xG metrics on ``Team`` themselves,
+with different source files and column subsets. ``build`` performs that merge
+once with an explicit column selection, checks the result against
+``FEATURE_SCHEMA`` and writes it as Feather next to a JSON manifest recording
+the schema version and the source files it was built from. ``load_features``
+memory-maps the Feather file; the pages read it as built, and rebuilding is
+left to ``build`` (the CLI and the pipeline's features stage) and to training,
+which passes ``rebuild_stale=True``. A source whose timestamps moved but whose content did not
+is hashed once: its new stamps are kept in ``State/feature_stamps.json``, a
+local file outside version control, so the committed manifest is not
+rewritten.
+The file is one uncompressed record batch and is converted with
+``split_blocks``, so numeric columns without gaps are read-only views of the
+mapped file; columns with missing values and ``Team`` are still copied.
+
+``AvgAge_x`` keeps its historical name because the trained models expect it.
+``Elo`` is each team's current rating over the full match history
+(``laliga.elo``), unlike the seven-season averages around it.
+
+Usage::
+
+    python -m laliga.features
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from laliga.data import DATASETS_DIR, dataset_path, file_digest, get_cache, load
+from laliga.profiling import span
+
+SCHEMA_VERSION = 2
+
+FEATURES_DIR = DATASETS_DIR / "Features"
+FEATURES_PATH = FEATURES_DIR / "team_features.feather"
+MANIFEST_PATH = FEATURES_DIR / "team_features.json"
+STAMPS_PATH = DATASETS_DIR / "State" / "feature_stamps.json"
+
+SOURCES = {
+    "performance_metrics": None,
+    "squad_value_scores": [
+        "SquadValueScore",
+        "AvgAge_x",
+        "MinAge",
+        "MaxAge",
+        "UniquePlayers",
+        "TotalPlayers",
+        "YoungPlayers",
+        "PrimePlayers",
+        "ExperiencedPlayers",
+    ],
+    "financial_scores": [
+        "AvgAttendance",
+        "HomeAttendance",
+        "EstimatedMatchdayRevenue",
+        "FinancialScore",
+    ],
+    "xg_metrics": ["AvgxG", "AvgxGA", "xGDifference", "xGMatches"],
+    "elo_ratings": ["Elo"],
+}
+
+_INT = "int64"
+_FLOAT = "float64"
+
+FEATURE_SCHEMA = {
+    "Team": "string",
+    "TotalMatches": _INT,
+    "Wins": _INT,
+    "Draws": _INT,
+    "Losses": _INT,
+    "WinRate": _FLOAT,
+    "DrawRate": _FLOAT,
+    "LossRate": _FLOAT,
+    "TotalGoalsFor": _INT,
+    "TotalGoalsAgainst": _INT,
+    "AvgGoalsFor": _FLOAT,
+    "AvgGoalsAgainst": _FLOAT,
+    "GoalDifference": _INT,
+    "AvgGoalDifference": _FLOAT,
+    "TotalPoints": _INT,
+    "PointsPerGame": _FLOAT,
+    "AvgLeaguePosition": _FLOAT,
+    "BestPosition": _INT,
+    "WorstPosition": _INT,
+    "PositionStdDev": _FLOAT,
+    "ConsistencyScore": _FLOAT,
+    # Squad and financial data do not cover every team, so these stay float
+    # to carry NaN for the missing ones.
+    "SquadValueScore": _FLOAT,
+    "AvgAge_x": _FLOAT,
+    "MinAge": _FLOAT,
+    "MaxAge": _FLOAT,
+    "UniquePlayers": _FLOAT,
+    "TotalPlayers": _FLOAT,
+    "YoungPlayers": _FLOAT,
+    "PrimePlayers": _FLOAT,
+    "ExperiencedPlayers": _FLOAT,
+    "AvgAttendance": _FLOAT,
+    "HomeAttendance": _FLOAT,
+    "EstimatedMatchdayRevenue": _FLOAT,
+    "FinancialScore": _FLOAT,
+    "AvgxG": _FLOAT,
+    "AvgxGA": _FLOAT,
+    "xGDifference": _FLOAT,
+    "xGMatches": _FLOAT,
+    # Current rating from the full match history (``laliga.elo``).
+    "Elo": _FLOAT,
+}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def validate(df):
+    """Raise ``SchemaError`` unless ``df`` matches ``FEATURE_SCHEMA`` exactly."""
+    expected = list(FEATURE_SCHEMA)
+    if list(df.columns) != expected:
+        missing = [c for c in expected if c not in df.columns]
+        extra = [c for c in df.columns if c not in FEATURE_SCHEMA]
+        raise SchemaError(f"feature columns differ: missing={missing} extra={extra}")
+    for col, dtype in FEATURE_SCHEMA.items():
+        actual = df[col].dtype
+        ok = (
+            pd.api.types.is_string_dtype(actual)
+            if dtype == "string"
+            else str(actual) == dtype
+        )
+        if not ok:
+            raise SchemaError(f"column {col!r} has dtype {actual}, expected {dtype}")
+    if df["Team"].duplicated().any():
+        raise SchemaError("duplicate teams in feature table")
+
+
+def merge_sources(frames):
+    """Merge the source frames (keyed like ``SOURCES``) into the feature table."""
+    df = frames["performance_metrics"]
+    for name, cols in SOURCES.items():
+        if cols is None:
+            continue
+        df = df.merge(frames[name][["Team"] + cols], on="Team", how="left")
+    df = df[list(FEATURE_SCHEMA)]
+    return df.astype(
+        {c: ("string" if t == "string" else t) for c, t in FEATURE_SCHEMA.items()}
+    )
+
+
+def _source_stamps():
+    stamps = {}
+    for name in SOURCES:
+        path = dataset_path(name)
+        st = path.stat()
+        stamps[name] = {
+            "path": str(path.relative_to(DATASETS_DIR)),
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "digest": file_digest(path),
+        }
+    return stamps
+
+
+def _version(stamps):
+    digest = hashlib.blake2b(str(SCHEMA_VERSION).encode(), digest_size=6)
+    for stamp in stamps.values():
+        digest.update(stamp["digest"].encode())
+    return digest.hexdigest()
+
+
+def build(out_path=FEATURES_PATH, manifest_path=MANIFEST_PATH):
+    """Build, validate and write the feature table; return its manifest."""
+    df = merge_sources({name: load(name) for name in SOURCES})
+    validate(df)
+
+    stamps = _source_stamps()
+    version = _version(stamps)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    # Uncompressed and in one batch so columns can be mapped without a copy.
+    tmp = out_path.with_suffix(".tmp")
+    feather.write_feather(df, tmp, compression="uncompressed", chunksize=max(1, len(df)))
+    current = read_manifest(manifest_path)
+    if (
+        current is not None
+        and current.get("version") == version
+        and out_path.exists()
+        and file_digest(tmp) == file_digest(out_path)
+    ):
+        # Same sources, same table: keep both files (and their timestamps) as they are.
+        tmp.unlink()
+        return current
+    tmp.replace(out_path)
+
+    manifest = {
+        "schema_version": SCHEMA_VERSION,
+        "version": version,
+        "built_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "rows": len(df),
+        "schema": FEATURE_SCHEMA,
+        "sources": stamps,
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def read_manifest(manifest_path=MANIFEST_PATH):
+    if not manifest_path.exists():
+        return None
+    return json.loads(manifest_path.read_text())
+
+
+def _read_stamps(path=STAMPS_PATH):
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def _write_stamps(stamps, path=STAMPS_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(stamps, indent=2))
+    tmp.replace(path)
+
+
+def is_stale(manifest=None, stamps_path=STAMPS_PATH):
+    manifest = manifest if manifest is not None else read_manifest()
+    if manifest is None or not FEATURES_PATH.exists():
+        return True
+    if manifest.get("schema_version") != SCHEMA_VERSION:
+        return True
+    local = None
+    refreshed = False
+    for name, recorded in manifest["sources"].items():
+        path = dataset_path(name)
+        st = path.stat()
+        stamp = [st.st_mtime_ns, st.st_size, recorded["digest"]]
+        if stamp[:2] == [recorded["mtime_ns"], recorded["size"]]:
+            continue
+        local = _read_stamps(stamps_path) if local is None else local
+        if local.get(recorded["path"]) == stamp:
+            continue
+        # Timestamps moved; only a content change makes it stale.
+        if file_digest(path) != recorded["digest"]:
+            return True
+        local[recorded["path"]] = stamp
+        refreshed = True
+    if refreshed:
+        _write_stamps(local, stamps_path)
+    return False
+
+
+def _read_feather(path):
+    table = feather.read_table(path, memory_map=True)
+    # One block per column: gap-free numeric columns stay views of the map.
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    validate(df)
+    return df
+
+
+_build_lock = threading.Lock()
+
+
+def load_features(rebuild_stale=False):
+    """Return the team feature table.
+
+    With ``rebuild_stale`` the table is rebuilt first if a source has changed;
+    pages leave it off so a rerun never writes into the datasets.
+    """
+    if rebuild_stale and is_stale():
+        with _build_lock:
+            if is_stale():
+                with span("build_features"):
+                    build()
+    frame = get_cache().get(FEATURES_PATH, _read_feather, ("feather",))
+    return frame.copy(deep=False)
+
+
+def features_version():
+    manifest = read_manifest()
+    return manifest["version"] if manifest else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--check", action="store_true", help="only report whether a rebuild is needed"
+    )
+    args = parser.parse_args(argv)
+    if args.check:
+        stale = is_stale()
+        print("stale" if stale else "up to date")
+        return 1 if stale else 0
+    manifest = build()
+    print(f"wrote {FEATURES_PATH} ({manifest['rows']} rows, version {manifest['version']})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
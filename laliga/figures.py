@@ -0,0 +1,178 @@
+"""Cached Plotly figures for the dashboard pages.
+
+Every widget change reruns the whole page script, and building a figure
+with ``plotly.express`` costs tens to hundreds of milliseconds even when
+the chart's inputs did not change. ``cached`` keeps built figures in a
+process-wide LRU keyed by chart name, the version of the data it was built
+from and the selection parameters it depends on, so a rerun only rebuilds
+the charts whose inputs changed. Cached figures are shared between
+sessions and must not be modified after they are returned.
+
+The builders here keep the trace count flat where the chart allows it:
+
+* ``range_segments`` draws one line segment per row as a single trace
+  (segments separated by gaps) instead of one trace per row;
+* ``grouped_lines`` builds one trace per group directly, without the
+  per-call overhead of ``px.line``.
+
+``waterfall`` draws a per-team model explanation (``laliga.explanations``)
+from the base value to the prediction.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+
+from laliga.data import dataset_path
+from laliga.profiling import span
+
+MAX_CACHED_FIGURES = 256
+
+
+class FigureCache:
+    def __init__(self, max_entries=MAX_CACHED_FIGURES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        with span("build_figure", figure=key[0]):
+            fig = build()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = fig
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fig
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_cache = FigureCache()
+
+
+def get_cache():
+    return _cache
+
+
+def dataset_version(*names):
+    """File stamps of the named datasets, for use as a figure version."""
+    stamps = []
+    for name in names:
+        st = dataset_path(name).stat()
+        stamps.append((name, st.st_mtime_ns, st.st_size))
+    return tuple(stamps)
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def cached(name, version, build, **params):
+    """Return ``build(**params)``, built once per ``(name, version, params)``."""
+    key = (name, _freeze(version), _freeze(params))
+    return _cache.get(key, lambda: build(**params))
+
+
+def range_segments(labels, low, high, horizontal=True, **trace):
+    """One trace drawing a ``low``-``high`` segment for every label."""
+    labels = np.asarray(labels, dtype=object)
+    n = len(labels)
+    ends = np.empty(3 * n, dtype=object)
+    ends[0::3] = np.asarray(low, dtype=object)
+    ends[1::3] = np.asarray(high, dtype=object)
+    ends[2::3] = None
+    at = np.repeat(labels, 3)
+    at[2::3] = None
+    x, y = (ends, at) if horizontal else (at, ends)
+    return go.Scatter(x=x, y=y, mode="lines", connectgaps=False, **trace)
+
+
+def grouped_lines(frame, x, y, group, markers=False, title=None):
+    """Line chart with one trace per ``group`` value, in order of appearance."""
+    mode = "lines+markers" if markers else "lines"
+    hover = f"{group}=%{{fullData.name}}<br>{x}=%{{x}}<br>{y}=%{{y}}<extra></extra>"
+    traces = [
+        go.Scatter(
+            x=rows[x].to_numpy(),
+            y=rows[y].to_numpy(),
+            mode=mode,
+            name=str(key),
+            legendgroup=str(key),
+            hovertemplate=hover,
+        )
+        for key, rows in frame.groupby(group, sort=False, observed=True)
+    ]
+    fig = go.Figure(traces)
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y, legend_title_text=group)
+    return fig
+
+
+def _short(value):
+    return f"{value:,.0f}" if abs(value) >= 1000 else f"{value:.3g}"
+
+
+def waterfall(base, prediction, contributions, values=None, title=None, fmt=".2f"):
+    """Base value, one step per feature contribution, and the prediction.
+
+    ``contributions`` is a Series indexed by feature, drawn in its order;
+    ``values`` optionally maps features to the team's input values for the
+    axis labels.
+    """
+    if values is None:
+        labels = [str(f) for f in contributions.index]
+    else:
+        labels = [
+            f"{f} = {_short(values[f])}" if np.isfinite(values[f]) else f"{f} (missing)"
+            for f in contributions.index
+        ]
+    steps = contributions.to_numpy(dtype=float)
+    # Zoom the value axis on the steps rather than on zero.
+    path = base + np.concatenate([[0.0], np.cumsum(steps)])
+    low, high = min(path.min(), prediction), max(path.max(), prediction)
+    pad = 0.2 * (high - low) or 1.0
+    fig = go.Figure(
+        go.Waterfall(
+            orientation="h",
+            measure=["absolute"] + ["relative"] * len(steps) + ["total"],
+            y=["Base value"] + labels + ["Prediction"],
+            x=[base, *steps, prediction],
+            text=[f"{base:{fmt}}", *(f"{v:+{fmt}}" for v in steps), f"{prediction:{fmt}}"],
+            textposition="outside",
+            increasing={"marker": {"color": "#00CC96"}},
+            decreasing={"marker": {"color": "#EF553B"}},
+            totals={"marker": {"color": "#636EFA"}},
+            connector={"line": {"color": "rgba(120, 120, 120, 0.5)"}},
+        )
+    )
+    fig.update_layout(
+        title=title,
+        xaxis={"range": [low - pad, high + pad]},
+        yaxis={"autorange": "reversed"},
+        showlegend=False,
+        height=120 + 36 * (len(steps) + 2),
+    )
+    return fig
@@ -0,0 +1,67 @@
+"""Attendance and financial scores (the ``FinancialAnalysis.ipynb`` stage)."""
+
+import pandas as pd
+
+from laliga.data import load, write_dataset
+
+AVG_TICKET_PRICE = 50
+HOME_MATCHES_PER_SEASON = 19
+
+
+def attendance_metrics(detailed):
+    df = detailed.dropna(subset=["attendance"]).copy()
+    metrics = (
+        df.groupby("team", observed=True)
+        .agg(
+            AvgAttendance=("attendance", "mean"),
+            TotalAttendance=("attendance", "sum"),
+            MaxAttendance=("attendance", "max"),
+            MinAttendance=("attendance", "min"),
+            MatchesWithAttendance=("attendance", "count"),
+        )
+        .reset_index()
+        .rename(columns={"team": "Team"})
+    )
+    venue_att = (
+        df.groupby(["team", "venue"], observed=True)["attendance"]
+        .mean()
+        .unstack()
+        .reset_index()
+        .rename(columns={"team": "Team", "Home": "HomeAttendance", "Away": "AwayAttendance"})
+    )
+    venue_att.columns.name = None
+    metrics = metrics.merge(venue_att, on="Team", how="left")
+    metrics["EstimatedMatchdayRevenue"] = (
+        metrics["AvgAttendance"] * AVG_TICKET_PRICE * HOME_MATCHES_PER_SEASON
+    )
+    metrics["AttendancePerMatch"] = (
+        metrics["TotalAttendance"] / metrics["MatchesWithAttendance"]
+    )
+    return metrics
+
+
+def financial_scores(attendance):
+    scores = attendance.copy()
+    scores["AttendanceScore"] = (
+        scores["AvgAttendance"] / scores["AvgAttendance"].max() * 50
+    ).fillna(0)
+    scores["RevenueScore"] = (
+        scores["EstimatedMatchdayRevenue"] / scores["EstimatedMatchdayRevenue"].max() * 50
+    ).fillna(0)
+    scores["FinancialScore"] = scores["AttendanceScore"] + scores["RevenueScore"]
+    return scores
+
+
+def compute_all(detailed):
+    attendance = attendance_metrics(detailed)
+    scores = financial_scores(attendance)
+    return {
+        "attendance_metrics": attendance,
+        "financial_scores": scores,
+        "financial_scores_only": scores,
+    }
+
+
+def build():
+    for name, df in compute_all(load("matches_detailed")).items():
+        write_dataset(name, df)
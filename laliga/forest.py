@@ -0,0 +1,370 @@
+"""Array-backed Random Forest format with NumPy batch inference.
+
+``export`` flattens every tree of a fitted ``RandomForestRegressor`` into
+shared node arrays (split feature, threshold, left/right child, leaf value)
+with per-tree root offsets, and writes them to an uncompressed ``.npz``
+next to the pickle, together with the feature names, metrics and a digest
+of the pickle they came from. Loading is a handful of ``np.load`` calls:
+no unpickling, no code execution, no dependence on the sklearn version.
+
+For scoring, the export also stores each tree as a list of split tests with
+leaf bitmasks (the QuickScorer layout): a failed test clears the leaves of
+its left subtree, and the leftmost leaf still set is the exit leaf. A batch
+is then scored with one vectorised compare-and-AND per split slot across all
+trees and rows, with no data-dependent branching. Forests with more than 64
+leaves in a tree fall back to a level-by-level walk of the node arrays.
+
+Both paths match sklearn bit for bit: inputs are compared as float32 (as
+sklearn's tree code does), a missing value follows each split's learned
+direction (``tree_.missing_go_to_left``, stored as ``missing_left``) and
+per-tree outputs are accumulated in tree order before averaging.
+
+Each node's weighted training sample count (``cover``) is stored too, for
+the TreeSHAP explanations in ``laliga.explanations``; exports made before
+it was added load with ``cover=None``. Exports before format 3 carry no
+missing-value directions and are treated as stale by ``laliga.models``.
+
+Usage::
+
+    python -m laliga.forest            # export every model pickle to .npz
+    python -m laliga.forest --check    # compare predictions with the pickles
+"""
+
+import argparse
+import copy
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from laliga.data import file_digest
+from laliga.models import MODELS, MODELS_DIR, ModelArtifact, normalise_payload
+
+FORMAT_VERSION = 3
+NODE_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+TABLE_ARRAYS = (
+    "split_feature",
+    "split_threshold",
+    "split_mask",
+    "split_missing_left",
+    "leaf_value",
+)
+CHUNK_ROWS = 256
+
+
+def _float32_floor(threshold):
+    """Largest float32 <= each threshold, so ``x32 <= t`` == ``x32 <= t32``."""
+    t32 = threshold.astype(np.float32)
+    over = t32.astype(np.float64) > threshold
+    t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+    return t32
+
+
+def leaf_tables(feature, threshold, left, right, value, roots, missing_left):
+    """Per-tree split tests and leaf bitmasks, or ``None`` past 64 leaves.
+
+    Returns ``(split_feature, split_threshold, split_mask,
+    split_missing_left)`` of shape (max splits, trees), padded with
+    always-passing tests, and ``leaf_value`` of shape (trees, max leaves) in
+    left-to-right order.
+    """
+    ends = np.append(roots[1:], len(left))
+    trees = []
+    for root, end in zip(roots, ends):
+        n_leaves = int((left[root:end] < 0).sum())
+        if n_leaves > 64:
+            return None
+        leaves = []
+        splits = []
+        # Iterative in-order walk; a split's mask is known once its left
+        # subtree's leaves have been numbered.
+        stack = [(root, False)]
+        first = {}
+        while stack:
+            node, left_done = stack.pop()
+            if left[node] < 0:
+                leaves.append(node)
+            elif not left_done:
+                first[node] = len(leaves)
+                stack.append((node, True))
+                stack.append((left[node], False))
+            else:
+                bits = sum(1 << i for i in range(first[node], len(leaves)))
+                splits.append((feature[node], threshold[node], bits, missing_left[node]))
+                stack.append((right[node], False))
+        trees.append((splits, leaves))
+
+    n_trees = len(trees)
+    max_splits = max(1, max(len(sp) for sp, _ in trees))
+    max_leaves = max(len(lv) for _, lv in trees)
+    dtype = next(
+        t for t in (np.uint8, np.uint16, np.uint32, np.uint64) if np.iinfo(t).bits >= max_leaves
+    )
+    full = np.iinfo(dtype).max
+    split_feature = np.zeros((max_splits, n_trees), dtype=np.int32)
+    split_threshold = np.full((max_splits, n_trees), np.inf)
+    split_mask = np.full((max_splits, n_trees), full, dtype=dtype)
+    split_missing_left = np.ones((max_splits, n_trees), dtype=bool)
+    leaf_value = np.zeros((n_trees, max_leaves))
+    for k, (splits, leaves) in enumerate(trees):
+        for j, (f, t, bits, nan_left) in enumerate(splits):
+            split_feature[j, k] = f
+            split_threshold[j, k] = t
+            split_mask[j, k] = full ^ bits
+            split_missing_left[j, k] = nan_left
+        leaf_value[k, : len(leaves)] = value[leaves]
+    return (
+        split_feature,
+        _float32_floor(split_threshold),
+        split_mask,
+        split_missing_left,
+        leaf_value,
+    )
+
+
+class ArrayForest:
+    """Mean of regression trees stored as flat node arrays."""
+
+    def __init__(self, nodes, features, depth, tables=None, cover=None, missing_left=None):
+        self.feature, self.threshold, self.left, self.right, self.value, self.roots = nodes
+        self.tables = tables
+        self.cover = cover
+        # Direction of a NaN at each split (True: left), as sklearn learned it.
+        if missing_left is None:
+            missing_left = np.ones(len(self.feature), dtype=bool)
+        self.missing_left = missing_left
+        self.feature_names_in_ = np.array(features, dtype=object)
+        self.n_features_in_ = len(features)
+        self.n_estimators = len(self.roots)
+        self.max_depth = depth
+
+    @classmethod
+    def from_sklearn(cls, model, features=None):
+        trees = [est.tree_ for est in model.estimators_]
+        offsets = np.cumsum([0] + [t.node_count for t in trees])
+        left = []
+        right = []
+        for tree, offset in zip(trees, offsets):
+            is_leaf = tree.children_left < 0
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+        if features is None:
+            features = list(getattr(model, "feature_names_in_", range(model.n_features_in_)))
+        nodes = (
+            np.concatenate([np.maximum(t.feature, 0) for t in trees]).astype(np.int32),
+            np.concatenate([t.threshold for t in trees]),
+            np.concatenate(left).astype(np.int32),
+            np.concatenate(right).astype(np.int32),
+            np.concatenate([t.value[:, 0, 0] for t in trees]),
+            offsets[:-1].astype(np.int32),
+        )
+        missing_left = np.concatenate([t.missing_go_to_left for t in trees]).astype(bool)
+        return cls(
+            nodes,
+            [str(f) for f in features],
+            max(t.max_depth for t in trees),
+            leaf_tables(*nodes, missing_left),
+            np.concatenate([t.weighted_n_node_samples for t in trees]),
+            missing_left,
+        )
+
+    def _matrix(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[list(self.feature_names_in_)]
+        # sklearn trees split on float32 inputs.
+        return np.asarray(X, dtype=np.float32)
+
+    def apply(self, X):
+        """Leaf node index for every (row, tree), walking the node arrays."""
+        X = self._matrix(X).astype(np.float64)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.n_estimators)).copy()
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            inner = left >= 0
+            if not inner.any():
+                break
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(inner, np.where(go_left, left, self.right[node]), node)
+        return node
+
+    def _leaf_values(self, XT):
+        """(trees, rows) leaf values for a transposed float32 chunk."""
+        split_feature, split_threshold, split_mask, split_missing_left, leaf_value = self.tables
+        one = split_mask.dtype.type(1)
+        exit_mask = np.full((self.n_estimators, XT.shape[1]), ~split_mask.dtype.type(0))
+        has_nan = np.isnan(XT).any()
+        for feature, threshold, mask, nan_left in zip(
+            split_feature, split_threshold, split_mask, split_missing_left
+        ):
+            x = XT[feature]
+            failed = threshold[:, None] < x
+            if has_nan:
+                # NaN compares False (passes, goes left); fail it where it goes right.
+                failed |= np.isnan(x) & ~nan_left[:, None]
+            # failed -> mask; passed -> all ones
+            exit_mask &= mask[:, None] | (failed.astype(split_mask.dtype) - one)
+        lowest = exit_mask & (~exit_mask + one)
+        leaf = np.log2(lowest.astype(np.float64)).astype(np.intp)
+        return leaf_value[np.arange(self.n_estimators)[:, None], leaf]
+
+    def predict(self, X):
+        if self.tables is None:
+            per_tree = self.value[self.apply(X)].T
+        else:
+            XT = np.ascontiguousarray(self._matrix(X).T)
+            chunks = [
+                self._leaf_values(XT[:, i : i + CHUNK_ROWS])
+                for i in range(0, XT.shape[1], CHUNK_ROWS)
+            ]
+            per_tree = np.concatenate(chunks, axis=1) if chunks else np.zeros((0, 0))
+        total = np.zeros(per_tree.shape[1])
+        for tree in per_tree:
+            total += tree
+        return total / self.n_estimators
+
+
+def export(model, path, name=None, source=None):
+    """Write a model (pickle payload or ``ModelArtifact``) as an ``.npz``.
+
+    ``source`` is the pickle it came from; its digest is recorded so a stale
+    export can be detected after the pickle is rewritten.
+    """
+    artifact = model if isinstance(model, ModelArtifact) else normalise_payload(name, model)
+    forest = ArrayForest.from_sklearn(artifact.model, artifact.features)
+    fi = artifact.feature_importance
+    meta = {
+        "format": FORMAT_VERSION,
+        "name": artifact.name,
+        "features": artifact.features,
+        "metrics": artifact.metrics,
+        "params": artifact.params,
+        "trained_at": artifact.trained_at,
+        "feature_importance": None if fi is None else fi.to_dict(orient="list"),
+        "source_digest": file_digest(source) if source is not None else None,
+        "max_depth": forest.max_depth,
+    }
+    arrays = {k: getattr(forest, k) for k in NODE_ARRAYS}
+    if forest.tables is not None:
+        arrays.update(zip(TABLE_ARRAYS, forest.tables))
+    if forest.cover is not None:
+        arrays["cover"] = forest.cover
+    arrays["missing_left"] = forest.missing_left
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    np.savez(tmp, meta=np.array(json.dumps(meta)), **arrays)
+    tmp.replace(path)
+    return path
+
+
+def read_meta(path):
+    with np.load(path, allow_pickle=False) as npz:
+        return json.loads(str(npz["meta"]))
+
+
+def load(path):
+    """Return ``(ArrayForest, meta)`` from an exported ``.npz``."""
+    with np.load(path, allow_pickle=False) as npz:
+        meta = json.loads(str(npz["meta"]))
+        nodes = tuple(npz[k] for k in NODE_ARRAYS)
+        tables = tuple(npz[k] for k in TABLE_ARRAYS) if TABLE_ARRAYS[0] in npz else None
+        cover = npz["cover"] if "cover" in npz else None
+        missing_left = npz["missing_left"] if "missing_left" in npz else None
+    forest = ArrayForest(nodes, meta["features"], meta["max_depth"], tables, cover, missing_left)
+    return forest, meta
+
+
+def array_path(pickle_path):
+    return pickle_path.with_suffix(".npz")
+
+
+def export_all(names=None):
+    import joblib
+
+    paths = []
+    for name in names or MODELS:
+        source = MODELS_DIR / MODELS[name]
+        payload = joblib.load(source)
+        paths.append(export(payload, array_path(source), name=name, source=source))
+    return paths
+
+
+def check(names=None, rows=1000, seed=0, nan_rate=0.1):
+    """Compare array and sklearn predictions on real and random rows.
+
+    The real rows keep their missing values, and ``nan_rate`` of the random
+    cells are blanked so every split's missing-value direction is exercised.
+    """
+    import joblib
+
+    from laliga.features import load_features
+
+    features = load_features()
+    rng = np.random.default_rng(seed)
+    report = []
+    for name in names or MODELS:
+        source = MODELS_DIR / MODELS[name]
+        sk = normalise_payload(name, joblib.load(source))
+        forest, _ = load(array_path(source))
+        real = features[sk.features].astype(float)
+        lo, hi = real.min().to_numpy(), real.max().to_numpy()
+        span = np.where(hi > lo, hi - lo, 1.0)
+        noise = rng.uniform(lo - span * 0.2, hi + span * 0.2, size=(rows, len(sk.features)))
+        noise[rng.random(noise.shape) < nan_rate] = np.nan
+        X = pd.concat([real, pd.DataFrame(noise, columns=sk.features)], ignore_index=True)
+
+        start = time.perf_counter()
+        expected = sk.model.predict(X)
+        sk_batch = time.perf_counter() - start
+        start = time.perf_counter()
+        actual = forest.predict(X)
+        np_batch = time.perf_counter() - start
+        one = X.iloc[[0]]
+        start = time.perf_counter()
+        for _ in range(20):
+            sk.model.predict(one)
+        sk_single = (time.perf_counter() - start) / 20
+        start = time.perf_counter()
+        for _ in range(20):
+            forest.predict(one)
+        np_single = (time.perf_counter() - start) / 20
+        walker = copy.copy(forest)
+        walker.tables = None
+        walked = walker.predict(X)
+        report.append(
+            {
+                "model": name,
+                "rows": len(X),
+                "nan_rows": int(X.isna().any(axis=1).sum()),
+                "identical": bool(
+                    np.array_equal(expected, actual) and np.array_equal(expected, walked)
+                ),
+                "max_abs_diff": float(
+                    max(np.max(np.abs(expected - actual)), np.max(np.abs(expected - walked)))
+                ),
+                "sklearn_batch_ms": sk_batch * 1e3,
+                "numpy_batch_ms": np_batch * 1e3,
+                "sklearn_row_ms": sk_single * 1e3,
+                "numpy_row_ms": np_single * 1e3,
+            }
+        )
+    return pd.DataFrame(report)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--check", action="store_true", help="compare with the pickles")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        report = check()
+        print(report.to_string(index=False))
+        return 0 if report["identical"].all() else 1
+    for path in export_all():
+        print(f"wrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,166 @@
+"""Rolling form and date-windowed team metrics.
+
+``MatchStore`` holds one row per team per match from ``matches_detailed``,
+indexed by (team, date) and sorted, so a team's matches in a date range are
+an index slice rather than a boolean filter over the whole table. The two
+raw sources overlap for most seasons; repeated (team, date, opponent) rows
+are kept once.
+
+Rolling columns are computed over each team's full history, then sliced, so
+the first matches inside a date range still carry a full N-match window:
+
+* ``FormPoints`` / ``FormPPG`` - points over the last N matches
+* ``RollingxG`` / ``RollingxGA`` / ``RollingxGDiff`` - N-match mean xG trends
+* ``EWStrength`` - exponentially weighted points share (span N), 0 to 1
+
+The store holds La Liga's partitions of ``matches_detailed`` only (see
+``laliga.partitions``). Queries are cached per (teams, window, date range)
+and dropped when the partitions or the source CSV change.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from laliga.data import dataset_path
+from laliga.partitions import DEFAULT_COMPETITION, load_partitions, manifest_version
+
+DEFAULT_WINDOW = 10
+MAX_CACHED_QUERIES = 64
+POINTS = {"W": 3, "D": 1, "L": 0}
+
+
+class MatchStore:
+    def __init__(self, detailed):
+        df = detailed.drop_duplicates(["team", "date", "opponent"])
+        frame = pd.DataFrame(
+            {
+                "Team": df["team"].astype(str).to_numpy(),
+                "Date": pd.to_datetime(df["date"]).to_numpy(),
+                "Season": df["season"].to_numpy(),
+                "Opponent": df["opponent"].astype(str).to_numpy(),
+                "Venue": df["venue"].astype(str).to_numpy(),
+                "Result": df["result"].astype(str).to_numpy(),
+                "Points": df["result"].astype(str).map(POINTS).to_numpy(dtype=float),
+                "GoalsFor": df["gf"].to_numpy(dtype=float),
+                "GoalsAgainst": df["ga"].to_numpy(dtype=float),
+                "xG": df["xg"].to_numpy(dtype=float),
+                "xGA": df["xga"].to_numpy(dtype=float),
+            }
+        )
+        self.frame = frame.set_index(["Team", "Date"]).sort_index()
+        self.teams = list(self.frame.index.levels[0])
+        dates = self.frame.index.get_level_values("Date")
+        self.first_date, self.last_date = dates.min(), dates.max()
+        self._rolled = {}
+        self._lock = threading.Lock()
+
+    def rolled(self, window):
+        """All teams' matches with rolling columns for ``window``, computed once."""
+        with self._lock:
+            if window in self._rolled:
+                return self._rolled[window]
+        by_team = self.frame.groupby(level="Team", sort=False)
+        rolling = by_team[["Points", "xG", "xGA"]].rolling(window, min_periods=1)
+        points = rolling["Points"].sum().droplevel(0)
+        means = rolling[["xG", "xGA"]].mean().droplevel(0)
+        played = by_team["Points"].rolling(window, min_periods=1).count().droplevel(0)
+        ew = by_team["Points"].transform(lambda s: s.ewm(span=window).mean())
+        out = self.frame.assign(
+            FormPoints=points,
+            FormPPG=points / played,
+            RollingxG=means["xG"],
+            RollingxGA=means["xGA"],
+            RollingxGDiff=means["xG"] - means["xGA"],
+            EWStrength=ew / 3,
+        )
+        with self._lock:
+            self._rolled[window] = out
+        return out
+
+    def window(self, teams, window=DEFAULT_WINDOW, start=None, end=None):
+        """Matches of ``teams`` between ``start`` and ``end`` (inclusive)."""
+        rolled = self.rolled(window)
+        start = pd.Timestamp(start) if start is not None else self.first_date
+        end = pd.Timestamp(end) if end is not None else self.last_date
+        teams = [t for t in teams if t in rolled.index.levels[0]]
+        if not teams:
+            return rolled.iloc[:0].reset_index()
+        return rolled.loc[(teams, slice(start, end)), :].reset_index()
+
+    def summary(self, teams, window=DEFAULT_WINDOW, start=None, end=None):
+        """Per-team totals over the range plus form at its last match."""
+        matches = self.window(teams, window, start, end)
+        if matches.empty:
+            return pd.DataFrame()
+        grouped = matches.groupby("Team", sort=False)
+        out = grouped.agg(
+            Matches=("Points", "size"),
+            Points=("Points", "sum"),
+            GoalsFor=("GoalsFor", "sum"),
+            GoalsAgainst=("GoalsAgainst", "sum"),
+            xG=("xG", "sum"),
+            xGA=("xGA", "sum"),
+        )
+        out["PointsPerGame"] = out["Points"] / out["Matches"]
+        last = grouped.tail(1).set_index("Team")
+        out[f"Last{window}PPG"] = last["FormPPG"]
+        out["EWStrength"] = last["EWStrength"]
+        out["Form"] = grouped["Result"].agg(lambda r: "".join(r.iloc[-5:]))
+        out["Points"] = out["Points"].astype(int)
+        return out.reset_index().sort_values("EWStrength", ascending=False, ignore_index=True)
+
+
+class _QueryCache:
+    def __init__(self, max_entries=MAX_CACHED_QUERIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.store = None
+        self.stamp = None
+
+    def get_store(self):
+        st = dataset_path("matches_detailed").stat()
+        stamp = (st.st_mtime_ns, st.st_size, manifest_version())
+        with self._lock:
+            if self.store is not None and self.stamp == stamp:
+                return self.store
+        store = MatchStore(load_partitions("matches_detailed", competitions=DEFAULT_COMPETITION))
+        with self._lock:
+            self.store, self.stamp = store, stamp
+            self._entries.clear()
+        return store
+
+    def get(self, kind, teams, window, start, end):
+        store = self.get_store()
+        key = (kind, tuple(teams), window, str(start), str(end))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        result = getattr(store, kind)(teams, window, start, end)
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+
+_cache = _QueryCache()
+
+
+def get_store():
+    """The ``MatchStore`` for the current La Liga ``matches_detailed`` partitions."""
+    return _cache.get_store()
+
+
+def team_form(teams, window=DEFAULT_WINDOW, start=None, end=None):
+    """Cached ``MatchStore.window``."""
+    return _cache.get("window", teams, window, start, end)
+
+
+def form_summary(teams, window=DEFAULT_WINDOW, start=None, end=None):
+    """Cached ``MatchStore.summary``."""
+    return _cache.get("summary", teams, window, start, end)
@@ -0,0 +1,256 @@
+"""Head-to-head records for every team pair and season.
+
+``H2HIndex`` holds one dense ``(season, home team, away team, stat)`` array
+built from ``matches_5y`` (results and goals) and the home-side rows of
+``matches_detailed`` (xG), with the seasons accumulated: entry ``s`` is the
+total over the first ``s`` seasons. The record of any pair over any season
+range is then a difference of two slices, so a lookup costs the same for a
+single season as for the whole history, and for any pair of teams rather
+than only the top-six teams ``analysis.ipynb`` tabulates.
+
+Records are from the first team's perspective and split by venue: ``Home``
+is the first team's home games against the second, ``Away`` the return
+fixtures. xG averages use only the matches that have xG data.
+
+The index is built once per version of the underlying partitions and
+shared by every session.
+
+Usage::
+
+    python -m laliga.h2h "Real Madrid" Barcelona
+    python -m laliga.h2h Sevilla "Real Betis" --first 2021-22 --last 2023-24
+    python -m laliga.h2h --check        # totals == h2h_details.csv
+"""
+
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+
+from laliga.data import dataset_path, load
+from laliga.partitions import DEFAULT_COMPETITION, load_partitions, manifest_version, season_of
+
+# matches_detailed opponent names -> matches_5y names
+DETAILED_ALIASES = {
+    "Almería": "Almeria",
+    "Atlético Madrid": "Atletico Madrid",
+    "Espanyol": "Espanol",
+}
+
+# Per (season, home, away), from the home side.
+STATS = [
+    "Matches",
+    "HomeWins",
+    "Draws",
+    "AwayWins",
+    "HomeGoals",
+    "AwayGoals",
+    "xGMatches",
+    "HomexG",
+    "AwayxG",
+]
+_S = {name: k for k, name in enumerate(STATS)}
+
+# Record column -> (stat at home, stat away), from the first team's side.
+RECORD = {
+    "Matches": ("Matches", "Matches"),
+    "Wins": ("HomeWins", "AwayWins"),
+    "Draws": ("Draws", "Draws"),
+    "Losses": ("AwayWins", "HomeWins"),
+    "GoalsFor": ("HomeGoals", "AwayGoals"),
+    "GoalsAgainst": ("AwayGoals", "HomeGoals"),
+    "xGMatches": ("xGMatches", "xGMatches"),
+    "xG": ("HomexG", "AwayxG"),
+    "xGA": ("AwayxG", "HomexG"),
+}
+_HOME = [_S[home] for home, _ in RECORD.values()]
+_AWAY = [_S[away] for _, away in RECORD.values()]
+
+
+def _results(matches):
+    """Season, home, away and the result/goal stats of every match."""
+    goals_home = matches["FTHG"].to_numpy(dtype=float)
+    goals_away = matches["FTAG"].to_numpy(dtype=float)
+    return pd.DataFrame(
+        {
+            "Season": matches["Season"].astype(str).to_numpy(),
+            "HomeTeam": matches["HomeTeam"].astype(str).to_numpy(),
+            "AwayTeam": matches["AwayTeam"].astype(str).to_numpy(),
+            "Matches": 1.0,
+            "HomeWins": (goals_home > goals_away).astype(float),
+            "Draws": (goals_home == goals_away).astype(float),
+            "AwayWins": (goals_home < goals_away).astype(float),
+            "HomeGoals": goals_home,
+            "AwayGoals": goals_away,
+        }
+    )
+
+
+def _expected_goals(detailed):
+    """Season, home, away and xG of every match with xG, counted once."""
+    home = detailed[detailed["venue"].astype(str) == "Home"]
+    frame = pd.DataFrame(
+        {
+            "Date": pd.to_datetime(home["date"]).to_numpy(),
+            "HomeTeam": home["team"].astype(str).replace(DETAILED_ALIASES).to_numpy(),
+            "AwayTeam": home["opponent"].astype(str).replace(DETAILED_ALIASES).to_numpy(),
+            "HomexG": home["xg"].to_numpy(dtype=float),
+            "AwayxG": home["xga"].to_numpy(dtype=float),
+        }
+    )
+    frame = frame.dropna(subset=["HomexG", "AwayxG"])
+    frame = frame.drop_duplicates(["Date", "HomeTeam", "AwayTeam"])
+    frame.insert(0, "Season", season_of(frame["Date"]).to_numpy())
+    frame["xGMatches"] = 1.0
+    return frame.drop(columns="Date")
+
+
+class H2HIndex:
+    def __init__(self, matches, detailed, version=None):
+        results = _results(matches)
+        xg = _expected_goals(detailed)
+        self.version = version
+        self.teams = sorted(set(results["HomeTeam"]) | set(results["AwayTeam"]))
+        self.seasons = sorted(set(results["Season"]) | set(xg["Season"].dropna()))
+        self.index = {team: i for i, team in enumerate(self.teams)}
+        self.season_index = {season: s for s, season in enumerate(self.seasons)}
+
+        counts = np.zeros((len(self.seasons), len(self.teams), len(self.teams), len(STATS)))
+        for frame in (results, xg):
+            s = frame["Season"].map(self.season_index).to_numpy()
+            i = frame["HomeTeam"].map(self.index).to_numpy()
+            j = frame["AwayTeam"].map(self.index).to_numpy()
+            # Teams outside the results table (other competitions) are dropped.
+            keep = ~(pd.isna(s) | pd.isna(i) | pd.isna(j))
+            s, i, j = (a[keep].astype(int) for a in (s, i, j))
+            for name in frame.columns.intersection(STATS):
+                np.add.at(counts[..., _S[name]], (s, i, j), frame[name].to_numpy()[keep])
+
+        self.cumulative = np.zeros((len(self.seasons) + 1,) + counts.shape[1:])
+        np.cumsum(counts, axis=0, out=self.cumulative[1:])
+
+    def _span(self, first, last):
+        lo = 0 if first is None else self.season_index[first]
+        hi = len(self.seasons) - 1 if last is None else self.season_index[last]
+        if lo > hi:
+            lo, hi = hi, lo
+        return lo, hi + 1
+
+    def totals(self, first=None, last=None):
+        """``(home, away, stat)`` sums over the seasons ``first``..``last``."""
+        lo, hi = self._span(first, last)
+        return self.cumulative[hi] - self.cumulative[lo]
+
+    def _pair_stats(self, team, opponent, first, last):
+        lo, hi = self._span(first, last)
+        i, j = self.index[team], self.index[opponent]
+        home = self.cumulative[hi, i, j] - self.cumulative[lo, i, j]
+        away = self.cumulative[hi, j, i] - self.cumulative[lo, j, i]
+        return home[_HOME], away[_AWAY]
+
+    def pair(self, team, opponent, first=None, last=None):
+        """``team``'s record against ``opponent``: ``Home``, ``Away`` and ``Total`` rows."""
+        home, away = self._pair_stats(team, opponent, first, last)
+        record = pd.DataFrame(
+            [home, away, home + away], index=["Home", "Away", "Total"], columns=list(RECORD)
+        )
+        return _with_rates(record)
+
+    def opponents(self, team, first=None, last=None):
+        """``team``'s total record against every opponent it has played."""
+        totals = self.totals(first, last)
+        i = self.index[team]
+        record = pd.DataFrame(
+            totals[i][:, _HOME] + totals[:, i][:, _AWAY], index=self.teams, columns=list(RECORD)
+        )
+        record = record[record["Matches"] > 0].drop(index=team, errors="ignore")
+        record.index.name = "Opponent"
+        return _with_rates(record).sort_values("Matches", ascending=False, kind="stable")
+
+
+def _with_rates(record):
+    matches = record["Matches"].where(record["Matches"] > 0)
+    xg_matches = record["xGMatches"].where(record["xGMatches"] > 0)
+    counts = ["Matches", "Wins", "Draws", "Losses", "GoalsFor", "GoalsAgainst", "xGMatches"]
+    record[counts] = record[counts].astype(int)
+    record["WinRate"] = record["Wins"] / matches
+    record["PPG"] = (3 * record["Wins"] + record["Draws"]) / matches
+    record["xGPerMatch"] = record["xG"] / xg_matches
+    record["xGAPerMatch"] = record["xGA"] / xg_matches
+    return record
+
+
+_lock = threading.Lock()
+_current = None
+
+
+def _version():
+    stamps = []
+    for name in ("matches_5y", "matches_detailed"):
+        st = dataset_path(name).stat()
+        stamps.append((st.st_mtime_ns, st.st_size))
+    return tuple(stamps), manifest_version()
+
+
+def get_index():
+    """Index over the current La Liga partitions, built once per version."""
+    global _current
+    version = _version()
+    index = _current
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        if _current is None or _current.version != version:
+            _current = H2HIndex(
+                load_partitions("matches_5y", competitions=DEFAULT_COMPETITION),
+                load_partitions("matches_detailed", competitions=DEFAULT_COMPETITION),
+                version,
+            )
+        return _current
+
+
+def check(index=None):
+    """Compare all-season totals with the top-team pairs in ``h2h_details``."""
+    index = index or get_index()
+    expected = load("h2h_details")
+    failures = []
+    for row in expected.itertuples(index=False):
+        total = index.pair(row.Team, row.Opponent).loc["Total"]
+        got = (total["Matches"], total["Wins"], total["Draws"], total["Losses"])
+        if got != (row.Matches, row.Wins, row.Draws, row.Losses):
+            failures.append((row.Team, row.Opponent, got))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("teams", nargs="*", metavar="TEAM", help="team, or team and opponent")
+    parser.add_argument("--first", help="first season, e.g. 2021-22")
+    parser.add_argument("--last", help="last season")
+    parser.add_argument("--check", action="store_true", help="compare with h2h_details.csv")
+    args = parser.parse_args(argv)
+
+    index = get_index()
+    if args.check:
+        failures = check(index)
+        for team, opponent, got in failures:
+            print(f"{team} v {opponent}: {got}")
+        print("ok" if not failures else f"{len(failures)} pair(s) differ")
+        return 1 if failures else 0
+    unknown = [t for t in args.teams if t not in index.index]
+    unknown += [s for s in (args.first, args.last) if s and s not in index.season_index]
+    if unknown or len(args.teams) not in (1, 2):
+        parser.error(
+            f"unknown: {', '.join(unknown)}" if unknown else "give one team or two teams"
+        )
+    if len(args.teams) == 1:
+        record = index.opponents(args.teams[0], args.first, args.last)
+    else:
+        record = index.pair(*args.teams, args.first, args.last)
+    print(record.to_string(float_format=lambda v: f"{v:.2f}"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,514 @@
+"""Incremental matchweek ingestion.
+
+Rerunning ``cleaning.ipynb`` and ``analysis.ipynb`` after every matchday
+recomputes seven seasons of aggregates to absorb a handful of new matches.
+``IncrementalState`` keeps running per-season/per-team accumulators (matches,
+W/D/L, goals, points), per-team sums and counts for the detailed match stats
+and xG, and the league position of every team in every season. Applying new
+match rows only touches the accumulators of the teams involved and re-ranks
+only the seasons they belong to; ``team_stats``, ``league_positions``,
+``performance_metrics`` and ``xg_metrics`` are then rebuilt from the
+accumulators alone, never from the match history.
+
+New rows are detected with a per-source watermark (the latest match date
+ingested plus the keys of the matches on that date), so the state stays the
+same size however many seasons have been ingested. Corrections to matches
+older than the watermark need a fresh ``--init``; ``cleaning.build`` does
+one after every rewrite of the cleaned tables. The cleaned tables'
+partitions (``laliga.partitions``) are kept in step: only the
+(competition, season) partitions the new rows fall in are rewritten, plus
+``team_stats`` whole, and the manifest is updated. The Elo ratings are
+advanced from the same raw match file (``laliga.elo``). The head-to-head
+and home/away tables are not maintained here; rebuild them with
+``python -m laliga.metrics``.
+
+Usage::
+
+    python -m laliga.incremental --init
+    python -m laliga.incremental --matches Datasets/LaLiga_Matches.csv \\
+        --detailed Datasets/matches_laliga.csv
+    python -m laliga.incremental --verify 40
+"""
+
+import argparse
+import json
+import math
+
+import pandas as pd
+
+from laliga import elo, partitions
+from laliga.cleaning import DETAILED_NUMERIC, clean_detailed, clean_matches
+from laliga.data import DATASETS_DIR, dataset_path, load, write_dataset
+
+STATE_PATH = DATASETS_DIR / "State" / "incremental_state.json"
+
+# Per (season, team): matches, wins, draws, losses, goals for/against, points.
+_M, _W, _D, _L, _GF, _GA, _PTS = range(7)
+
+PLAYER_COLUMNS = ["TotalGoals", "TotalAssists", "TotalxG", "TotalxAG", "PlayerCount", "AvgAge"]
+
+
+def _nan_to_none(value):
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+def _none_to_nan(value):
+    return float("nan") if value is None else value
+
+
+class IncrementalState:
+    def __init__(self):
+        self.season_team = {}
+        self.team_order = []
+        self.positions = {}
+        # Per team: {column: [sum, non-null count]} over matches_detailed.
+        self.detailed = {}
+        # Per team: [xg, xga, gf, gf_n, ga, ga_n, n] over rows with xg and xga.
+        self.xg = {}
+        self.detailed_team_order = []
+        self.players = {}
+        self.watermarks = {"matches": None, "detailed": None}
+
+    # -- bootstrapping and persistence ------------------------------------
+
+    @classmethod
+    def from_cleaned(cls, matches, detailed, team_stats=None):
+        """Build the state from the full cleaned ``matches_5y``/``matches_detailed``."""
+        state = cls()
+        state.apply_matches(matches)
+        state.apply_detailed(detailed)
+        if team_stats is not None:
+            players = team_stats.drop_duplicates("Team").set_index("Team")[PLAYER_COLUMNS]
+            state.players = {
+                team: [_nan_to_none(float(v)) for v in row]
+                for team, row in players.iterrows()
+            }
+        return state
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        raw = json.loads(path.read_text())
+        state = cls()
+        state.season_team = raw["season_team"]
+        state.team_order = raw["team_order"]
+        state.positions = raw["positions"]
+        state.detailed = raw["detailed"]
+        state.xg = raw["xg"]
+        state.detailed_team_order = raw["detailed_team_order"]
+        state.players = raw["players"]
+        state.watermarks = raw["watermarks"]
+        return state
+
+    def save(self, path=STATE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        raw = {
+            "season_team": self.season_team,
+            "team_order": self.team_order,
+            "positions": self.positions,
+            "detailed": self.detailed,
+            "xg": self.xg,
+            "detailed_team_order": self.detailed_team_order,
+            "players": self.players,
+            "watermarks": self.watermarks,
+        }
+        text = json.dumps(raw)
+        if path.exists() and path.read_text() == text:
+            return
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(text)
+        tmp.replace(path)
+
+    # -- new-row detection -------------------------------------------------
+
+    @staticmethod
+    def _match_keys(df):
+        return df["HomeTeam"].astype(str) + "|" + df["AwayTeam"].astype(str)
+
+    @staticmethod
+    def _detailed_keys(df):
+        return df["team"].astype(str) + "|" + df["opponent"].astype(str)
+
+    def _new_rows(self, df, source, date_col, keys):
+        dates = pd.to_datetime(df[date_col]).dt.strftime("%Y-%m-%d")
+        mark = self.watermarks[source]
+        if mark is None:
+            return df
+        newer = dates > mark["date"]
+        same_day = (dates == mark["date"]) & ~keys.isin(mark["keys"])
+        return df[newer | same_day]
+
+    def _advance(self, source, df, date_col, keys):
+        if df.empty:
+            return
+        dates = pd.to_datetime(df[date_col]).dt.strftime("%Y-%m-%d")
+        latest = dates.max()
+        mark = self.watermarks[source]
+        latest_keys = keys[dates == latest].tolist()
+        if mark is not None and mark["date"] == latest:
+            latest_keys = mark["keys"] + latest_keys
+        elif mark is not None and mark["date"] > latest:
+            return
+        self.watermarks[source] = {"date": latest, "keys": latest_keys}
+
+    def new_matches(self, matches):
+        return self._new_rows(matches, "matches", "Date", self._match_keys(matches))
+
+    def new_detailed(self, detailed):
+        return self._new_rows(detailed, "detailed", "date", self._detailed_keys(detailed))
+
+    # -- applying rows -----------------------------------------------------
+
+    def apply_matches(self, matches):
+        """Add cleaned ``matches_5y`` rows; return the set of affected seasons."""
+        for team in pd.unique(matches["HomeTeam"]):
+            if team not in self.team_order:
+                self.team_order.append(team)
+
+        seasons = set()
+        sides = (
+            ("HomeTeam", "FTHG", "FTAG", "HomePoints"),
+            ("AwayTeam", "FTAG", "FTHG", "AwayPoints"),
+        )
+        for team_col, gf_col, ga_col, pts_col in sides:
+            side = pd.DataFrame(
+                {
+                    "Season": matches["Season"],
+                    "Team": matches[team_col],
+                    "GoalsFor": matches[gf_col],
+                    "GoalsAgainst": matches[ga_col],
+                    "Points": matches[pts_col],
+                }
+            )
+            side["Win"] = side["Points"] == 3
+            side["Draw"] = side["Points"] == 1
+            side["Loss"] = side["Points"] == 0
+            grouped = side.groupby(["Season", "Team"]).agg(
+                n=("Points", "size"),
+                w=("Win", "sum"),
+                d=("Draw", "sum"),
+                l=("Loss", "sum"),
+                gf=("GoalsFor", "sum"),
+                ga=("GoalsAgainst", "sum"),
+                pts=("Points", "sum"),
+            )
+            for (season, team), row in zip(grouped.index, grouped.itertuples(index=False)):
+                acc = self.season_team.setdefault(season, {}).setdefault(team, [0] * 7)
+                for i, value in enumerate(row):
+                    acc[i] += int(value)
+                seasons.add(season)
+
+        for season in sorted(seasons):
+            self._rank(season)
+        self._advance("matches", matches, "Date", self._match_keys(matches))
+        return seasons
+
+    def apply_detailed(self, detailed):
+        """Add cleaned ``matches_detailed`` rows; return the set of affected teams."""
+        for team in pd.unique(detailed["team"]):
+            if team not in self.detailed_team_order:
+                self.detailed_team_order.append(team)
+
+        sums = detailed.groupby("team")[DETAILED_NUMERIC].agg(["sum", "count"])
+        for team in sums.index:
+            acc = self.detailed.setdefault(team, {c: [0.0, 0] for c in DETAILED_NUMERIC})
+            for col in DETAILED_NUMERIC:
+                acc[col][0] += float(sums.at[team, (col, "sum")])
+                acc[col][1] += int(sums.at[team, (col, "count")])
+
+        valid = detailed[detailed["xg"].notna() & detailed["xga"].notna()]
+        xg = valid.groupby("team").agg(
+            xg=("xg", "sum"),
+            xga=("xga", "sum"),
+            gf=("gf", "sum"),
+            gf_n=("gf", "count"),
+            ga=("ga", "sum"),
+            ga_n=("ga", "count"),
+            n=("xg", "size"),
+        )
+        for team, row in zip(xg.index, xg.itertuples(index=False)):
+            acc = self.xg.setdefault(team, [0.0, 0.0, 0.0, 0, 0.0, 0, 0])
+            for i, value in enumerate(row):
+                acc[i] += value.item() if hasattr(value, "item") else value
+
+        self._advance("detailed", detailed, "date", self._detailed_keys(detailed))
+        return set(sums.index)
+
+    def _rank(self, season):
+        table = self.season_team[season]
+        # Ties fall back to team name, as in the groupby-then-stable-sort original.
+        ranked = sorted(
+            table,
+            key=lambda t: (
+                -table[t][_PTS],
+                -(table[t][_GF] - table[t][_GA]),
+                -table[t][_GF],
+                t,
+            ),
+        )
+        self.positions[season] = {team: i + 1 for i, team in enumerate(ranked)}
+
+    # -- derived tables ----------------------------------------------------
+
+    def league_positions(self):
+        rows = []
+        for season in sorted(self.positions):
+            table = self.season_team[season]
+            for team, pos in sorted(self.positions[season].items(), key=lambda kv: kv[1]):
+                acc = table[team]
+                rows.append(
+                    {
+                        "Team": team,
+                        "Points": acc[_PTS],
+                        "GoalsFor": acc[_GF],
+                        "GoalsAgainst": acc[_GA],
+                        "GoalDifference": acc[_GF] - acc[_GA],
+                        "Position": pos,
+                        "Season": season,
+                    }
+                )
+        return pd.DataFrame(rows)
+
+    def performance_metrics(self):
+        rows = []
+        for team in self.team_order:
+            accs = [t[team] for t in self.season_team.values() if team in t]
+            n, w, d, l, gf, ga, pts = (sum(a[i] for a in accs) for i in range(7))
+            positions = pd.Series(
+                [p[team] for p in self.positions.values() if team in p], dtype=float
+            )
+            std = positions.std()
+            rows.append(
+                {
+                    "Team": team,
+                    "TotalMatches": n,
+                    "Wins": w,
+                    "Draws": d,
+                    "Losses": l,
+                    "WinRate": w / n,
+                    "DrawRate": d / n,
+                    "LossRate": l / n,
+                    "TotalGoalsFor": gf,
+                    "TotalGoalsAgainst": ga,
+                    "AvgGoalsFor": gf / n,
+                    "AvgGoalsAgainst": ga / n,
+                    "GoalDifference": gf - ga,
+                    "AvgGoalDifference": (gf - ga) / n,
+                    "TotalPoints": pts,
+                    "PointsPerGame": pts / n,
+                    "AvgLeaguePosition": positions.mean(),
+                    "BestPosition": int(positions.min()),
+                    "WorstPosition": int(positions.max()),
+                    "PositionStdDev": std,
+                    "ConsistencyScore": 0 if math.isnan(std) else max(0, 100 - std * 10),
+                }
+            )
+        return pd.DataFrame(rows)
+
+    def xg_metrics(self):
+        rows = []
+        for team in self.detailed_team_order:
+            xg, xga, gf, gf_n, ga, ga_n, n = self.xg.get(team, [0, 0, 0, 0, 0, 0, 0])
+            avg_xg = xg / n if n else float("nan")
+            avg_xga = xga / n if n else float("nan")
+            rows.append(
+                {
+                    "Team": team,
+                    "AvgxG": avg_xg,
+                    "AvgxGA": avg_xga,
+                    "AvgGoals": gf / gf_n if gf_n else float("nan"),
+                    "AvgGoalsAgainst": ga / ga_n if ga_n else float("nan"),
+                    "xGDifference": avg_xg - avg_xga,
+                    "xGMatches": n,
+                }
+            )
+        return pd.DataFrame(rows)
+
+    def team_stats(self):
+        nan = float("nan")
+        rows = []
+        for team in self.team_order:
+            detailed = self.detailed.get(team)
+            if detailed is None:
+                extra = dict.fromkeys(
+                    [
+                        "AvgAttendance",
+                        "TotalAttendance",
+                        "MatchesWithAttendance",
+                        "AvgxG",
+                        "AvgxGA",
+                        "AvgPossession",
+                        "AvgGoalsFor",
+                        "AvgGoalsAgainst",
+                    ],
+                    nan,
+                )
+            else:
+
+                def mean(col):
+                    total, count = detailed[col]
+                    return total / count if count else nan
+
+                extra = {
+                    "AvgAttendance": mean("attendance"),
+                    "TotalAttendance": detailed["attendance"][0],
+                    "MatchesWithAttendance": detailed["attendance"][1],
+                    "AvgxG": mean("xg"),
+                    "AvgxGA": mean("xga"),
+                    "AvgPossession": mean("poss"),
+                    "AvgGoalsFor": mean("gf"),
+                    "AvgGoalsAgainst": mean("ga"),
+                }
+            players = self.players.get(team, [None] * len(PLAYER_COLUMNS))
+            extra.update(
+                {col: _none_to_nan(v) for col, v in zip(PLAYER_COLUMNS, players)}
+            )
+
+            for season in sorted(self.season_team):
+                acc = self.season_team[season].get(team)
+                if acc is None:
+                    continue
+                rows.append(
+                    {
+                        "Team": team,
+                        "Season": season,
+                        "Matches": acc[_M],
+                        "Wins": acc[_W],
+                        "Draws": acc[_D],
+                        "Losses": acc[_L],
+                        "GoalsFor": acc[_GF],
+                        "GoalsAgainst": acc[_GA],
+                        "Points": acc[_PTS],
+                        "WinRate": acc[_W] / acc[_M],
+                        "PointsPerGame": acc[_PTS] / acc[_M],
+                        "GoalDifference": acc[_GF] - acc[_GA],
+                        **extra,
+                    }
+                )
+        return pd.DataFrame(rows)
+
+    def tables(self):
+        return {
+            "team_stats": self.team_stats(),
+            "league_positions": self.league_positions(),
+            "performance_metrics": self.performance_metrics(),
+            "xg_metrics": self.xg_metrics(),
+        }
+
+
+def _append_csv(rows, name):
+    path = dataset_path(name)
+    header = pd.read_csv(path, nrows=0).columns
+    rows.reindex(columns=header).to_csv(path, mode="a", header=False, index=False)
+
+
+def init(state_path=STATE_PATH):
+    """Rebuild the state from the cleaned tables on disk."""
+    state = IncrementalState.from_cleaned(
+        load("matches_5y"), load("matches_detailed"), load("team_stats")
+    )
+    state.save(state_path)
+    return state
+
+
+def ingest(raw_matches=None, raw_detailed=None, state_path=STATE_PATH):
+    """Apply the unseen rows of raw match files and rewrite the derived tables.
+
+    Returns ``(new_match_rows, new_detailed_rows)``.
+    """
+    state = IncrementalState.load(state_path)
+    n_matches = n_detailed = 0
+    touched = {}
+
+    if raw_matches is not None:
+        new = state.new_matches(clean_matches(raw_matches))
+        if len(new):
+            state.apply_matches(new)
+            _append_csv(new, "matches_5y")
+            touched["matches_5y"] = set(partitions.split("matches_5y", new))
+        n_matches = len(new)
+        # Elo reads the raw rows: its history starts long before the target seasons.
+        elo.ingest(raw_matches)
+    if raw_detailed is not None:
+        new = state.new_detailed(clean_detailed(raw_detailed))
+        if len(new):
+            state.apply_detailed(new)
+            _append_csv(new, "matches_detailed")
+            touched["matches_detailed"] = set(partitions.split("matches_detailed", new))
+        n_detailed = len(new)
+
+    affected = set()
+    if n_matches:
+        affected |= {"team_stats", "league_positions", "performance_metrics"}
+    if n_detailed:
+        affected |= {"team_stats", "xg_metrics"}
+    for name in affected:
+        write_dataset(name, getattr(state, name)())
+    if affected:
+        # Partitions are written from the CSVs as re-read, as ``partitions.build`` does.
+        changed = [*touched, "team_stats"]
+        partitions.update({name: load(name) for name in changed}, touched)
+        state.save(state_path)
+    return n_matches, n_detailed
+
+
+def verify(holdout):
+    """Rebuild from all but the last ``holdout`` matches, ingest the rest, and
+    compare the derived tables with the CSVs on disk, and the partitions on
+    disk with the CSVs. Returns the mismatches."""
+    matches = load("matches_5y").sort_values("Date", kind="stable")
+    detailed = load("matches_detailed").sort_values("date", kind="stable")
+    cut = matches["Date"].iloc[-holdout]
+
+    state = IncrementalState.from_cleaned(
+        matches[matches["Date"] < cut],
+        detailed[detailed["date"] < cut],
+        load("team_stats"),
+    )
+    state.apply_matches(state.new_matches(matches[matches["Date"] >= cut]))
+    state.apply_detailed(state.new_detailed(detailed[detailed["date"] >= cut]))
+
+    failures = []
+    for name, df in state.tables().items():
+        keys = ["Season", "Team"] if "Season" in df.columns else ["Team"]
+        actual = df.sort_values(keys).reset_index(drop=True)
+        expected = load(name).sort_values(keys).reset_index(drop=True)
+        try:
+            pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
+        except AssertionError as exc:
+            failures.append((name, str(exc)))
+    failures.extend((f"partitions/{name}", message) for name, message in partitions.check())
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--init", action="store_true", help="build state from cleaned data")
+    parser.add_argument("--matches", help="raw LaLiga_Matches.csv-style file")
+    parser.add_argument("--detailed", help="raw matches_laliga.csv-style file")
+    parser.add_argument(
+        "--verify", type=int, metavar="N", help="replay the last N matches and compare"
+    )
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        failures = verify(args.verify)
+        for name, message in failures:
+            print(f"{name} differs:\n{message}\n")
+        print("ok" if not failures else f"{len(failures)} table(s) differ")
+        return 1 if failures else 0
+
+    if args.init:
+        init()
+        print(f"wrote {STATE_PATH}")
+
+    if args.matches or args.detailed:
+        n_matches, n_detailed = ingest(
+            pd.read_csv(args.matches) if args.matches else None,
+            pd.read_csv(args.detailed) if args.detailed else None,
+        )
+        print(f"ingested {n_matches} match rows and {n_detailed} detailed rows")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,129 @@
+"""All-pairs match probabilities from the sporting-strength model.
+
+``MatchupMatrix`` holds dense N x N arrays for every ordered (home, away)
+pair: the plain Log5 home-win probability shown on the Modelling page, and
+the home-win/draw/away-win probabilities used by the season simulator
+(Log5 plus home advantage and a draw component). The matrix is built once
+per sporting-model and feature-table version and shared by every session,
+so a pair lookup is two dictionary hits and an array index, and fixture
+lists are scored with fancy indexing.
+
+Usage::
+
+    python -m laliga.matchups --out matchups.csv
+"""
+
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+
+from laliga.features import features_version
+from laliga.models import get_model
+from laliga.simulation import (
+    league_draw_rate,
+    outcome_probabilities,
+    sporting_strengths,
+    team_home_advantage,
+)
+
+
+class MatchupMatrix:
+    # ``home_adv`` is aligned with ``strengths`` (see ``team_home_advantage``).
+    def __init__(self, strengths, home_adv, draw_rate, version=None):
+        self.teams = list(strengths.index)
+        self.index = {team: i for i, team in enumerate(self.teams)}
+        self.version = version
+        s = strengths.to_numpy(dtype=float)
+        self.strengths = s
+
+        a, b = s[:, None], s[None, :]
+        num = a * (1 - b)
+        denom = num + b * (1 - a)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.log5 = np.where(denom != 0, num / denom, 0.5)
+
+        adv = np.asarray(home_adv, dtype=float)
+        self.home_win, self.draw, self.away_win = outcome_probabilities(
+            np.broadcast_to(a, (len(s), len(s))),
+            np.broadcast_to(b, (len(s), len(s))),
+            adv[:, None],
+            draw_rate,
+        )
+        for matrix in (self.log5, self.home_win, self.draw, self.away_win):
+            np.fill_diagonal(matrix, np.nan)
+
+    def _ij(self, home, away):
+        return self.index[home], self.index[away]
+
+    def log5_home_win(self, home, away):
+        return float(self.log5[self._ij(home, away)])
+
+    def outcome(self, home, away):
+        """``(home win, draw, away win)`` probabilities for one fixture."""
+        ij = self._ij(home, away)
+        return float(self.home_win[ij]), float(self.draw[ij]), float(self.away_win[ij])
+
+    def score_fixtures(self, fixtures):
+        """Add probability columns to a ``HomeTeam``/``AwayTeam`` fixture frame."""
+        i = fixtures["HomeTeam"].map(self.index).to_numpy()
+        j = fixtures["AwayTeam"].map(self.index).to_numpy()
+        return fixtures.assign(
+            Log5HomeWin=self.log5[i, j],
+            HomeWin=self.home_win[i, j],
+            Draw=self.draw[i, j],
+            AwayWin=self.away_win[i, j],
+        )
+
+    def to_frame(self):
+        """Long table of every ordered pair, for export."""
+        n = len(self.teams)
+        i, j = np.nonzero(~np.eye(n, dtype=bool))
+        teams = np.array(self.teams, dtype=object)
+        return pd.DataFrame(
+            {
+                "HomeTeam": teams[i],
+                "AwayTeam": teams[j],
+                "HomeStrength": self.strengths[i],
+                "AwayStrength": self.strengths[j],
+                "Log5HomeWin": self.log5[i, j],
+                "HomeWin": self.home_win[i, j],
+                "Draw": self.draw[i, j],
+                "AwayWin": self.away_win[i, j],
+            }
+        )
+
+
+_lock = threading.Lock()
+_current = None
+
+
+def get_matchups():
+    """Matrix for the current sporting model and feature table, built once."""
+    global _current
+    artifact = get_model("sporting")
+    version = (artifact.version, features_version())
+    matrix = _current
+    if matrix is not None and matrix.version == version:
+        return matrix
+    with _lock:
+        if _current is None or _current.version != version:
+            strengths = sporting_strengths(artifact)
+            _current = MatchupMatrix(
+                strengths, team_home_advantage(strengths.index), league_draw_rate(), version
+            )
+        return _current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--out", default="matchups.csv", help="CSV file to write")
+    args = parser.parse_args(argv)
+    get_matchups().to_frame().to_csv(args.out, index=False)
+    print(f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,317 @@
+"""Team metrics from the cleaned match data, computed with grouped operations.
+
+Produces the same tables as ``analysis.ipynb`` used to build with per-team
+loops (league positions, performance, xG, home/away and head-to-head
+metrics), but each one is a single groupby over a long team-perspective view
+of the matches, so build time grows linearly with the number of matches
+rather than with teams x matches.
+
+Usage::
+
+    python -m laliga.metrics            # rebuild the Analysis/ CSVs
+    python -m laliga.metrics --check    # compare against the CSVs on disk
+    python -m laliga.metrics --benchmark --scales 1 10 100
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from laliga.data import DATASETS, diff_against_disk, load, write_dataset
+
+TOP_N = 6
+
+
+def team_view(matches):
+    """One row per team per match: ``Team``, ``Opponent``, goals and points."""
+    home = pd.DataFrame(
+        {
+            "Season": matches["Season"].to_numpy(),
+            "Team": matches["HomeTeam"].to_numpy(),
+            "Opponent": matches["AwayTeam"].to_numpy(),
+            "Venue": "Home",
+            "GoalsFor": matches["FTHG"].to_numpy(),
+            "GoalsAgainst": matches["FTAG"].to_numpy(),
+            "Points": matches["HomePoints"].to_numpy(),
+        }
+    )
+    away = pd.DataFrame(
+        {
+            "Season": matches["Season"].to_numpy(),
+            "Team": matches["AwayTeam"].to_numpy(),
+            "Opponent": matches["HomeTeam"].to_numpy(),
+            "Venue": "Away",
+            "GoalsFor": matches["FTAG"].to_numpy(),
+            "GoalsAgainst": matches["FTHG"].to_numpy(),
+            "Points": matches["AwayPoints"].to_numpy(),
+        }
+    )
+    view = pd.concat([home, away], ignore_index=True)
+    view["Win"] = view["Points"] == 3
+    view["Draw"] = view["Points"] == 1
+    view["Loss"] = view["Points"] == 0
+    return view
+
+
+def _team_order(matches):
+    # The notebooks iterate teams in order of first appearance as home side.
+    return pd.unique(matches["HomeTeam"])
+
+
+def league_positions(matches, view=None):
+    view = team_view(matches) if view is None else view
+    standings = view.groupby(["Season", "Team"], as_index=False)[
+        ["Points", "GoalsFor", "GoalsAgainst"]
+    ].sum()
+    standings["GoalDifference"] = standings["GoalsFor"] - standings["GoalsAgainst"]
+    standings = standings.sort_values(
+        ["Season", "Points", "GoalDifference", "GoalsFor"],
+        ascending=[True, False, False, False],
+        kind="stable",
+    ).reset_index(drop=True)
+    standings["Position"] = standings.groupby("Season").cumcount() + 1
+    return standings[
+        ["Team", "Points", "GoalsFor", "GoalsAgainst", "GoalDifference", "Position", "Season"]
+    ]
+
+
+def performance_metrics(matches, positions=None, view=None):
+    view = team_view(matches) if view is None else view
+    positions = league_positions(matches, view) if positions is None else positions
+
+    totals = view.groupby("Team").agg(
+        TotalMatches=("Points", "size"),
+        Wins=("Win", "sum"),
+        Draws=("Draw", "sum"),
+        Losses=("Loss", "sum"),
+        TotalGoalsFor=("GoalsFor", "sum"),
+        TotalGoalsAgainst=("GoalsAgainst", "sum"),
+        TotalPoints=("Points", "sum"),
+    )
+    pos = positions.groupby("Team")["Position"].agg(["mean", "min", "max", "std"])
+    totals = totals.reindex(_team_order(matches))
+    pos = pos.reindex(totals.index)
+
+    n = totals["TotalMatches"]
+    gd = totals["TotalGoalsFor"] - totals["TotalGoalsAgainst"]
+    out = pd.DataFrame(
+        {
+            "Team": totals.index,
+            "TotalMatches": n,
+            "Wins": totals["Wins"],
+            "Draws": totals["Draws"],
+            "Losses": totals["Losses"],
+            "WinRate": totals["Wins"] / n,
+            "DrawRate": totals["Draws"] / n,
+            "LossRate": totals["Losses"] / n,
+            "TotalGoalsFor": totals["TotalGoalsFor"],
+            "TotalGoalsAgainst": totals["TotalGoalsAgainst"],
+            "AvgGoalsFor": totals["TotalGoalsFor"] / n,
+            "AvgGoalsAgainst": totals["TotalGoalsAgainst"] / n,
+            "GoalDifference": gd,
+            "AvgGoalDifference": gd / n,
+            "TotalPoints": totals["TotalPoints"],
+            "PointsPerGame": totals["TotalPoints"] / n,
+            "AvgLeaguePosition": pos["mean"],
+            "BestPosition": pos["min"],
+            "WorstPosition": pos["max"],
+            "PositionStdDev": pos["std"],
+            # max(0, nan) is 0 in the original loop, so single-season teams score 0.
+            "ConsistencyScore": (100 - pos["std"] * 10).clip(lower=0).fillna(0),
+        }
+    )
+    return out.reset_index(drop=True)
+
+
+def xg_metrics(detailed):
+    valid = detailed[detailed["xg"].notna() & detailed["xga"].notna()]
+    grouped = valid.groupby("team").agg(
+        AvgxG=("xg", "mean"),
+        AvgxGA=("xga", "mean"),
+        AvgGoals=("gf", "mean"),
+        AvgGoalsAgainst=("ga", "mean"),
+        xGMatches=("xg", "size"),
+    )
+    grouped = grouped.reindex(pd.unique(detailed["team"]))
+    grouped["xGMatches"] = grouped["xGMatches"].fillna(0).astype(int)
+    out = pd.DataFrame(
+        {
+            "Team": grouped.index,
+            "AvgxG": grouped["AvgxG"],
+            "AvgxGA": grouped["AvgxGA"],
+            "AvgGoals": grouped["AvgGoals"],
+            "AvgGoalsAgainst": grouped["AvgGoalsAgainst"],
+            "xGDifference": grouped["AvgxG"] - grouped["AvgxGA"],
+            "xGMatches": grouped["xGMatches"],
+        }
+    )
+    return out.reset_index(drop=True)
+
+
+def home_away_metrics(matches, view=None):
+    view = team_view(matches) if view is None else view
+    by_venue = (
+        view.groupby(["Team", "Venue"])
+        .agg(
+            Matches=("Points", "size"),
+            Wins=("Win", "sum"),
+            Points=("Points", "sum"),
+            GoalsFor=("GoalsFor", "sum"),
+            GoalsAgainst=("GoalsAgainst", "sum"),
+        )
+        .unstack("Venue")
+        .reindex(_team_order(matches))
+    )
+    home = by_venue.xs("Home", axis=1, level="Venue")
+    away = by_venue.xs("Away", axis=1, level="Venue")
+    home_ppg = home["Points"] / home["Matches"]
+    away_ppg = away["Points"] / away["Matches"]
+    out = pd.DataFrame(
+        {
+            "Team": by_venue.index,
+            "HomeMatches": home["Matches"],
+            "HomeWins": home["Wins"],
+            "HomeWinRate": home["Wins"] / home["Matches"],
+            "HomePointsPerGame": home_ppg,
+            "HomeGoalsFor": home["GoalsFor"],
+            "HomeGoalsAgainst": home["GoalsAgainst"],
+            "AwayMatches": away["Matches"],
+            "AwayWins": away["Wins"],
+            "AwayWinRate": away["Wins"] / away["Matches"],
+            "AwayPointsPerGame": away_ppg,
+            "AwayGoalsFor": away["GoalsFor"],
+            "AwayGoalsAgainst": away["GoalsAgainst"],
+            "HomeAdvantage": home_ppg - away_ppg,
+        }
+    )
+    return out.reset_index(drop=True)
+
+
+def h2h_metrics(matches, positions=None, top_n=TOP_N, view=None):
+    """Head-to-head records among teams that ever finished in the top ``top_n``.
+
+    Returns ``(h2h_details, h2h_metrics)``.
+    """
+    view = team_view(matches) if view is None else view
+    positions = league_positions(matches, view) if positions is None else positions
+    top_teams = pd.unique(positions.loc[positions["Position"] <= top_n, "Team"])
+
+    pairs = view[view["Team"].isin(top_teams) & view["Opponent"].isin(top_teams)]
+    details = pairs.groupby(["Team", "Opponent"], as_index=False).agg(
+        Matches=("Points", "size"),
+        Wins=("Win", "sum"),
+        Draws=("Draw", "sum"),
+        Losses=("Loss", "sum"),
+    )
+    details["WinRate"] = details["Wins"] / details["Matches"]
+
+    # Order like the nested loop: teams by first home appearance, opponents
+    # by their order in the top-team list.
+    team_rank = {t: i for i, t in enumerate(_team_order(matches))}
+    opp_rank = {t: i for i, t in enumerate(top_teams)}
+    details = (
+        details.assign(
+            _t=details["Team"].map(team_rank), _o=details["Opponent"].map(opp_rank)
+        )
+        .sort_values(["_t", "_o"], kind="stable")
+        .drop(columns=["_t", "_o"])
+        .reset_index(drop=True)
+    )
+
+    summary = details.groupby("Team", sort=False).agg(
+        TotalH2HMatches=("Matches", "sum"),
+        H2HWins=("Wins", "sum"),
+        H2HDraws=("Draws", "sum"),
+        H2HLosses=("Losses", "sum"),
+    )
+    summary["H2HWinRate"] = (
+        summary["H2HWins"] / summary["TotalH2HMatches"].where(summary["TotalH2HMatches"] > 0)
+    ).fillna(0)
+    return details, summary.reset_index()
+
+
+def team_performance_summary(performance, xg, home_away, h2h):
+    result = performance.merge(xg, on="Team", how="left")
+    result = result.merge(home_away, on="Team", how="left")
+    return result.merge(h2h, on="Team", how="left")
+
+
+def compute_all(matches, detailed):
+    """Return every Analysis/ table keyed by its ``laliga.data.DATASETS`` name."""
+    view = team_view(matches)
+    positions = league_positions(matches, view)
+    performance = performance_metrics(matches, positions, view)
+    xg = xg_metrics(detailed)
+    home_away = home_away_metrics(matches, view)
+    details, h2h = h2h_metrics(matches, positions, view=view)
+    return {
+        "league_positions": positions,
+        "performance_metrics": performance,
+        "xg_metrics": xg,
+        "home_away_metrics": home_away,
+        "h2h_details": details,
+        "h2h_metrics": h2h,
+        "team_performance_summary": team_performance_summary(
+            performance, xg, home_away, h2h
+        ),
+    }
+
+
+def write_all(tables):
+    for name, df in tables.items():
+        write_dataset(name, df)
+
+
+def build():
+    write_all(compute_all(load("matches_5y"), load("matches_detailed")))
+
+
+def benchmark(scales=(1, 10, 100), seed=0):
+    from laliga.synthetic import scale_matches, scale_matches_detailed
+
+    matches = load("matches_5y")
+    detailed = load("matches_detailed")
+    rows = []
+    for factor in scales:
+        m = scale_matches(matches, factor, seed=seed)
+        d = scale_matches_detailed(detailed, factor, seed=seed)
+        start = time.perf_counter()
+        compute_all(m, d)
+        elapsed = time.perf_counter() - start
+        rows.append(
+            {
+                "scale": factor,
+                "matches": len(m),
+                "detailed_rows": len(d),
+                "seconds": elapsed,
+                "us_per_match": elapsed / (len(m) + len(d)) * 1e6,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--check", action="store_true", help="compare with CSVs on disk")
+    parser.add_argument("--benchmark", action="store_true", help="time on scaled data")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        print(benchmark(args.scales).to_string(index=False))
+        return 0
+
+    tables = compute_all(load("matches_5y"), load("matches_detailed"))
+    if args.check:
+        failures = diff_against_disk(tables)
+        for name, message in failures:
+            print(f"{name} ({DATASETS[name]}) differs:\n{message}\n")
+        print("ok" if not failures else f"{len(failures)} table(s) differ")
+        return 1 if failures else 0
+    write_all(tables)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,234 @@
+"""Process-wide store for the trained Random Forest artifacts.
+
+Each artifact is deserialised once per server process and shared by every
+session. ``get`` revalidates the file on disk and, if it has changed, loads
+the new payload completely before swapping it in, so concurrent readers
+always see either the old or the new model, never a half-loaded one.
+
+The two pickles written by ``modelling.ipynb`` have different shapes (the
+investment payload carries ``metrics``/``feature_importance``/``training_date``,
+the sporting one ``train_r2``/``train_rmse``/``export_date``), so both are
+normalised into a ``ModelArtifact``.
+
+When a model has an up-to-date ``.npz`` export next to its pickle (see
+``laliga.forest``), that is loaded instead: it is read without unpickling
+and scores rows with NumPy, so neither sklearn nor joblib is imported by the
+dashboard. An artifact's ``version`` covers both files, so re-exporting the
+``.npz`` alone is picked up like a new pickle.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from laliga.data import ROOT, file_digest
+from laliga.profiling import span
+
+MODELS_DIR = ROOT / "Analysis" / "src"
+
+MODELS = {
+    "investment": "laliga_rf_model.pkl",
+    "sporting": "sporting_rf_model.pkl",
+}
+
+INVESTMENT_FEATURES = [
+    "AvgLeaguePosition",
+    "GoalDifference",
+    "xGDifference",
+    "PointsPerGame",
+    "WinRate",
+    "SquadValueScore",
+    "AvgAttendance",
+    "AvgAge_x",
+]
+
+
+@dataclass
+class ModelArtifact:
+    name: str
+    model: object
+    features: list
+    metrics: dict = field(default_factory=dict)
+    feature_importance: pd.DataFrame = None
+    params: dict = field(default_factory=dict)
+    trained_at: str = None
+    version: str = None
+    path: Path = None
+
+    def predict(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[self.features]
+        return self.model.predict(X)
+
+
+def r2_score(y_true, y_pred):
+    """Coefficient of determination, as ``sklearn.metrics.r2_score``."""
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    residual = np.sum((y_true - y_pred) ** 2)
+    total = np.sum((y_true - y_true.mean()) ** 2)
+    if total == 0:
+        return 1.0 if residual == 0 else 0.0
+    return float(1 - residual / total)
+
+
+def normalise_payload(name, payload, default_features=None):
+    """Build a ``ModelArtifact`` from any payload the notebooks have written."""
+    if not isinstance(payload, dict):
+        payload = {"model": payload}
+    model = payload["model"]
+
+    features = payload.get("features")
+    if features is None:
+        features = list(getattr(model, "feature_names_in_", default_features or []))
+
+    metrics = dict(payload.get("metrics", {}))
+    for key in ("train_r2", "train_rmse", "test_r2", "test_rmse"):
+        if key in payload:
+            metrics.setdefault(key, payload[key])
+    metrics = {k: float(v) for k, v in metrics.items()}
+
+    fi = payload.get("feature_importance")
+    if fi is not None:
+        fi = pd.DataFrame(fi)
+    elif hasattr(model, "feature_importances_"):
+        fi = pd.DataFrame(
+            {"Feature": features, "Importance": model.feature_importances_}
+        )
+    if fi is not None:
+        fi = fi.sort_values("Importance", ascending=False).reset_index(drop=True)
+
+    return ModelArtifact(
+        name=name,
+        model=model,
+        features=list(features),
+        metrics=metrics,
+        feature_importance=fi,
+        params=dict(payload.get("best_params", {})),
+        trained_at=payload.get("training_date") or payload.get("export_date"),
+    )
+
+
+def _stamp(path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def model_version(path):
+    """Digest of a model pickle and of its ``.npz`` export, or ``None`` without either."""
+    digests = [file_digest(p) for p in (path, path.with_suffix(".npz")) if p.exists()]
+    return "+".join(digests) or None
+
+
+def _load_artifact(name, path, version):
+    """Prefer the ``.npz`` export unless it is an older format or was made
+    from a different pickle."""
+    digest = file_digest(path) if path.exists() else None
+    array_path = path.with_suffix(".npz")
+    if array_path.exists():
+        from laliga import forest
+
+        model, meta = forest.load(array_path)
+        current = meta.get("format") == forest.FORMAT_VERSION
+        if current and (digest is None or meta.get("source_digest") == digest):
+            fi = meta.get("feature_importance")
+            if fi is not None:
+                fi = pd.DataFrame(fi).sort_values("Importance", ascending=False)
+                fi = fi.reset_index(drop=True)
+            return ModelArtifact(
+                name=name,
+                model=model,
+                features=list(meta["features"]),
+                metrics=meta.get("metrics", {}),
+                feature_importance=fi,
+                params=meta.get("params", {}),
+                trained_at=meta.get("trained_at"),
+                version=version,
+                path=array_path,
+            )
+    import joblib
+
+    default = INVESTMENT_FEATURES if name == "investment" else None
+    artifact = normalise_payload(name, joblib.load(path), default)
+    artifact.version = version
+    artifact.path = path
+    return artifact
+
+
+class ModelStore:
+    def __init__(self, paths=None):
+        if paths is None:
+            paths = {name: MODELS_DIR / fname for name, fname in MODELS.items()}
+        self.paths = {name: Path(p) for name, p in paths.items()}
+        self._artifacts = {}
+        self._stamps = {}
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in self.paths}
+
+    def get(self, name):
+        path = self.paths[name]
+        stamp = (_stamp(path), _stamp(path.with_suffix(".npz")))
+        artifact = self._artifacts.get(name)
+        if artifact is not None and self._stamps.get(name) == stamp:
+            return artifact
+
+        with self._load_locks[name]:
+            # Another session may have finished the reload while we waited.
+            artifact = self._artifacts.get(name)
+            if artifact is not None and self._stamps.get(name) == stamp:
+                return artifact
+            version = model_version(path)
+            if artifact is None or artifact.version != version or version is None:
+                with span("load_model", model=name):
+                    artifact = _load_artifact(name, path, version)
+            with self._lock:
+                self._artifacts[name] = artifact
+                self._stamps[name] = stamp
+            return artifact
+
+    def warm(self, names=None, background=True):
+        """Load artifacts ahead of the first request.
+
+        With ``background=True`` the loads run on a daemon thread and the
+        thread is returned; otherwise they run inline.
+        """
+        names = list(names or self.paths)
+
+        def _load():
+            for name in names:
+                self.get(name)
+
+        if not background:
+            _load()
+            return None
+        thread = threading.Thread(target=_load, name="laliga-model-warm", daemon=True)
+        thread.start()
+        return thread
+
+
+_store = ModelStore()
+_warm_lock = threading.Lock()
+_warm_thread = None
+
+
+def get_store():
+    return _store
+
+
+def get_model(name):
+    return _store.get(name)
+
+
+def warm():
+    """Start warming every model once per process."""
+    global _warm_thread
+    with _warm_lock:
+        if _warm_thread is None:
+            _warm_thread = _store.warm()
+    return _warm_thread
@@ -0,0 +1,343 @@
+"""Cleaned tables partitioned by competition and season.
+
+The cleaning stage writes each cleaned table twice: as the single CSV the
+notebooks read, and as one Feather file per (competition, season) under
+``CleanedDatasets/Partitions``::
+
+    Partitions/manifest.json
+    Partitions/matches_5y/competition=laliga/season=2024-25.feather
+    Partitions/matches_detailed/competition=laliga/season=2024-25.feather
+    ...
+
+``manifest.json`` lists every partition with its row count and content
+digest, so the available competitions and seasons are known without
+opening any data file. ``load_partitions`` reads only the partitions a
+query selects, each through the shared ``laliga.data`` cache, so adding
+seasons or another league does not change what an existing La Liga view
+reads or holds in memory.
+
+Seasons are labelled ``"2024-25"`` and run from July to June.
+
+Usage::
+
+    python -m laliga.partitions            # partition the cleaned CSVs
+    python -m laliga.partitions --list     # show the manifest
+    python -m laliga.partitions --check    # partitions == CSVs
+"""
+
+import argparse
+import json
+import re
+import threading
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from laliga.data import DATASETS_DIR, file_digest, get_cache, load
+
+PARTITIONS_DIR = DATASETS_DIR / "Partitions"
+MANIFEST_PATH = PARTITIONS_DIR / "manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_COMPETITION = "laliga"
+SEASON_START_MONTH = 7
+
+
+def season_label(start_year):
+    """``2024`` -> ``"2024-25"``."""
+    return f"{start_year}-{(start_year + 1) % 100:02d}"
+
+
+def season_range(first, last):
+    """Season labels from the one starting in ``first`` to ``last`` inclusive."""
+    return [season_label(year) for year in range(first, last + 1)]
+
+
+def season_of(dates):
+    """Season label of every date (seasons start in July)."""
+    dates = pd.to_datetime(pd.Series(dates), errors="coerce")
+    start = dates.dt.year - (dates.dt.month < SEASON_START_MONTH)
+    return start.map(lambda y: season_label(int(y)) if pd.notna(y) else None)
+
+
+def competition_slug(name):
+    """``"La Liga"`` -> ``"laliga"``."""
+    return re.sub(r"[^a-z0-9]+", "", str(name).lower())
+
+
+def _default_competition(df):
+    return pd.Series(DEFAULT_COMPETITION, index=df.index)
+
+
+# dataset -> (competition of each row, season of each row)
+KEYS = {
+    "matches_5y": (_default_competition, lambda df: df["Season"]),
+    # The raw ``season`` column follows different conventions per source.
+    "matches_detailed": (
+        lambda df: df["comp"].map(competition_slug),
+        lambda df: season_of(df["date"]),
+    ),
+    "players_clean": (_default_competition, lambda df: season_of(df["Date"])),
+    "team_stats": (_default_competition, lambda df: df["Season"]),
+}
+
+
+def partition_path(name, competition, season):
+    return PARTITIONS_DIR / name / f"competition={competition}" / f"season={season}.feather"
+
+
+def _relative(path):
+    return path.relative_to(PARTITIONS_DIR).as_posix()
+
+
+def split(name, df):
+    """``{(competition, season): rows}`` for a cleaned table."""
+    competition_of, season_of_rows = KEYS[name]
+    keys = pd.DataFrame({"competition": competition_of(df), "season": season_of_rows(df)})
+    groups = df.groupby([keys["competition"], keys["season"]], sort=True, dropna=True)
+    return {key: rows.reset_index(drop=True) for key, rows in groups}
+
+
+def _write_partition(name, competition, season, rows):
+    path = partition_path(name, competition, season)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.stem + ".tmp.feather")
+    feather.write_feather(rows, tmp, compression="uncompressed")
+    tmp.replace(path)
+    return {
+        "competition": competition,
+        "season": season,
+        "path": _relative(path),
+        "rows": len(rows),
+        "digest": file_digest(path),
+    }
+
+
+def write_dataset(name, df):
+    """Write ``df`` as partitions of ``name``; return its manifest entry."""
+    parts = [
+        _write_partition(name, competition, season, rows)
+        for (competition, season), rows in split(name, df).items()
+    ]
+    written = {p["path"] for p in parts}
+    for old in (PARTITIONS_DIR / name).glob("competition=*/season=*.feather"):
+        if _relative(old) not in written:
+            old.unlink()
+    return {"columns": [str(c) for c in df.columns], "partitions": parts}
+
+
+def write_manifest(datasets):
+    manifest = {"version": MANIFEST_VERSION, "datasets": datasets}
+    PARTITIONS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2) + "\n")
+    tmp.replace(MANIFEST_PATH)
+    return manifest
+
+
+def write_all(tables):
+    """Partition the cleaned tables (keyed by dataset name) and rewrite the manifest."""
+    current = read_manifest() or {"datasets": {}}
+    datasets = dict(current["datasets"])
+    for name, df in tables.items():
+        if name in KEYS:
+            datasets[name] = write_dataset(name, df)
+    return write_manifest(datasets)
+
+
+def update(tables, touched=None):
+    """Rewrite only the touched partitions of already-partitioned tables.
+
+    ``tables`` maps dataset names to their full cleaned frames and
+    ``touched`` maps names to the ``(competition, season)`` keys that
+    changed; a name missing from ``touched`` has every partition rewritten.
+    Tables with no manifest entry are skipped (``load_partitions`` falls
+    back to their CSV). Returns the manifest, or ``None`` without one.
+    """
+    current = read_manifest()
+    if current is None:
+        return None
+    touched = touched or {}
+    datasets = dict(current["datasets"])
+    for name, df in tables.items():
+        if name not in datasets:
+            continue
+        if touched.get(name) is None:
+            datasets[name] = write_dataset(name, df)
+            continue
+        keys = set(touched[name])
+        parts = {(p["competition"], p["season"]): p for p in datasets[name]["partitions"]}
+        for key, rows in split(name, df).items():
+            if key in keys:
+                parts[key] = _write_partition(name, *key, rows)
+        datasets[name] = {
+            "columns": [str(c) for c in df.columns],
+            "partitions": [parts[key] for key in sorted(parts)],
+        }
+    return write_manifest(datasets)
+
+
+def build():
+    """Partition the cleaned CSVs on disk."""
+    return write_all({name: load(name) for name in KEYS})
+
+
+class _ManifestCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stamp = None
+        self.manifest = None
+
+    def get(self):
+        try:
+            st = MANIFEST_PATH.stat()
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if self.stamp != stamp:
+                self.manifest = json.loads(MANIFEST_PATH.read_text())
+                self.stamp = stamp
+            return self.manifest
+
+
+_manifest = _ManifestCache()
+
+
+def read_manifest():
+    """The parsed manifest, or ``None`` if nothing has been partitioned yet."""
+    return _manifest.get()
+
+
+def manifest_version():
+    """Changes whenever the manifest is rewritten; ``None`` without one."""
+    if _manifest.get() is None:
+        return None
+    return _manifest.stamp
+
+
+def available(name=None):
+    """Table of partitions (dataset, competition, season, rows, path)."""
+    manifest = read_manifest()
+    rows = []
+    if manifest is not None:
+        for dataset, entry in manifest["datasets"].items():
+            if name is None or dataset == name:
+                rows.extend(dict(p, dataset=dataset) for p in entry["partitions"])
+    columns = ["dataset", "competition", "season", "rows", "path"]
+    return pd.DataFrame(rows, columns=columns + ["digest"])[columns]
+
+
+def competitions(name):
+    return sorted(available(name)["competition"].unique())
+
+
+def seasons(name, competition=DEFAULT_COMPETITION):
+    parts = available(name)
+    return sorted(parts.loc[parts["competition"] == competition, "season"].unique())
+
+
+def latest_season(name, competition=DEFAULT_COMPETITION):
+    found = seasons(name, competition)
+    return found[-1] if found else None
+
+
+def _as_list(value):
+    if value is None:
+        return None
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _read_partition(columns):
+    def read(path):
+        return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+    return read
+
+
+def load_partitions(name, competitions=None, seasons=None, columns=None):
+    """Rows of ``name`` for the selected competitions and seasons.
+
+    ``None`` selects every competition or season. Only matching partitions
+    are read. Without a manifest entry for ``name`` the full CSV is loaded
+    and filtered instead.
+    """
+    competitions, seasons = _as_list(competitions), _as_list(seasons)
+    manifest = read_manifest()
+    entry = manifest["datasets"].get(name) if manifest else None
+    if entry is None:
+        return _filter_csv(name, competitions, seasons, columns)
+
+    selected = [
+        p
+        for p in entry["partitions"]
+        if (competitions is None or p["competition"] in competitions)
+        and (seasons is None or p["season"] in seasons)
+    ]
+    columns = list(columns) if columns is not None else None
+    reader = _read_partition(columns)
+    options = ("feather", tuple(columns) if columns else None)
+    frames = [get_cache().get(PARTITIONS_DIR / p["path"], reader, options) for p in selected]
+    if not frames:
+        return pd.DataFrame(columns=columns or entry["columns"])
+    if len(frames) == 1:
+        return frames[0].copy(deep=False)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _filter_csv(name, competitions, seasons, columns):
+    df = load(name)
+    competition_of, season_of_rows = KEYS[name]
+    keep = pd.Series(True, index=df.index)
+    if competitions is not None:
+        keep &= competition_of(df).isin(competitions)
+    if seasons is not None:
+        keep &= season_of_rows(df).isin(seasons)
+    df = df[keep].reset_index(drop=True)
+    return df[list(columns)] if columns is not None else df
+
+
+def check():
+    """Compare the concatenated partitions of every dataset with its CSV."""
+    failures = []
+    for name in KEYS:
+        expected = load(name)
+        competition_of, season_of_rows = KEYS[name]
+        keys = pd.DataFrame({"c": competition_of(expected), "s": season_of_rows(expected)})
+        order = keys.dropna().sort_values(["c", "s"], kind="stable").index
+        expected = expected.loc[order].reset_index(drop=True)
+        actual = load_partitions(name)
+        try:
+            pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+        except AssertionError as exc:
+            failures.append((name, str(exc)))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--list", action="store_true", help="print the manifest as a table")
+    group.add_argument("--check", action="store_true", help="compare partitions with the CSVs")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        parts = available()
+        if parts.empty:
+            print(f"no manifest at {MANIFEST_PATH}")
+            return 1
+        print(parts.to_string(index=False))
+        return 0
+    if args.check:
+        failures = check()
+        for name, message in failures:
+            print(f"{name} differs:\n{message}\n")
+        print("ok" if not failures else f"{len(failures)} table(s) differ")
+        return 1 if failures else 0
+    manifest = build()
+    for name, entry in manifest["datasets"].items():
+        print(f"{name}: {len(entry['partitions'])} partitions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
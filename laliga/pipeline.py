@@ -0,0 +1,333 @@
+"""Dependency-aware runner for the offline build.
+
+The build used to be five notebooks run by hand in order. Here each stage
+declares the files it reads and writes; a stage depends on whichever stages
+produce its inputs. A stage is skipped when the content hashes of its inputs
+and its code are unchanged since its last successful run and its outputs are
+still the files it wrote. Stages whose dependencies are satisfied run
+concurrently in a process pool, so the squad, financial and performance
+analyses run side by side once cleaning has finished.
+
+Usage::
+
+    python -m laliga.pipeline                 # run what is out of date
+    python -m laliga.pipeline --dry-run       # show what would run
+    python -m laliga.pipeline --force squad   # rerun a stage regardless
+"""
+
+import argparse
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from laliga.data import DATASETS_DIR, RAW_DIR, ROOT, dataset_path, file_digest
+from laliga.models import MODELS, MODELS_DIR
+from laliga.partitions import MANIFEST_PATH
+
+STATE_PATH = DATASETS_DIR / "State" / "pipeline.json"
+
+
+@dataclass
+class Stage:
+    name: str
+    target: str
+    inputs: list
+    outputs: list
+    code: list = field(default_factory=list)
+
+    def __post_init__(self):
+        module = self.target.split(":")[0]
+        self.code = [module] + [m for m in self.code if m != module]
+
+
+def _ds(*names):
+    return [dataset_path(n) for n in names]
+
+
+STAGES = [
+    Stage(
+        "cleaning",
+        "laliga.cleaning:build",
+        inputs=[
+            RAW_DIR / "LaLiga_Matches.csv",
+            RAW_DIR / "matches_full.csv",
+            RAW_DIR / "matches_laliga.csv",
+            RAW_DIR / "database.csv",
+        ],
+        outputs=_ds("matches_5y", "matches_detailed", "players_clean", "team_stats")
+        + [MANIFEST_PATH, DATASETS_DIR / "State" / "incremental_state.json"],
+        code=["laliga.metrics", "laliga.squad", "laliga.partitions", "laliga.incremental"],
+    ),
+    Stage(
+        "analysis",
+        "laliga.metrics:build",
+        inputs=_ds("matches_5y", "matches_detailed"),
+        outputs=_ds(
+            "league_positions",
+            "performance_metrics",
+            "xg_metrics",
+            "home_away_metrics",
+            "h2h_details",
+            "h2h_metrics",
+            "team_performance_summary",
+        ),
+    ),
+    Stage(
+        "squad",
+        "laliga.squad:build",
+        inputs=_ds("players_clean"),
+        outputs=_ds(
+            "squad_quality_metrics",
+            "squad_depth_metrics",
+            "age_profile",
+            "top_players",
+            "squad_value_scores",
+        ),
+    ),
+    Stage(
+        "financial",
+        "laliga.financial:build",
+        inputs=_ds("matches_detailed"),
+        outputs=_ds("attendance_metrics", "financial_scores", "financial_scores_only"),
+    ),
+    Stage(
+        "elo",
+        "laliga.elo:build",
+        inputs=[RAW_DIR / "LaLiga_Matches.csv"],
+        outputs=_ds("elo_history", "elo_ratings") + [DATASETS_DIR / "State" / "elo_state.json"],
+        code=["laliga.cleaning"],
+    ),
+    Stage(
+        "features",
+        "laliga.features:build",
+        inputs=_ds(
+            "performance_metrics",
+            "squad_value_scores",
+            "financial_scores",
+            "xg_metrics",
+            "elo_ratings",
+        ),
+        outputs=[
+            DATASETS_DIR / "Features" / "team_features.feather",
+            DATASETS_DIR / "Features" / "team_features.json",
+        ],
+    ),
+    Stage(
+        "training",
+        "laliga.training:build",
+        inputs=[DATASETS_DIR / "Features" / "team_features.feather"],
+        outputs=[
+            (MODELS_DIR / fname).with_suffix(suffix)
+            for fname in MODELS.values()
+            for suffix in (".pkl", ".npz")
+        ],
+        code=["laliga.training", "laliga.forest"],
+    ),
+    Stage(
+        "explanations",
+        "laliga.explanations:build",
+        inputs=[DATASETS_DIR / "Features" / "team_features.feather"]
+        + [(MODELS_DIR / fname).with_suffix(".npz") for fname in MODELS.values()],
+        outputs=[DATASETS_DIR / "Explanations" / f"{name}.feather" for name in MODELS]
+        + [DATASETS_DIR / "Explanations" / "explanations.json"],
+        code=["laliga.forest"],
+    ),
+]
+
+
+def dependencies(stages):
+    producers = {str(out): s.name for s in stages for out in s.outputs}
+    return {
+        s.name: sorted({producers[str(i)] for i in s.inputs if str(i) in producers})
+        for s in stages
+    }
+
+
+def _rel(path):
+    return str(path.relative_to(ROOT))
+
+
+class _Hasher:
+    """File digests, reusing the recorded digest when mtime and size match."""
+
+    def __init__(self, known):
+        self.known = known
+        self.seen = {}
+
+    def __call__(self, path):
+        key = _rel(path)
+        st = path.stat()
+        stamp = [st.st_mtime_ns, st.st_size]
+        recorded = self.known.get(key)
+        if recorded and recorded["stamp"] == stamp:
+            digest = recorded["digest"]
+        else:
+            digest = file_digest(path)
+        self.seen[key] = {"stamp": stamp, "digest": digest}
+        return digest
+
+
+def stage_key(stage, hasher):
+    digest = hashlib.blake2b(digest_size=16)
+    for path in stage.inputs:
+        digest.update(_rel(path).encode())
+        digest.update(hasher(path).encode())
+    for module in stage.code:
+        spec = importlib.util.find_spec(module)
+        digest.update(module.encode())
+        digest.update(hasher(Path(spec.origin)).encode())
+    return digest.hexdigest()
+
+
+def is_fresh(stage, key, record, hasher):
+    if record is None or record.get("key") != key:
+        return False
+    for path in stage.outputs:
+        if not path.exists() or hasher(path) != record["outputs"].get(_rel(path)):
+            return False
+    return True
+
+
+def _run_stage(target):
+    module, func = target.split(":")
+    start = time.perf_counter()
+    getattr(importlib.import_module(module), func)()
+    return time.perf_counter() - start
+
+
+def load_state(path=STATE_PATH):
+    return json.loads(path.read_text()) if path.exists() else {"stages": {}, "files": {}}
+
+
+def save_state(state, path=STATE_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True))
+    tmp.replace(path)
+
+
+def run(stages=STAGES, force=(), jobs=None, dry_run=False, state_path=STATE_PATH):
+    """Run out-of-date stages; return one report dict per stage in stage order.
+
+    Each report has ``stage``, ``status`` (``ran``, ``skipped``, ``failed``,
+    ``blocked`` or ``pending`` for a dry run) and ``seconds``.
+    """
+    state = load_state(state_path)
+    hasher = _Hasher(state["files"])
+    deps = dependencies(stages)
+    by_name = {s.name: s for s in stages}
+    reports = {s.name: {"stage": s.name, "status": None, "seconds": 0.0} for s in stages}
+    dirty = set()
+
+    def ready():
+        return [
+            s
+            for s in stages
+            if reports[s.name]["status"] is None
+            and all(reports[d]["status"] in ("ran", "skipped", "pending") for d in deps[s.name])
+        ]
+
+    def block_dependents():
+        changed = True
+        while changed:
+            changed = False
+            for s in stages:
+                if reports[s.name]["status"] is None and any(
+                    reports[d]["status"] in ("failed", "blocked") for d in deps[s.name]
+                ):
+                    reports[s.name]["status"] = "blocked"
+                    changed = True
+
+    jobs = jobs or os.cpu_count() or 1
+    running = {}
+    keys = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while True:
+            for stage in ready():
+                if stage.name in running:
+                    continue
+                upstream_dirty = any(d in dirty for d in deps[stage.name])
+                if dry_run and upstream_dirty:
+                    # Inputs will change once upstream runs; can't hash them yet.
+                    dirty.add(stage.name)
+                    reports[stage.name]["status"] = "pending"
+                    continue
+                key = stage_key(stage, hasher)
+                record = state["stages"].get(stage.name)
+                if stage.name not in force and is_fresh(stage, key, record, hasher):
+                    reports[stage.name]["status"] = "skipped"
+                    continue
+                dirty.add(stage.name)
+                if dry_run:
+                    reports[stage.name]["status"] = "pending"
+                    continue
+                keys[stage.name] = key
+                running[stage.name] = pool.submit(_run_stage, stage.target)
+
+            if not running:
+                if all(r["status"] is not None for r in reports.values()):
+                    break
+                if not ready():
+                    break
+                continue
+
+            done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for name, future in list(running.items()):
+                if future not in done:
+                    continue
+                del running[name]
+                try:
+                    reports[name]["seconds"] = future.result()
+                except Exception as exc:
+                    reports[name]["status"] = "failed"
+                    reports[name]["error"] = f"{type(exc).__name__}: {exc}"
+                    block_dependents()
+                    continue
+                reports[name]["status"] = "ran"
+                state["stages"][name] = {
+                    "key": keys[name],
+                    "outputs": {_rel(p): hasher(p) for p in by_name[name].outputs},
+                }
+
+    if not dry_run:
+        state["files"].update(hasher.seen)
+        save_state(state, state_path)
+    return [reports[s.name] for s in stages]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--force",
+        nargs="*",
+        metavar="STAGE",
+        help="rerun these stages (all stages if none given)",
+    )
+    parser.add_argument("--jobs", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.force is None:
+        force = ()
+    else:
+        force = args.force or [s.name for s in STAGES]
+
+    start = time.perf_counter()
+    reports = run(force=set(force), jobs=args.jobs, dry_run=args.dry_run)
+    for r in reports:
+        line = f"{r['stage']:<12} {r['status']:<8} {r['seconds']:7.2f}s"
+        if "error" in r:
+            line += f"  {r['error']}"
+        print(line)
+    print(f"{'total':<12} {'':<8} {time.perf_counter() - start:7.2f}s")
+    return 1 if any(r["status"] in ("failed", "blocked") for r in reports) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,295 @@
+"""Background prefetch of every page's imports, datasets and models.
+
+The landing page renders before anything heavy is imported (``app.py``
+needs only Streamlit and ``laliga.profiling``). ``prefetch()`` then
+submits every page's work to a small thread pool: importing pandas, Plotly
+and the ``laliga`` modules the pages use, reading their datasets into the
+shared ``laliga.data`` cache, deserialising the models, building the match,
+head-to-head and player similarity indexes, evaluating the default revenue
+scenario grid and loading the model explanations. By the time the user
+opens a page its imports are in ``sys.modules`` and its loads are cache
+hits.
+
+Each task runs once per server process; a task that failed is retried on
+the next call. The caches it fills revalidate against the files on disk,
+so prefetched data is never staler than a normal load. ``LALIGA_PREFETCH=0``
+turns prefetching off.
+
+Usage::
+
+    python -m laliga.prefetch                   # run every task, print timings
+    python -m laliga.prefetch --measure         # cold vs prefetched page loads
+    python -m laliga.prefetch --measure --wait 3 --repeat 3
+"""
+
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+
+from laliga.profiling import ROOT
+
+PREFETCH_WORKERS = 4
+
+PAGE_FILES = {
+    "Team Performance": "pages/1_Team_Performance.py",
+    "Financial Analysis": "pages/2_Financial_Analysis.py",
+    "Squad Analysis": "pages/3_Squad_Analysis.py",
+    "Predictions": "pages/4_Predictions.py",
+    "Modelling Insights": "pages/5_Modelling_Insights.py",
+}
+
+
+def _import(module):
+    return lambda: importlib.import_module(module)
+
+
+def _dataset(name):
+    def run():
+        from laliga.data import load
+
+        load(name)
+
+    return run
+
+
+def _plotly():
+    import plotly.express as px
+
+    # The first figure of a process loads the default template and the
+    # trace validators (~130 ms); later figures skip that.
+    px.bar(x=[0], y=[0])
+
+
+def _call(module, function, *args):
+    return lambda: getattr(importlib.import_module(module), function)(*args)
+
+
+# task name -> callable; imports come first so they start first.
+TASKS = {
+    "plotly": _plotly,
+    "import laliga.figures": _import("laliga.figures"),
+    "import laliga.simulation": _import("laliga.simulation"),
+    "import laliga.sensitivity": _import("laliga.sensitivity"),
+    "import laliga.scoring": _import("laliga.scoring"),
+    "import laliga.elo": _import("laliga.elo"),
+    "dataset performance_metrics": _dataset("performance_metrics"),
+    "dataset xg_metrics": _dataset("xg_metrics"),
+    "dataset financial_scores": _dataset("financial_scores"),
+    "dataset squad_value_scores": _dataset("squad_value_scores"),
+    "dataset top_players": _dataset("top_players"),
+    "dataset age_profile": _dataset("age_profile"),
+    "dataset league_positions": _dataset("league_positions"),
+    "dataset elo_ratings": _dataset("elo_ratings"),
+    "dataset elo_history": _dataset("elo_history"),
+    "features": _call("laliga.features", "load_features"),
+    "model investment": _call("laliga.models", "get_model", "investment"),
+    "model sporting": _call("laliga.models", "get_model", "sporting"),
+    "form store": _call("laliga.form", "get_store"),
+    "matchups": _call("laliga.matchups", "get_matchups"),
+    "h2h index": _call("laliga.h2h", "get_index"),
+    "player index": _call("laliga.scouting", "get_index"),
+    "revenue scenarios": _call("laliga.revenue", "scenarios"),
+    "explanations investment": _call("laliga.explanations", "load_explanations", "investment"),
+    "explanations sporting": _call("laliga.explanations", "load_explanations", "sporting"),
+}
+
+PAGES = {
+    "Team Performance": [
+        "plotly",
+        "import laliga.figures",
+        "dataset performance_metrics",
+        "dataset xg_metrics",
+        "form store",
+    ],
+    "Financial Analysis": [
+        "plotly",
+        "import laliga.figures",
+        "dataset financial_scores",
+        "revenue scenarios",
+    ],
+    "Squad Analysis": [
+        "plotly",
+        "import laliga.figures",
+        "dataset squad_value_scores",
+        "dataset top_players",
+        "dataset age_profile",
+        "dataset league_positions",
+        "player index",
+    ],
+    "Predictions": [
+        "import laliga.figures",
+        "import laliga.sensitivity",
+        "features",
+        "model investment",
+        "explanations investment",
+    ],
+    "Modelling Insights": [
+        "plotly",
+        "import laliga.figures",
+        "import laliga.simulation",
+        "import laliga.scoring",
+        "import laliga.elo",
+        "features",
+        "model investment",
+        "model sporting",
+        "matchups",
+        "h2h index",
+        "dataset elo_ratings",
+        "dataset elo_history",
+        "explanations investment",
+        "explanations sporting",
+    ],
+}
+
+
+def enabled():
+    return os.environ.get("LALIGA_PREFETCH", "1").lower() not in ("0", "false", "no")
+
+
+class Prefetcher:
+    def __init__(self, workers=PREFETCH_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._futures = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def _run(self, name):
+        start = time.perf_counter()
+        try:
+            TASKS[name]()
+        finally:
+            self._timings[name] = (time.perf_counter() - start) * 1e3
+
+    def submit(self, pages=None):
+        """Start the tasks of ``pages`` (default: all) that have not run yet."""
+        names = [n for n in TASKS if any(n in PAGES[p] for p in pages or PAGES)]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="laliga-prefetch"
+                )
+            for name in names:
+                future = self._futures.get(name)
+                if future is None or (future.done() and future.exception() is not None):
+                    self._futures[name] = self._executor.submit(self._run, name)
+            return {name: self._futures[name] for name in names}
+
+    def wait(self, timeout=None):
+        with self._lock:
+            futures = list(self._futures.values())
+        return wait_futures(futures, timeout)
+
+    def status(self):
+        """One row per submitted task: state, milliseconds and error."""
+        with self._lock:
+            futures = dict(self._futures)
+        rows = []
+        for name, future in futures.items():
+            if not future.done():
+                state, error = "running", None
+            elif future.exception() is not None:
+                state, error = "failed", repr(future.exception())
+            else:
+                state, error = "done", None
+            rows.append(
+                {"task": name, "state": state, "ms": self._timings.get(name), "error": error}
+            )
+        return rows
+
+
+_prefetcher = Prefetcher()
+
+
+def get_prefetcher():
+    return _prefetcher
+
+
+def prefetch(pages=None):
+    """Prefetch the given pages' work in the background; no-op when disabled."""
+    if not enabled():
+        return {}
+    return _prefetcher.submit(pages)
+
+
+def _visit(page, wait):
+    """Child process of ``measure``: run ``app.py``, wait, then open ``page``."""
+    import warnings
+
+    warnings.filterwarnings("ignore")
+    import streamlit  # noqa: F401  (loaded by the server before any script runs)
+    from streamlit.testing.v1 import AppTest
+
+    def run(path):
+        start = time.perf_counter()
+        at = AppTest.from_file(str(ROOT / path), default_timeout=600).run()
+        if at.exception:
+            raise RuntimeError(f"{path}: {at.exception[0].value}")
+        return (time.perf_counter() - start) * 1e3
+
+    result = {"home": run("app.py")}
+    if page:
+        time.sleep(wait)
+        result["page"] = run(PAGE_FILES[page])
+    print(json.dumps(result))
+
+
+def _child(page, wait, prefetching):
+    env = dict(os.environ, LALIGA_PREFETCH="1" if prefetching else "0", LALIGA_PROFILE_LOG="")
+    code = f"from laliga.prefetch import _visit; _visit({page!r}, {wait!r})"
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(wait=5.0, repeat=1, log=print):
+    """Median cold-process timings (ms) with prefetching off and on.
+
+    ``app.py`` is the landing page's full run, which ends once its content
+    is drawn. Each page is opened ``wait`` seconds after the landing page,
+    as a user clicking through would.
+    """
+    rows = []
+    for page in [None, *PAGE_FILES]:
+        row = {"page": page or "app.py"}
+        for label, prefetching in (("off_ms", False), ("on_ms", True)):
+            runs = [_child(page, wait, prefetching) for _ in range(repeat)]
+            row[label] = statistics.median(r["page" if page else "home"] for r in runs)
+        log(f"{row['page']:<22} {row['off_ms']:9.0f} ms {row['on_ms']:9.0f} ms")
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--measure", action="store_true", help="time cold page loads in fresh processes"
+    )
+    parser.add_argument("--wait", type=float, default=5.0, help="seconds on the landing page")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        print(f"{'':<22} {'prefetch off':>12} {'prefetch on':>12}")
+        measure(args.wait, args.repeat)
+        return 0
+    start = time.perf_counter()
+    _prefetcher.submit()
+    _prefetcher.wait()
+    for row in _prefetcher.status():
+        print(f"{row['task']:<30} {row['state']:<8} {row['ms']:8.1f} ms {row['error'] or ''}")
+    print(f"total {(time.perf_counter() - start) * 1e3:.1f} ms with {_prefetcher.workers} workers")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
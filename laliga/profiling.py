@@ -0,0 +1,336 @@
+"""Per-rerun timing spans for the Streamlit pages.
+
+A page script opens a rerun with ``start_rerun(page)`` and marks its
+stages with ``stage(name, **tags)``: each call closes the previous stage,
+so a script is split into consecutive spans without re-indenting it.
+Library code wraps its own expensive steps in ``span(name, **tags)`` (CSV
+parsing in ``laliga.data``, model deserialisation in ``laliga.models``),
+which nests under the stage that triggered it and is a no-op outside a
+rerun, e.g. in the CLIs.
+
+``finish_rerun()`` keeps the rerun in the session's history for the
+debug panel and appends one JSON line per span plus a ``rerun`` summary
+line to ``logs/profile.jsonl`` (``LALIGA_PROFILE_LOG`` overrides the path;
+an empty value turns file logging off). Keyed widgets whose value changed
+since the previous rerun are recorded as its ``trigger``.
+
+The panel is shown in the sidebar with ``LALIGA_DEBUG=1`` or ``?debug=1``.
+
+Usage::
+
+    python -m laliga.profiling                  # p50/p95 per page and stage
+    python -m laliga.profiling --log other.jsonl --spans
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+# pandas is imported where it is used: the landing page opens a rerun
+# before anything else has imported it.
+
+ROOT = Path(__file__).resolve().parent.parent
+LOG_PATH = ROOT / "logs" / "profile.jsonl"
+HISTORY = 20
+_HISTORY_KEY = "_profiling_history"
+_WIDGETS_KEY = "_profiling_widgets"
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def log_path():
+    value = os.environ.get("LALIGA_PROFILE_LOG")
+    if value is None:
+        return LOG_PATH
+    return Path(value) if value else None
+
+
+class Rerun:
+    def __init__(self, page, session=None, trigger=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.page = page
+        self.session = session
+        self.trigger = trigger or []
+        self.timestamp = time.time()
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+        self.total_ms = None
+        self._stage = None
+
+    def _open(self, name, tags):
+        start = time.perf_counter()
+        self.depth += 1
+        return name, tags, start, self.depth - 1
+
+    def _close(self, opened):
+        name, tags, start, depth = opened
+        end = time.perf_counter()
+        self.depth = depth
+        self.spans.append(
+            {
+                "name": name,
+                "start_ms": (start - self.t0) * 1e3,
+                "ms": (end - start) * 1e3,
+                "depth": depth,
+                "tags": tags,
+            }
+        )
+
+    def close_stage(self):
+        if self._stage is not None:
+            self._close(self._stage)
+            self._stage = None
+
+    def finish(self):
+        self.close_stage()
+        self.total_ms = (time.perf_counter() - self.t0) * 1e3
+        self.spans.sort(key=lambda s: s["start_ms"])
+
+    def records(self):
+        base = {"rerun": self.id, "page": self.page, "session": self.session}
+        lines = [
+            dict(
+                base,
+                type="span",
+                name=s["name"],
+                start_ms=round(s["start_ms"], 3),
+                ms=round(s["ms"], 3),
+                depth=s["depth"],
+                **s["tags"],
+            )
+            for s in self.spans
+        ]
+        lines.append(
+            dict(
+                base,
+                type="rerun",
+                ts=round(self.timestamp, 3),
+                ms=round(self.total_ms, 3),
+                spans=len(self.spans),
+                trigger=self.trigger,
+            )
+        )
+        return lines
+
+    def summary(self):
+        top = [s for s in self.spans if s["depth"] == 0]
+        slowest = max(top, key=lambda s: s["ms"]) if top else None
+        return {
+            "time": time.strftime("%H:%M:%S", time.gmtime(self.timestamp)),
+            "page": self.page,
+            "ms": self.total_ms,
+            "trigger": ", ".join(self.trigger),
+            "slowest stage": slowest["name"] if slowest else "",
+            "slowest ms": slowest["ms"] if slowest else None,
+        }
+
+
+def current():
+    return getattr(_local, "rerun", None)
+
+
+@contextmanager
+def span(name, **tags):
+    """Time a block as a child of the current stage; no-op outside a rerun."""
+    rerun = current()
+    if rerun is None:
+        yield
+        return
+    opened = rerun._open(name, tags)
+    try:
+        yield
+    finally:
+        rerun._close(opened)
+
+
+def stage(name, **tags):
+    """End the current stage of the rerun and start ``name``."""
+    rerun = current()
+    if rerun is None:
+        return
+    rerun.close_stage()
+    rerun._stage = rerun._open(name, tags)
+
+
+def _session_state():
+    try:
+        import streamlit as st
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None, None
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None, None
+    return st.session_state, ctx.session_id
+
+
+def _changed_widgets(state):
+    values = {
+        str(k): repr(v)[:80] for k, v in state.items() if not str(k).startswith("_")
+    }
+    previous = state.get(_WIDGETS_KEY)
+    state[_WIDGETS_KEY] = values
+    if previous is None:
+        return []
+    return sorted(k for k, v in values.items() if previous.get(k) != v)
+
+
+def start_rerun(page):
+    """Begin timing a page run; an unfinished earlier rerun is dropped."""
+    state, session = _session_state()
+    trigger = _changed_widgets(state) if state is not None else []
+    _local.rerun = Rerun(page, session, trigger)
+    return _local.rerun
+
+
+def write(records, path=None):
+    path = path or log_path()
+    if path is None:
+        return
+    text = "".join(json.dumps(r, default=str) + "\n" for r in records)
+    with _write_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(text)
+
+
+def finish_rerun():
+    """Close the rerun, log it and add it to the session history."""
+    rerun = current()
+    if rerun is None:
+        return None
+    _local.rerun = None
+    rerun.finish()
+    try:
+        write(rerun.records())
+    except OSError:
+        # Profiling must never break a page.
+        pass
+    state, _ = _session_state()
+    if state is not None:
+        history = state.get(_HISTORY_KEY)
+        if history is None:
+            history = state[_HISTORY_KEY] = deque(maxlen=HISTORY)
+        history.append(rerun)
+        if debug_enabled():
+            debug_panel(history)
+    return rerun
+
+
+def debug_enabled():
+    if os.environ.get("LALIGA_DEBUG", "").lower() in ("1", "true", "yes"):
+        return True
+    try:
+        import streamlit as st
+
+        return st.query_params.get("debug") == "1"
+    except Exception:
+        return False
+
+
+def debug_panel(history):
+    """Sidebar table of the session's last reruns and the latest one's spans."""
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("Performance (debug)", expanded=False):
+        reruns = list(history)[::-1]
+        st.dataframe(
+            pd.DataFrame([r.summary() for r in reruns]),
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "ms": st.column_config.NumberColumn(format="%.1f"),
+                "slowest ms": st.column_config.NumberColumn(format="%.1f"),
+            },
+        )
+        latest = reruns[0]
+        st.caption(f"Last rerun of {latest.page}: {latest.total_ms:.1f} ms")
+        spans = pd.DataFrame(
+            [
+                {
+                    "span": "  " * s["depth"] + s["name"],
+                    "start ms": s["start_ms"],
+                    "ms": s["ms"],
+                    "tags": ", ".join(f"{k}={v}" for k, v in s["tags"].items()),
+                }
+                for s in latest.spans
+            ]
+        )
+        st.dataframe(spans, hide_index=True, use_container_width=True)
+
+
+def read_log(path=None):
+    import pandas as pd
+
+    path = Path(path or log_path() or LOG_PATH)
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return pd.DataFrame(rows)
+
+
+def _percentiles(grouped):
+    out = grouped["ms"].agg(
+        runs="size",
+        p50=lambda s: s.quantile(0.5),
+        p95=lambda s: s.quantile(0.95),
+        max="max",
+    )
+    return out.reset_index()
+
+
+def aggregate(log):
+    """p50/p95 rerun latency per page, and per (page, span)."""
+    import pandas as pd
+
+    if log.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    reruns = _percentiles(log[log["type"] == "rerun"].groupby("page"))
+    spans = log[log["type"] == "span"].astype({"depth": int})
+    per_span = pd.DataFrame()
+    if len(spans):
+        per_span = _percentiles(spans.groupby(["page", "depth", "name"]))
+    return reruns.sort_values("p95", ascending=False), per_span
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--log", type=Path, help=f"JSON lines file (default: {LOG_PATH})")
+    parser.add_argument("--spans", action="store_true", help="also list every span")
+    args = parser.parse_args(argv)
+
+    path = args.log or log_path() or LOG_PATH
+    if not Path(path).exists():
+        print(f"no profile log at {path}")
+        return 1
+    reruns, spans = aggregate(read_log(path))
+    if reruns.empty:
+        print("no reruns logged")
+        return 0
+    print(reruns.to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+    if len(spans):
+        if not args.spans:
+            spans = spans[spans["depth"] == 0]
+        spans = spans.sort_values(["page", "p95"], ascending=[True, False])
+        print()
+        print(spans.to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,295 @@
+"""Matchday revenue scenarios from per-match home attendance.
+
+``FinancialAnalysis.ipynb`` estimates matchday revenue as the all-seasons
+average attendance x a 50 EUR ticket x 19 home matches. The engine here
+starts from every La Liga home match with a recorded attendance in one
+season and evaluates a grid of scenarios:
+
+* ticket price ``P`` (EUR),
+* capacity as a multiple ``C`` of the season's highest home attendance,
+* price elasticity of attendance ``e``: each match's crowd scales by
+  ``(P / 50) ** -e`` and is capped at ``C`` x capacity.
+
+A team's season revenue is its mean per-match revenue x 19 home matches.
+The whole grid, every team and every match are evaluated in one NumPy
+broadcast of shape (prices, capacities, elasticities, teams, matches).
+Results are cached per (grid, season, data version), so moving between
+scenarios of a grid that has already been evaluated is an array lookup.
+Observed attendance is treated as the demand at 50 EUR, so sold-out
+matches understate demand.
+
+Usage::
+
+    python -m laliga.revenue                          # latest season, default grid
+    python -m laliga.revenue --season 2023-24 --prices 20 120 51
+"""
+
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from laliga.data import dataset_path
+from laliga.financial import AVG_TICKET_PRICE, HOME_MATCHES_PER_SEASON
+from laliga.partitions import (
+    DEFAULT_COMPETITION,
+    load_partitions,
+    manifest_version,
+    season_of,
+    seasons,
+)
+
+PERCENTILES = (5, 25, 50, 75, 95)
+MAX_CACHED_GRIDS = 16
+
+
+@dataclass(frozen=True)
+class ScenarioGrid:
+    prices: tuple
+    capacities: tuple
+    elasticities: tuple
+
+    @classmethod
+    def linspace(
+        cls,
+        prices=(30.0, 90.0, 41),
+        capacities=(0.9, 1.2, 7),
+        elasticities=(0.0, 1.5, 11),
+    ):
+        """Evenly spaced axes from ``(start, stop, steps)`` triples."""
+
+        def axis(start, stop, steps):
+            return tuple(round(float(v), 6) for v in np.linspace(start, stop, int(steps)))
+
+        return cls(axis(*prices), axis(*capacities), axis(*elasticities))
+
+    @property
+    def shape(self):
+        return len(self.prices), len(self.capacities), len(self.elasticities)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+
+def home_attendance(season=None):
+    """Home matches with a recorded attendance: ``Team``, ``Date``, ``Attendance``."""
+    detailed = load_partitions("matches_detailed", competitions=DEFAULT_COMPETITION)
+    df = detailed.drop_duplicates(["team", "date", "opponent"])
+    df = df[(df["venue"].astype(str) == "Home") & df["attendance"].notna()]
+    frame = pd.DataFrame(
+        {
+            "Team": df["team"].astype(str).to_numpy(),
+            "Date": pd.to_datetime(df["date"]).to_numpy(),
+            "Attendance": df["attendance"].to_numpy(dtype=float),
+        }
+    )
+    frame["Season"] = season_of(frame["Date"]).to_numpy()
+    if season is not None:
+        frame = frame[frame["Season"] == season]
+    return frame.sort_values(["Team", "Date"], ignore_index=True)
+
+
+def attendance_seasons():
+    """Seasons with home attendance, oldest first."""
+    return sorted(home_attendance()["Season"].dropna().unique())
+
+
+def attendance_matrix(frame):
+    """``(teams, attendance)``: one row per team, NaN-padded to its most matches."""
+    teams = sorted(frame["Team"].unique())
+    counts = frame.groupby("Team").size().reindex(teams).to_numpy()
+    matrix = np.full((len(teams), int(counts.max()) if len(teams) else 0), np.nan)
+    row = frame["Team"].map({t: i for i, t in enumerate(teams)}).to_numpy()
+    col = frame.groupby("Team").cumcount().to_numpy()
+    matrix[row, col] = frame["Attendance"].to_numpy()
+    return teams, matrix
+
+
+class ScenarioResult:
+    """Season revenue and crowds for every (price, capacity, elasticity, team)."""
+
+    def __init__(self, grid, season, teams, revenue, attendance, capacity, baseline):
+        self.grid = grid
+        self.season = season
+        self.teams = teams
+        self.revenue = revenue
+        self.attendance = attendance
+        self.capacity = capacity
+        self.baseline = baseline
+
+    def _index(self, price, capacity, elasticity):
+        return tuple(
+            int(np.abs(np.asarray(axis) - value).argmin())
+            for axis, value in zip(
+                (self.grid.prices, self.grid.capacities, self.grid.elasticities),
+                (price, capacity, elasticity),
+            )
+        )
+
+    def at(self, price, capacity, elasticity):
+        """Per-team outcome of the grid scenario nearest to the given values."""
+        ijk = self._index(price, capacity, elasticity)
+        attendance = self.attendance[ijk]
+        return pd.DataFrame(
+            {
+                "Team": self.teams,
+                "Revenue": self.revenue[ijk],
+                "BaselineRevenue": self.baseline,
+                "AvgAttendance": attendance,
+                "Utilisation": attendance / (self.grid.capacities[ijk[1]] * self.capacity),
+            }
+        )
+
+    def percentiles(self, q=PERCENTILES):
+        """Spread of each team's revenue over every scenario of the grid."""
+        flat = self.revenue.reshape(-1, len(self.teams))
+        values = np.percentile(flat, q, axis=0)
+        out = pd.DataFrame(values.T, columns=[f"P{p}" for p in q])
+        out.insert(0, "Team", self.teams)
+        out["BaselineRevenue"] = self.baseline
+        median = f"P{q[len(q) // 2]}"
+        return out.sort_values(median, ascending=False, ignore_index=True)
+
+    def price_curve(self, capacity, elasticity):
+        """Revenue against price for every team, other parameters fixed."""
+        _, j, k = self._index(self.grid.prices[0], capacity, elasticity)
+        curve = self.revenue[:, j, k, :]
+        return pd.DataFrame(
+            {
+                "Price": np.repeat(self.grid.prices, len(self.teams)),
+                "Team": np.tile(np.asarray(self.teams, dtype=object), len(self.grid.prices)),
+                "Revenue": curve.ravel(),
+            }
+        )
+
+    def best_prices(self, capacity, elasticity):
+        """Revenue-maximising grid price for every team."""
+        _, j, k = self._index(self.grid.prices[0], capacity, elasticity)
+        curve = self.revenue[:, j, k, :]
+        best = curve.argmax(axis=0)
+        return pd.DataFrame(
+            {
+                "Team": self.teams,
+                "BestPrice": np.asarray(self.grid.prices)[best],
+                "BestRevenue": curve[best, np.arange(len(self.teams))],
+            }
+        )
+
+    def to_frame(self):
+        """Long table of every scenario and team, for export."""
+        p, c, e = np.meshgrid(
+            self.grid.prices, self.grid.capacities, self.grid.elasticities, indexing="ij"
+        )
+        n = len(self.teams)
+        return pd.DataFrame(
+            {
+                "Price": np.repeat(p.ravel(), n),
+                "Capacity": np.repeat(c.ravel(), n),
+                "Elasticity": np.repeat(e.ravel(), n),
+                "Team": np.tile(np.asarray(self.teams, dtype=object), self.grid.size),
+                "Revenue": self.revenue.ravel(),
+                "AvgAttendance": self.attendance.ravel(),
+            }
+        )
+
+
+def evaluate(grid, teams, attendance, season=None):
+    """Evaluate every scenario of ``grid`` on a (teams, matches) attendance matrix."""
+    prices = np.asarray(grid.prices, dtype=float)[:, None, None, None, None]
+    capacities = np.asarray(grid.capacities, dtype=float)[None, :, None, None, None]
+    elasticities = np.asarray(grid.elasticities, dtype=float)[None, None, :, None, None]
+    observed = ~np.isnan(attendance)
+    played = observed.sum(axis=1)
+    capacity = np.nanmax(attendance, axis=1)
+
+    demand = attendance * (prices / AVG_TICKET_PRICE) ** -elasticities
+    crowd = np.minimum(demand, capacities * capacity[:, None])
+    crowd = np.where(observed, crowd, 0.0)
+    per_match = crowd.sum(axis=-1) / played
+    revenue = per_match * prices[..., 0] * HOME_MATCHES_PER_SEASON
+    baseline = np.nanmean(attendance, axis=1) * AVG_TICKET_PRICE * HOME_MATCHES_PER_SEASON
+    return ScenarioResult(grid, season, teams, revenue, per_match, capacity, baseline)
+
+
+def _data_version():
+    st = dataset_path("matches_detailed").stat()
+    return st.st_mtime_ns, st.st_size, manifest_version()
+
+
+class _ResultCache:
+    def __init__(self, max_entries=MAX_CACHED_GRIDS):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, grid, season):
+        key = (grid, season, _data_version())
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        teams, attendance = attendance_matrix(home_attendance(season))
+        result = evaluate(grid, teams, attendance, season)
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+
+_cache = _ResultCache()
+
+
+def scenarios(grid=None, season=None):
+    """Cached ``ScenarioResult`` for ``grid`` (default ``ScenarioGrid.linspace()``).
+
+    ``season`` defaults to the latest season with home attendance.
+    """
+    grid = grid or ScenarioGrid.linspace()
+    season = season or attendance_seasons()[-1]
+    return _cache.get(grid, season)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--season", help="e.g. 2024-25 (default: latest)")
+    parser.add_argument(
+        "--prices", type=float, nargs=3, default=(30, 90, 41), metavar=("LO", "HI", "N")
+    )
+    parser.add_argument(
+        "--capacities", type=float, nargs=3, default=(0.9, 1.2, 7), metavar=("LO", "HI", "N")
+    )
+    parser.add_argument(
+        "--elasticities", type=float, nargs=3, default=(0.0, 1.5, 11), metavar=("LO", "HI", "N")
+    )
+    parser.add_argument("--out", help="write every scenario to this CSV")
+    args = parser.parse_args(argv)
+
+    known = seasons("matches_detailed")
+    if args.season and args.season not in known:
+        parser.error(f"unknown season {args.season}; have {', '.join(known)}")
+    grid = ScenarioGrid.linspace(args.prices, args.capacities, args.elasticities)
+    season = args.season or attendance_seasons()[-1]
+    teams, attendance = attendance_matrix(home_attendance(season))
+    start = time.perf_counter()
+    result = evaluate(grid, teams, attendance, season)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{season}: {grid.size:,} scenarios x {len(teams)} teams "
+        f"x {attendance.shape[1]} matches in {elapsed * 1e3:.1f} ms"
+    )
+    table = result.percentiles()
+    print(table.to_string(index=False, float_format=lambda v: f"{v:,.0f}"))
+    if args.out:
+        result.to_frame().to_csv(args.out, index=False)
+        print(f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,422 @@
+"""Batch scoring service for the investment and sporting models.
+
+Scores custom team profiles without the dashboard: single rows or CSV/JSON
+batches are checked against each model's feature list, scored, ranked
+within the batch and placed against the current league (the teams of the
+feature table), with the investment recommendation the Modelling page
+shows ("Strong Buy" / "Moderate Buy" / "High Risk / Hold").
+
+The HTTP server handles each request on its own thread. Requests do not
+call ``predict`` themselves: ``MicroBatcher`` queues their rows and a
+single worker per model stacks whatever arrived within ``--max-wait-ms``
+(up to ``--max-batch`` rows) into one vectorised ``predict`` call, so many
+small concurrent requests cost about as much as one large one.
+
+Endpoints::
+
+    GET  /health            models, feature lists and versions
+    POST /score             JSON object, list of objects, {"rows": [...]},
+                            or text/csv; ?models=investment,sporting
+
+Usage::
+
+    python -m laliga.scoring serve --port 8765
+    python -m laliga.scoring score scouting.csv --out scored.csv
+    python -m laliga.scoring loadtest --clients 16 --requests 200
+"""
+
+import argparse
+import io
+import json
+import queue
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from laliga.features import features_version, load_features
+from laliga.forest import ArrayForest
+from laliga.models import MODELS, get_model
+
+DEFAULT_PORT = 8765
+MAX_BATCH = 1024
+MAX_WAIT_MS = 2.0
+SCORE_COLUMNS = {"investment": "InvestmentScore", "sporting": "SportingStrength"}
+
+
+class ScoringError(ValueError):
+    """Bad input; reported to HTTP clients as 400."""
+
+
+def recommendation(rank):
+    """Investment label for a league rank (1 = best), as on the Modelling page."""
+    if rank <= 3:
+        return "Strong Buy"
+    if rank <= 7:
+        return "Moderate Buy"
+    return "High Risk / Hold"
+
+
+def league_frame(name):
+    """The feature-table rows ``name`` is scored on, as the Modelling page does."""
+    df = load_features()
+    # Missing values are routed by each split's learned direction.
+    return df["Team"], df[get_model(name).features]
+
+
+class MicroBatcher:
+    """Coalesces concurrent ``submit`` calls into batched ``predict`` calls."""
+
+    def __init__(self, name, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.name = name
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1e3
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, X):
+        """Future of the predictions for ``X`` (a float array in feature order)."""
+        future = Future()
+        self._queue.put((X, future))
+        return future
+
+    def _collect(self):
+        items = [self._queue.get()]
+        size = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            try:
+                artifact = get_model(self.name)
+                X = np.vstack([x for x, _ in items])
+                if not isinstance(artifact.model, ArrayForest):
+                    X = pd.DataFrame(X, columns=artifact.features)
+                predictions = artifact.model.predict(X)
+            except Exception as exc:  # hand the failure to every waiting request
+                for _, future in items:
+                    future.set_exception(exc)
+                continue
+            start = 0
+            for x, future in items:
+                future.set_result(predictions[start : start + len(x)])
+                start += len(x)
+            with self._lock:
+                self.batches += 1
+                self.rows += sum(len(x) for x, _ in items)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "rows": self.rows,
+                "mean_batch": self.rows / self.batches if self.batches else 0.0,
+            }
+
+
+class Scorer:
+    """Validates inputs, scores them through the batchers and ranks them."""
+
+    def __init__(self, names=None, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.names = list(names or MODELS)
+        for name in self.names:
+            get_model(name)
+        self.batchers = {n: MicroBatcher(n, max_batch, max_wait_ms) for n in self.names}
+        self._league = {}
+        self._league_lock = threading.Lock()
+
+    def schema(self):
+        return {
+            name: {"features": get_model(name).features, "version": get_model(name).version}
+            for name in self.names
+        }
+
+    def league_scores(self, name):
+        """Current league scores of ``name``, sorted descending; computed once per version."""
+        key = (get_model(name).version, features_version())
+        with self._league_lock:
+            cached = self._league.get(name)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        _, X = league_frame(name)
+        scores = np.sort(get_model(name).predict(X))[::-1]
+        with self._league_lock:
+            self._league[name] = (key, scores)
+        return scores
+
+    def _matrix(self, columns, name):
+        features = get_model(name).features
+        missing = [f for f in features if f not in columns]
+        if missing:
+            raise ScoringError(f"{name}: missing feature(s) {missing}")
+        try:
+            X = np.array([columns[f] for f in features], dtype=float).T
+        except (TypeError, ValueError) as exc:
+            raise ScoringError(f"{name}: non-numeric feature value ({exc})") from None
+        bad = np.isnan(X).any(axis=1)
+        if bad.any():
+            raise ScoringError(f"{name}: missing values in row(s) {np.flatnonzero(bad).tolist()}")
+        return X
+
+    def score(self, columns, names=None):
+        """Scores, batch ranks and league ranks for the rows in ``columns``.
+
+        ``columns`` maps column names to equal-length sequences (see
+        ``parse_body``); the result is a dict of output columns.
+        """
+        names = list(names or self.names)
+        unknown = sorted(set(names) - set(self.names))
+        if unknown:
+            raise ScoringError(f"unknown model(s) {unknown}; available: {self.names}")
+        if not columns or not len(next(iter(columns.values()))):
+            raise ScoringError("no rows to score")
+        futures = {n: self.batchers[n].submit(self._matrix(columns, n)) for n in names}
+        out = {c: list(columns[c]) for c in ("Team", "id") if c in columns}
+        for name, future in futures.items():
+            column = SCORE_COLUMNS[name]
+            scores = future.result()
+            league = self.league_scores(name)
+            out[column] = scores.tolist()
+            # 1 + number of strictly better scores, in the batch and in the league.
+            out[f"{column}Rank"] = (np.searchsorted(np.sort(-scores), -scores) + 1).tolist()
+            league_rank = np.searchsorted(-league, -scores) + 1
+            out[f"{column}LeagueRank"] = league_rank.tolist()
+            if name == "investment":
+                out["Recommendation"] = [recommendation(r) for r in league_rank]
+        return out
+
+    def stats(self):
+        return {name: b.stats() for name, b in self.batchers.items()}
+
+
+def parse_body(body, content_type):
+    """Request body (JSON object/list/``{"rows": ...}`` or CSV) -> ``{column: values}``."""
+    if "csv" in (content_type or ""):
+        try:
+            df = pd.read_csv(io.BytesIO(body))
+        except (ValueError, pd.errors.ParserError) as exc:
+            raise ScoringError(f"bad CSV: {exc}") from None
+        return {str(c): df[c].to_numpy() for c in df.columns}
+    try:
+        payload = json.loads(body or b"null")
+    except json.JSONDecodeError as exc:
+        raise ScoringError(f"bad JSON: {exc}") from None
+    if isinstance(payload, dict) and "rows" in payload:
+        payload = payload["rows"]
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list) or not all(isinstance(r, dict) for r in payload):
+        raise ScoringError("expected an object, a list of objects or {\"rows\": [...]}")
+    keys = dict.fromkeys(k for row in payload for k in row)
+    return {k: [row.get(k) for row in payload] for k in keys}
+
+
+def records(result):
+    """Output columns -> list of row dicts."""
+    keys = list(result)
+    return [dict(zip(keys, values)) for values in zip(*result.values())]
+
+
+def _handler(scorer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body, content_type="application/json"):
+            data = body.encode() if isinstance(body, str) else body
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _json(self, status, payload):
+            self._send(status, json.dumps(payload))
+
+        def do_GET(self):
+            if urlparse(self.path).path == "/health":
+                self._json(200, {"models": scorer.schema(), "batching": scorer.stats()})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/score":
+                self._json(404, {"error": "not found"})
+                return
+            start = time.perf_counter()
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            query = parse_qs(url.query)
+            names = query["models"][0].split(",") if "models" in query else None
+            try:
+                result = scorer.score(parse_body(body, self.headers.get("Content-Type")), names)
+            except ScoringError as exc:
+                self._json(400, {"error": str(exc)})
+                return
+            if "csv" in (self.headers.get("Accept") or ""):
+                self._send(200, pd.DataFrame(result).to_csv(index=False), "text/csv")
+                return
+            self._json(
+                200,
+                {
+                    "results": records(result),
+                    "latency_ms": (time.perf_counter() - start) * 1e3,
+                },
+            )
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections under a burst of clients.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, scorer=None):
+    scorer = scorer or Scorer()
+    server = _Server((host, port), _handler(scorer))
+    server.scorer = scorer
+    return server
+
+
+def _post(url, rows):
+    request = urllib.request.Request(
+        url, data=json.dumps(rows).encode(), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def load_test(clients=16, requests=200, rows=1, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+    """Throughput and latency of an in-process server under concurrent clients."""
+    server = make_server(port=0, scorer=Scorer(max_batch=max_batch, max_wait_ms=max_wait_ms))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/score"
+    features = load_features()
+    columns = sorted({f for n in MODELS for f in get_model(n).features})
+    profiles = features[columns].dropna().to_dict(orient="records")
+    payloads = [
+        [profiles[(i * rows + j) % len(profiles)] for j in range(rows)] for i in range(requests)
+    ]
+
+    def one(payload):
+        start = time.perf_counter()
+        _post(url, payload)
+        return time.perf_counter() - start
+
+    _post(url, payloads[0])  # warm up
+    before = server.scorer.stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        latencies = list(pool.map(one, payloads))
+    elapsed = time.perf_counter() - start
+    after = server.scorer.stats()
+    server.shutdown()
+    server.server_close()
+
+    batches = sum(after[n]["batches"] - before[n]["batches"] for n in after)
+    batched_rows = sum(after[n]["rows"] - before[n]["rows"] for n in after)
+    latencies_ms = sorted(t * 1e3 for t in latencies)
+    return {
+        "clients": clients,
+        "requests": requests,
+        "rows_per_request": rows,
+        "max_batch": max_batch,
+        "seconds": elapsed,
+        "requests_per_s": requests / elapsed,
+        "rows_per_s": requests * rows / elapsed,
+        "p50_ms": statistics.median(latencies_ms),
+        "p95_ms": latencies_ms[int(0.95 * (len(latencies_ms) - 1))],
+        "p99_ms": latencies_ms[int(0.99 * (len(latencies_ms) - 1))],
+        "mean_batch_rows": batched_rows / batches if batches else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="run the HTTP service")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    serve.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+
+    score = sub.add_parser("score", help="score a CSV or JSON file")
+    score.add_argument("path", help="CSV or JSON file, or - for CSV on stdin")
+    score.add_argument("--models", help="comma-separated, default: all")
+    score.add_argument("--out", help="CSV file to write (default: stdout)")
+
+    load = sub.add_parser("loadtest", help="measure throughput and latency")
+    load.add_argument("--clients", type=int, default=16)
+    load.add_argument("--requests", type=int, default=200)
+    load.add_argument("--rows", type=int, default=1, help="rows per request")
+    load.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = make_server(args.host, args.port, Scorer(None, args.max_batch, args.max_wait_ms))
+        print(f"scoring on http://{args.host}:{server.server_address[1]}/score")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
+        return 0
+
+    if args.command == "score":
+        if args.path == "-":
+            body, kind = sys.stdin.buffer.read(), "text/csv"
+        else:
+            with open(args.path, "rb") as f:
+                body = f.read()
+            kind = "application/json" if args.path.endswith(".json") else "text/csv"
+        names = args.models.split(",") if args.models else None
+        try:
+            result = Scorer().score(parse_body(body, kind), names)
+        except ScoringError as exc:
+            print(f"error: {exc}", file=sys.stderr)
+            return 1
+        pd.DataFrame(result).to_csv(args.out or sys.stdout, index=False)
+        return 0
+
+    rows = []
+    for max_batch in (1, MAX_BATCH):
+        rows.append(
+            load_test(args.clients, args.requests, args.rows, max_batch, args.max_wait_ms)
+        )
+    report = pd.DataFrame(rows).drop(columns=["clients", "requests", "rows_per_request"])
+    report.insert(0, "batching", report.pop("max_batch").map(lambda b: "off" if b == 1 else "on"))
+    print(f"{args.clients} clients, {args.requests} requests of {args.rows} row(s)")
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+"""What-if response surfaces for the investment model.
+
+Instead of one ``predict`` per slider move, ``response_surface`` varies two
+features over a grid around a team's current profile and scores every grid
+point in a single batched ``predict`` call. Surfaces are cached per model
+version, team, feature pair, ranges and resolution.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_CACHED_SURFACES = 64
+
+# Features whose valid range is narrower than what the data spans.
+BOUNDS = {"WinRate": (0.0, 1.0), "AvgLeaguePosition": (1.0, 20.0)}
+
+
+class Surface:
+    __slots__ = ("x_feature", "y_feature", "x", "y", "z")
+
+    def __init__(self, x_feature, y_feature, x, y, z):
+        self.x_feature = x_feature
+        self.y_feature = y_feature
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+def feature_range(values, feature, pad=0.1):
+    """Observed range of ``values`` widened by ``pad`` and clipped to ``BOUNDS``."""
+    lo, hi = float(np.nanmin(values)), float(np.nanmax(values))
+    span = (hi - lo) or abs(hi) or 1.0
+    lo, hi = lo - span * pad, hi + span * pad
+    if feature in BOUNDS:
+        b_lo, b_hi = BOUNDS[feature]
+        lo, hi = max(lo, b_lo), min(hi, b_hi)
+    return lo, hi
+
+
+def evaluate_grid(model, features, base, x_feature, y_feature, x_range, y_range, n=100):
+    """Score an ``n`` x ``n`` grid over two features with one ``predict`` call.
+
+    ``base`` supplies every other feature value. Returns a ``Surface`` whose
+    ``z[i, j]`` is the prediction at ``y[i]``, ``x[j]``.
+    """
+    if x_feature == y_feature:
+        raise ValueError("x_feature and y_feature must differ")
+    x = np.linspace(*x_range, n)
+    y = np.linspace(*y_range, n)
+    xx, yy = np.meshgrid(x, y)
+
+    grid = np.tile(
+        np.array([float(base[f]) for f in features], dtype=float), (xx.size, 1)
+    )
+    grid[:, features.index(x_feature)] = xx.ravel()
+    grid[:, features.index(y_feature)] = yy.ravel()
+    z = model.predict(pd.DataFrame(grid, columns=features)).reshape(xx.shape)
+    return Surface(x_feature, y_feature, x, y, z)
+
+
+class _SurfaceCache:
+    def __init__(self, max_entries=MAX_CACHED_SURFACES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        surface = compute()
+        with self._lock:
+            self._entries[key] = surface
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return surface
+
+
+_cache = _SurfaceCache()
+
+
+def response_surface(artifact, team, base, x_feature, y_feature, x_range, y_range, n=100):
+    """Cached ``evaluate_grid`` for a ``laliga.models.ModelArtifact``."""
+    key = (
+        artifact.name,
+        artifact.version,
+        team,
+        tuple(float(base[f]) for f in artifact.features),
+        x_feature,
+        y_feature,
+        tuple(map(float, x_range)),
+        tuple(map(float, y_range)),
+        n,
+    )
+    return _cache.get_or_compute(
+        key,
+        lambda: evaluate_grid(
+            artifact.model, artifact.features, base, x_feature, y_feature, x_range, y_range, n
+        ),
+    )
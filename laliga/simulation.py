@@ -0,0 +1,339 @@
+"""Monte Carlo season simulation on top of the sporting-strength model.
+
+Each team's ``Sportingstrength`` (the sporting model's predicted win rate)
+gives a Log5 probability that the home side wins a decisive match. That
+probability is shifted on the logit scale by a home advantage estimated
+from ``home_away_metrics.csv``, and a draw component is carved out that is
+largest for evenly matched sides and averages out near the league draw rate.
+
+The remaining fixtures are played out as NumPy arrays: one uniform draw per
+(simulation, fixture), outcome points accumulated into the table with a
+fixture-by-team incidence matrix, and final positions from one argsort per
+batch. Independent seeded batches are spread over one process pool shared
+by every caller in the process (at most ``MAX_WORKERS`` workers, started on
+first use; ``jobs`` caps how many batches one call keeps in flight) and
+reduced to position, title, top-4 and relegation probabilities and to a
+points distribution per team. Results are cached per model version.
+"""
+
+import hashlib
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from laliga.data import load
+from laliga.features import features_version, load_features
+from laliga.models import get_model
+from laliga.partitions import DEFAULT_COMPETITION, latest_season, load_partitions
+
+BATCH_SIZE = 10_000
+# Weight of a team's own home record against the league-wide home advantage.
+HOME_SHRINKAGE = 0.5
+STRENGTH_CLIP = (0.02, 0.98)
+MAX_CACHED_RUNS = 16
+MAX_WORKERS = 4
+
+
+def sporting_strengths(artifact=None, features=None):
+    """``Sportingstrength`` per team, as computed on the Modelling page."""
+    artifact = artifact or get_model("sporting")
+    features = load_features() if features is None else features
+    strength = artifact.model.predict(features[artifact.features])
+    return pd.Series(strength, index=features["Team"], name="Sportingstrength")
+
+
+def home_advantage(home_away=None):
+    """Per-team logit home advantage, shrunk toward the league value."""
+    home_away = load("home_away_metrics") if home_away is None else home_away
+    league = np.log(home_away["HomeWins"].sum() / home_away["AwayWins"].sum())
+    home_rate = home_away["HomeWinRate"].clip(lower=0.05)
+    away_rate = home_away["AwayWinRate"].clip(lower=0.05)
+    team = np.log(home_rate / away_rate)
+    adv = HOME_SHRINKAGE * team + (1 - HOME_SHRINKAGE) * league
+    return pd.Series(adv.to_numpy(), index=home_away["Team"]), float(league)
+
+
+def team_home_advantage(teams, home_away=None):
+    """Home advantage of each of ``teams``, the league value for teams without one."""
+    adv, league = home_advantage(home_away)
+    return adv.reindex(teams).fillna(league).to_numpy()
+
+
+def league_draw_rate(performance=None):
+    performance = load("performance_metrics") if performance is None else performance
+    return float(performance["Draws"].sum() / performance["TotalMatches"].sum())
+
+
+def outcome_probabilities(home_strength, away_strength, home_adv, draw_rate):
+    """Vectorised (home win, draw, away win) probabilities for fixture arrays."""
+    a = np.clip(home_strength, *STRENGTH_CLIP)
+    b = np.clip(away_strength, *STRENGTH_CLIP)
+    p = a * (1 - b) / (a * (1 - b) + b * (1 - a))
+    logit = np.log(p / (1 - p)) + home_adv
+    p_home = 1 / (1 + np.exp(-logit))
+    # 4p(1-p) is 1 for an even match and falls off for lopsided ones; its
+    # mean over a typical fixture list is ~0.9, hence the rescaling.
+    p_draw = np.clip(draw_rate / 0.9 * 4 * p_home * (1 - p_home), 0, 0.6)
+    return p_home * (1 - p_draw), p_draw, (1 - p_home) * (1 - p_draw)
+
+
+def season_matches(season=None):
+    """``(season, matches)`` for ``season``, by default the latest one.
+
+    Only that season's La Liga partition is read when partitions exist.
+    """
+    season = season or latest_season("matches_5y")
+    if season is None:
+        matches = load("matches_5y")
+        return matches["Season"].max(), matches
+    return season, load_partitions("matches_5y", DEFAULT_COMPETITION, season)
+
+
+def current_table(season=None, matches=None):
+    """Points and goal difference so far, plus the fixtures still to play.
+
+    Without an explicit fixture list the season is assumed to be a double
+    round robin among the teams that have played in it.
+    """
+    if matches is None:
+        season, matches = season_matches(season)
+    season = season or matches["Season"].max()
+    played = matches[matches["Season"] == season]
+    teams = sorted(set(played["HomeTeam"]) | set(played["AwayTeam"]))
+
+    points = pd.Series(0.0, index=teams)
+    gd = pd.Series(0.0, index=teams)
+    points = points.add(played.groupby("HomeTeam")["HomePoints"].sum(), fill_value=0)
+    points = points.add(played.groupby("AwayTeam")["AwayPoints"].sum(), fill_value=0)
+    margin = played["FTHG"] - played["FTAG"]
+    gd = gd.add(margin.groupby(played["HomeTeam"]).sum(), fill_value=0)
+    gd = gd.sub(margin.groupby(played["AwayTeam"]).sum(), fill_value=0)
+
+    done = set(zip(played["HomeTeam"], played["AwayTeam"]))
+    remaining = pd.DataFrame(
+        [(h, a) for h in teams for a in teams if h != a and (h, a) not in done],
+        columns=["HomeTeam", "AwayTeam"],
+    )
+    return season, points.reindex(teams), gd.reindex(teams), remaining
+
+
+def _simulate_batch(args):
+    (seed, n_sims, p_home, p_draw, home_idx, away_idx, base_points, tiebreak, n_teams) = args
+    rng = np.random.default_rng(seed)
+    n_fix = len(p_home)
+    u = rng.random((n_sims, n_fix), dtype=np.float32)
+    home_pts = np.where(u < p_home, 3, np.where(u < p_home + p_draw, 1, 0)).astype(np.float32)
+    away_pts = np.where(home_pts == 3, 0, np.where(home_pts == 1, 1, 3)).astype(np.float32)
+
+    home_inc = np.zeros((n_fix, n_teams), dtype=np.float32)
+    away_inc = np.zeros((n_fix, n_teams), dtype=np.float32)
+    home_inc[np.arange(n_fix), home_idx] = 1
+    away_inc[np.arange(n_fix), away_idx] = 1
+    final = base_points + home_pts @ home_inc + away_pts @ away_inc
+
+    # Ties are broken by current goal difference, then at random.
+    noise = rng.random((n_sims, n_teams), dtype=np.float32) * 1e-3
+    order = np.argsort(-(final + tiebreak + noise), axis=1)
+    positions = np.empty_like(order)
+    positions[np.arange(n_sims)[:, None], order] = np.arange(n_teams)
+
+    team_ids = np.tile(np.arange(n_teams), n_sims)
+    position_counts = np.bincount(
+        team_ids * n_teams + positions.ravel(), minlength=n_teams * n_teams
+    ).reshape(n_teams, n_teams)
+    max_points = int(base_points.max()) + 3 * n_fix + 1
+    points_hist = np.bincount(
+        team_ids * max_points + final.astype(np.int64).ravel(),
+        minlength=n_teams * max_points,
+    ).reshape(n_teams, max_points)
+    return position_counts, points_hist
+
+
+class SimulationResult:
+    def __init__(self, teams, position_counts, points_hist, n_sims, season, fixtures):
+        self.teams = list(teams)
+        self.position_counts = position_counts
+        self.points_hist = points_hist
+        self.n_sims = n_sims
+        self.season = season
+        self.fixtures = fixtures
+        # Set by ``cached_simulate`` to the inputs the result was computed from.
+        self.version = None
+
+    @property
+    def position_probabilities(self):
+        return pd.DataFrame(
+            self.position_counts / self.n_sims,
+            index=self.teams,
+            columns=range(1, len(self.teams) + 1),
+        )
+
+    def _points_quantile(self, q):
+        cdf = np.cumsum(self.points_hist, axis=1) / self.n_sims
+        return (cdf < q).sum(axis=1)
+
+    def summary(self):
+        probs = self.position_probabilities
+        pts = np.arange(self.points_hist.shape[1])
+        mean = (self.points_hist * pts).sum(axis=1) / self.n_sims
+        var = (self.points_hist * pts**2).sum(axis=1) / self.n_sims - mean**2
+        df = pd.DataFrame(
+            {
+                "Team": self.teams,
+                "Title": probs[1].to_numpy(),
+                "Top4": probs.loc[:, 1:4].sum(axis=1).to_numpy(),
+                "Relegation": probs.iloc[:, -3:].sum(axis=1).to_numpy(),
+                "ExpectedPoints": mean,
+                "PointsStd": np.sqrt(np.maximum(var, 0)),
+                "PointsP5": self._points_quantile(0.05),
+                "PointsP50": self._points_quantile(0.5),
+                "PointsP95": self._points_quantile(0.95),
+                "ExpectedPosition": (probs.to_numpy() * np.arange(1, len(self.teams) + 1)).sum(axis=1),
+            }
+        )
+        return df.sort_values("ExpectedPoints", ascending=False).reset_index(drop=True)
+
+
+def simulate(
+    n_sims=100_000,
+    seed=0,
+    strengths=None,
+    fixtures=None,
+    season=None,
+    jobs=None,
+    batch_size=BATCH_SIZE,
+):
+    """Play out the rest of the season ``n_sims`` times.
+
+    ``fixtures`` (``HomeTeam``/``AwayTeam``) defaults to the unplayed half of
+    a double round robin for ``season`` (the latest by default). ``jobs``
+    (default: all CPUs) is the most batches run at once. With ``jobs=1``, or a
+    single CPU, every batch runs in this process; otherwise the batches go to
+    the shared pool, so values above ``MAX_WORKERS`` act as ``MAX_WORKERS``.
+    """
+    strengths = sporting_strengths() if strengths is None else strengths
+    season, points, gd, remaining = current_table(season)
+    fixtures = remaining if fixtures is None else fixtures
+    teams = list(points.index)
+    index = {t: i for i, t in enumerate(teams)}
+
+    home = fixtures["HomeTeam"].to_numpy()
+    away = fixtures["AwayTeam"].to_numpy()
+    mean_strength = float(strengths.mean())
+    p_home, p_draw, _ = outcome_probabilities(
+        strengths.reindex(home).fillna(mean_strength).to_numpy(),
+        strengths.reindex(away).fillna(mean_strength).to_numpy(),
+        team_home_advantage(home),
+        league_draw_rate(),
+    )
+
+    home_idx = np.array([index[t] for t in home])
+    away_idx = np.array([index[t] for t in away])
+    base = points.to_numpy(dtype=np.float32)
+    tiebreak = (gd.to_numpy(dtype=np.float32) * 1e-2).astype(np.float32)
+    sizes = [batch_size] * (n_sims // batch_size)
+    if n_sims % batch_size:
+        sizes.append(n_sims % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [
+        (
+            s,
+            size,
+            p_home.astype(np.float32),
+            p_draw.astype(np.float32),
+            home_idx,
+            away_idx,
+            base,
+            tiebreak,
+            len(teams),
+        )
+        for s, size in zip(seeds, sizes)
+    ]
+
+    jobs = min(jobs or os.cpu_count() or 1, _pool_size())
+    if jobs == 1 or len(tasks) == 1:
+        results = list(map(_simulate_batch, tasks))
+    else:
+        results = _run_pooled(tasks, jobs)
+
+    position_counts = sum(r[0] for r in results)
+    width = max(r[1].shape[1] for r in results)
+    points_hist = sum(np.pad(r[1], ((0, 0), (0, width - r[1].shape[1]))) for r in results)
+    return SimulationResult(teams, position_counts, points_hist, n_sims, season, fixtures)
+
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def _pool_size():
+    return max(1, min(os.cpu_count() or 1, MAX_WORKERS))
+
+
+def _get_pool():
+    """The process-wide pool, started on first use and restarted if it broke."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_pool_size())
+        return _pool
+
+
+def _bounded_map(pool, tasks, limit):
+    """``_simulate_batch`` over ``tasks`` with at most ``limit`` submitted at a time."""
+    results = [None] * len(tasks)
+    queue = enumerate(tasks)
+    pending = {pool.submit(_simulate_batch, t): i for i, t in itertools.islice(queue, limit)}
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+        for i, task in itertools.islice(queue, len(done)):
+            pending[pool.submit(_simulate_batch, task)] = i
+    return results
+
+
+def _run_pooled(tasks, limit):
+    global _pool
+    pool = _get_pool()
+    try:
+        return _bounded_map(pool, tasks, limit)
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        return _bounded_map(_get_pool(), tasks, limit)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_simulate(n_sims=100_000, seed=0, season=None, jobs=None):
+    """``simulate`` with results cached per sporting model and feature version."""
+    artifact = get_model("sporting")
+    _, matches = season_matches(season)
+    played = hashlib.blake2b(
+        pd.util.hash_pandas_object(matches, index=False).to_numpy().tobytes(),
+        digest_size=8,
+    ).hexdigest()
+    key = (artifact.version, features_version(), played, n_sims, seed, season)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    result = simulate(
+        n_sims, seed, strengths=sporting_strengths(artifact), season=season, jobs=jobs
+    )
+    result.version = key
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > MAX_CACHED_RUNS:
+            _cache.popitem(last=False)
+    return result
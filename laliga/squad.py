@@ -0,0 +1,271 @@
+"""Squad quality, depth and age metrics (the ``squadAnalysis.ipynb`` stage).
+
+The notebook filtered the player log once per team, three times over. Here
+the log is read with categorical team, player, position and age columns
+(ages are decoded per distinct value, not per row) and reduced in a single
+grouped pass to per-(team, player) partial sums. Every output table is then
+rolled up from those partials, which are a few hundred rows however long
+the match-by-match log grows.
+
+Usage::
+
+    python -m laliga.squad [--check] [--benchmark --scales 1 50]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from laliga.data import DATASETS, diff_against_disk, load, write_dataset
+
+FORWARDS = ["FW", "LW", "RW"]
+MIDFIELDERS = ["AM", "CM", "DM", "LM", "RM"]
+DEFENDERS = ["CB", "LB", "RB"]
+GOALKEEPERS = ["GK"]
+
+XG = "Expected Goals (xG)"
+XAG = "Expected Assists (xAG)"
+
+# Only the columns the squad tables use, in compact dtypes.
+PLAYER_DTYPES = {
+    "Player": "category",
+    "Team": "category",
+    "Position": "category",
+    "Age": "category",
+    "Minutes": "int32",
+    "Goals": "int16",
+    "Assists": "int16",
+    XG: "float64",
+    XAG: "float64",
+}
+
+
+def _parse_age(values):
+    return pd.to_numeric(values.astype(str).str.split("-").str[0], errors="coerce")
+
+
+def age_years(age):
+    """Decode FBref ages like ``27-338`` (years-days) to whole years.
+
+    A categorical column is decoded once per category rather than per row.
+    """
+    if isinstance(age.dtype, pd.CategoricalDtype):
+        years = _parse_age(pd.Series(age.cat.categories)).to_numpy(dtype=float)
+        # Code -1 (missing) picks up the trailing NaN.
+        years = np.append(years, np.nan)
+        return pd.Series(years[age.cat.codes.to_numpy()], index=age.index, name=age.name)
+    return _parse_age(age)
+
+
+def read_players(name="players_clean"):
+    return load(name, usecols=list(PLAYER_DTYPES), dtype=PLAYER_DTYPES)
+
+
+def compact(players):
+    """Cast a player log to ``PLAYER_DTYPES`` (a no-op for ``read_players`` output)."""
+    players = players[list(PLAYER_DTYPES)]
+    if all(players[c].dtype == t for c, t in PLAYER_DTYPES.items()):
+        return players
+    return players.astype(PLAYER_DTYPES)
+
+
+def player_partials(players):
+    """Per-(team, player) sums from one grouped pass over the player log."""
+    age = age_years(players["Age"])
+    position = players["Position"]
+    rows = pd.DataFrame(
+        {
+            "Team": players["Team"],
+            "Player": players["Player"],
+            "Records": np.ones(len(players), dtype=np.int32),
+            "Goals": players["Goals"],
+            "Assists": players["Assists"],
+            XG: players[XG],
+            XAG: players[XAG],
+            "Minutes": players["Minutes"],
+            "AgeSum": age.fillna(0),
+            "AgeCount": age.notna(),
+            "MinAge": age,
+            "MaxAge": age,
+            "YoungPlayers": age < 23,
+            "PrimePlayers": (age >= 23) & (age < 30),
+            "ExperiencedPlayers": age >= 30,
+            "Forwards": position.isin(FORWARDS),
+            "Midfielders": position.isin(MIDFIELDERS),
+            "Defenders": position.isin(DEFENDERS),
+            "Goalkeepers": position.isin(GOALKEEPERS),
+        }
+    )
+    how = dict.fromkeys(rows.columns[2:], "sum")
+    how.update(MinAge="min", MaxAge="max")
+    partials = rows.groupby(["Team", "Player"], observed=True, sort=False).agg(how)
+    return partials.reset_index()
+
+
+def team_totals(partials):
+    """Roll the partials up to one row per team, in first-appearance order."""
+    teams = pd.unique(partials["Team"].astype(object))
+    how = dict.fromkeys(partials.columns[2:], "sum")
+    how.update(MinAge="min", MaxAge="max", Player="size")
+    totals = partials.groupby("Team", observed=True, sort=False).agg(how)
+    totals = totals.rename(columns={"Player": "UniquePlayers"})
+    totals.index = totals.index.astype(object)
+    return totals.reindex(teams)
+
+
+def squad_quality_metrics(totals):
+    out = pd.DataFrame(
+        {
+            "Team": totals.index,
+            "TotalPlayerRecords": totals["Records"],
+            "UniquePlayers": totals["UniquePlayers"],
+            "TotalGoals": totals["Goals"],
+            "TotalAssists": totals["Assists"],
+            "TotalxG": totals[XG],
+            "TotalxAG": totals[XAG],
+        }
+    )
+    for col, total in [
+        ("AvgGoalsPerPlayer", "TotalGoals"),
+        ("AvgAssistsPerPlayer", "TotalAssists"),
+        ("AvgxGPerPlayer", "TotalxG"),
+        ("AvgxAGPerPlayer", "TotalxAG"),
+    ]:
+        out[col] = out[total] / out["UniquePlayers"]
+    out["AvgAge"] = totals["AgeSum"] / totals["AgeCount"]
+    out["MinAge"] = totals["MinAge"]
+    out["MaxAge"] = totals["MaxAge"]
+    out["AgeRange"] = out["MaxAge"] - out["MinAge"]
+    return out.reset_index(drop=True)
+
+
+def squad_depth_metrics(totals):
+    counts = totals[["Forwards", "Midfielders", "Defenders", "Goalkeepers"]].astype("int64")
+    out = counts.assign(
+        TotalPlayers=counts.sum(axis=1),
+        PositionBalance=100
+        - (counts["Forwards"] - counts["Midfielders"]).abs()
+        - (counts["Midfielders"] - counts["Defenders"]).abs(),
+    )
+    return out.rename_axis("Team").reset_index()
+
+
+def age_profile(totals):
+    out = totals[["YoungPlayers", "PrimePlayers", "ExperiencedPlayers"]].astype("int64")
+    out["AvgAge"] = totals["AgeSum"] / totals["AgeCount"]
+    return out.rename_axis("Team").reset_index()
+
+
+def top_players(partials, per_team=5):
+    score = pd.DataFrame(
+        {
+            "Team": partials["Team"].astype(object),
+            "Player": partials["Player"].astype(object),
+            "Goals": partials["Goals"],
+            "Assists": partials["Assists"],
+            XG: partials[XG],
+            XAG: partials[XAG],
+            "Minutes": partials["Minutes"],
+        }
+    )
+    score["PlayerScore"] = (
+        score["Goals"] * 3 + score["Assists"] * 2 + score[XG] * 1.5 + score[XAG] * 1
+    )
+    # Player breaks ties, as the (Team, Player)-sorted groupby in the notebook did.
+    return (
+        score.sort_values(["Team", "PlayerScore", "Player"], ascending=[True, False, True])
+        .groupby("Team")
+        .head(per_team)
+        .reset_index(drop=True)
+    )
+
+
+def squad_value_scores(quality, depth, ages):
+    result = quality.merge(depth, on="Team", how="left")
+    result = result.merge(ages, on="Team", how="left")
+    result["SquadValueScore"] = (
+        (result["AvgGoalsPerPlayer"] / result["AvgGoalsPerPlayer"].max() * 30)
+        + (result["AvgAssistsPerPlayer"] / result["AvgAssistsPerPlayer"].max() * 25)
+        + (result["AvgxGPerPlayer"] / result["AvgxGPerPlayer"].max() * 25)
+        + (result["AvgxAGPerPlayer"] / result["AvgxAGPerPlayer"].max() * 20)
+    ).fillna(0)
+    return result
+
+
+def compute_all(players):
+    partials = player_partials(compact(players))
+    totals = team_totals(partials)
+    quality = squad_quality_metrics(totals)
+    depth = squad_depth_metrics(totals)
+    ages = age_profile(totals)
+    return {
+        "squad_quality_metrics": quality,
+        "squad_depth_metrics": depth,
+        "age_profile": ages,
+        "top_players": top_players(partials),
+        "squad_value_scores": squad_value_scores(quality, depth, ages),
+    }
+
+
+def build():
+    for name, df in compute_all(read_players()).items():
+        write_dataset(name, df)
+
+
+def benchmark(scales=(1, 50), seed=0):
+    """Time and peak memory of ``compute_all`` on scaled-up player logs."""
+    from laliga.synthetic import scale_players
+
+    players = load("players_clean")
+    rows = []
+    for factor in scales:
+        log = scale_players(players, factor, seed=seed)
+        small = compact(log)
+        start = time.perf_counter()
+        compute_all(small)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        compute_all(small)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rows.append(
+            {
+                "scale": factor,
+                "rows": len(log),
+                "frame_mb": log.memory_usage(deep=True).sum() / 2**20,
+                "compact_mb": small.memory_usage(deep=True).sum() / 2**20,
+                "seconds": elapsed,
+                "peak_mb": peak / 2**20,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--check", action="store_true", help="compare with CSVs on disk")
+    parser.add_argument("--benchmark", action="store_true", help="time on scaled data")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 50])
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        print(benchmark(args.scales).to_string(index=False))
+        return 0
+
+    tables = compute_all(read_players())
+    if args.check:
+        failures = diff_against_disk(tables)
+        for name, message in failures:
+            print(f"{name} ({DATASETS[name]}) differs:\n{message}\n")
+        print("ok" if not failures else f"{len(failures)} table(s) differ")
+        return 1 if failures else 0
+    for name, df in tables.items():
+        write_dataset(name, df)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+"""Synthetic scale-ups of the cleaned datasets for benchmarking.
+
+Each function returns ``factor`` copies of the real table. Copy 0 is the
+original data; every further copy is a new league with suffixed team names
+and its match results (or player stats) shuffled between rows, so the
+number of teams and the number of rows both grow with ``factor``.
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+def _suffix(values, k):
+    if k == 0:
+        return values
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.rename_categories(lambda c: f"{c} L{k}")
+    return values.astype(str) + f" L{k}"
+
+
+def _concat(copies):
+    """Concatenate copies, keeping categorical columns categorical."""
+    for col in copies[0].columns:
+        if isinstance(copies[0][col].dtype, pd.CategoricalDtype):
+            cats = union_categoricals([c[col] for c in copies], ignore_order=True).categories
+            for c in copies:
+                c[col] = c[col].cat.set_categories(cats)
+    return pd.concat(copies, ignore_index=True)
+
+
+def _shuffle_columns(df, cols, rng):
+    order = rng.permutation(len(df))
+    for col in cols:
+        df[col] = df[col].iloc[order].set_axis(df.index)
+    return df
+
+
+def scale_matches(matches, factor, seed=0):
+    """Scale a ``matches_5y``-shaped frame."""
+    rng = np.random.default_rng(seed)
+    result_cols = [
+        c
+        for c in ["FTHG", "FTAG", "FTR", "HTHG", "HTAG", "HTR", "HomePoints", "AwayPoints"]
+        if c in matches.columns
+    ]
+    copies = []
+    for k in range(factor):
+        df = matches.copy()
+        df["HomeTeam"] = _suffix(df["HomeTeam"], k)
+        df["AwayTeam"] = _suffix(df["AwayTeam"], k)
+        if k:
+            df = _shuffle_columns(df, result_cols, rng)
+        copies.append(df)
+    return _concat(copies)
+
+
+def scale_matches_detailed(detailed, factor, seed=0):
+    """Scale a ``matches_detailed``-shaped frame."""
+    rng = np.random.default_rng(seed)
+    stat_cols = [
+        c
+        for c in ["result", "gf", "ga", "xg", "xga", "poss", "attendance"]
+        if c in detailed.columns
+    ]
+    copies = []
+    for k in range(factor):
+        df = detailed.copy()
+        df["team"] = _suffix(df["team"], k)
+        df["opponent"] = _suffix(df["opponent"], k)
+        if k:
+            df = _shuffle_columns(df, stat_cols, rng)
+        copies.append(df)
+    return _concat(copies)
+
+
+def scale_players(players, factor, seed=0):
+    """Scale a ``players_clean``-shaped frame."""
+    rng = np.random.default_rng(seed)
+    stat_cols = [
+        c
+        for c in [
+            "Minutes",
+            "Goals",
+            "Assists",
+            "Expected Goals (xG)",
+            "Expected Assists (xAG)",
+        ]
+        if c in players.columns
+    ]
+    copies = []
+    for k in range(factor):
+        df = players.copy()
+        df["Team"] = _suffix(df["Team"], k)
+        if k:
+            df = _shuffle_columns(df, stat_cols, rng)
+        copies.append(df)
+    return _concat(copies)
+
+
+def scale_teams(table, factor, column="Team"):
+    """Scale a one-row-per-team table (no shuffling: rows are already aggregates)."""
+    copies = []
+    for k in range(factor):
+        df = table.copy()
+        df[column] = _suffix(df[column], k)
+        copies.append(df)
+    return _concat(copies)
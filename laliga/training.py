@@ -0,0 +1,407 @@
+"""Training command for the investment and sporting Random Forests.
+
+Replaces the fitting cells of ``modelling.ipynb``. The investment model's
+hyperparameters are chosen by successive halving over ``n_estimators``:
+every tree-shape configuration is scored with 200 trees, the best third is
+grown to 300, and the best third of those to 400. Forests are grown with
+``warm_start``, so going from 200 to 300 trees fits only the 100 new trees,
+and the grown forest is identical to a fresh fit of the same size.
+
+Fold splits and per-fold scores are cached by a hash of the training data
+(``State/training_cache.json``), so retraining on unchanged data only refits
+the final models, and the final cross-validation scores come from the
+search instead of a second ``cross_val_score`` pass. Both models train in
+parallel worker processes and are written as the pickles the dashboard
+loads. A model whose training-data hash and chosen parameters match its
+existing pickle is not refitted or rewritten; only a missing or stale
+``.npz`` export is regenerated from the pickle.
+
+Usage::
+
+    python -m laliga.training                    # train both models
+    python -m laliga.training investment --jobs 1
+    python -m laliga.training --out-dir /tmp/models
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import pickle
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold, train_test_split
+
+from laliga import forest
+from laliga.data import DATASETS_DIR, file_digest
+from laliga.features import load_features
+from laliga.models import MODELS, MODELS_DIR
+
+CACHE_PATH = DATASETS_DIR / "State" / "training_cache.json"
+RANDOM_STATE = 42
+CV_FOLDS = 5
+HALVING_FACTOR = 3
+
+SPECS = {
+    "investment": {
+        "features": [
+            "WinRate",
+            "PointsPerGame",
+            "GoalDifference",
+            "AvgLeaguePosition",
+            "SquadValueScore",
+            "xGDifference",
+            "AvgAttendance",
+            "AvgAge_x",
+        ],
+        "target": "TargetScore",
+        "test_size": 0.25,
+        "grid": {
+            "max_depth": [3, 5, 10],
+            "min_samples_split": [2, 5],
+            "min_samples_leaf": [1, 2],
+        },
+        "n_estimators": [200, 300, 400],
+    },
+    "sporting": {
+        "features": [
+            "AvgLeaguePosition",
+            "GoalDifference",
+            "xGDifference",
+            "PointsPerGame",
+            "SquadValueScore",
+            "AvgAge_x",
+            "Elo",
+        ],
+        "target": "WinRate",
+        "test_size": 0.2,
+        "params": {"n_estimators": 100},
+    },
+}
+
+
+def prepare(features):
+    """Fill gaps and add ``TargetScore`` as the notebook does."""
+    data = features.fillna(features.median(numeric_only=True)).fillna(0)
+    data["TargetScore"] = (
+        data["WinRate"] * 40
+        + data["PointsPerGame"] * 25
+        + data["GoalDifference"] * 0.15
+        + data.get("xGDifference", 0) * 0.20
+    )
+    return data
+
+
+def data_hash(X, y):
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(",".join(X.columns).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class FoldCache:
+    """Fold splits and per-fold scores, keyed by training-data hash."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = Path(path)
+        data = json.loads(self.path.read_text()) if self.path.exists() else {}
+        self.folds = data.get("folds", {})
+        self.scores = data.get("scores", {})
+        self.new = {"folds": {}, "scores": {}}
+
+    def splits(self, dhash, n_rows):
+        if dhash not in self.folds:
+            kfold = KFold(CV_FOLDS)
+            splits = [[tr.tolist(), te.tolist()] for tr, te in kfold.split(np.arange(n_rows))]
+            self.folds[dhash] = self.new["folds"][dhash] = splits
+        return [(np.array(tr), np.array(te)) for tr, te in self.folds[dhash]]
+
+    def score_key(self, dhash, fold, params):
+        return f"{dhash}|{fold}|{json.dumps(params, sort_keys=True)}"
+
+    def put(self, key, value):
+        self.scores[key] = self.new["scores"][key] = value
+
+    def merge(self, new):
+        self.folds.update(new["folds"])
+        self.scores.update(new["scores"])
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"folds": self.folds, "scores": self.scores}))
+        tmp.replace(self.path)
+
+
+class _Search:
+    """Successive halving with warm-started forests kept across rungs."""
+
+    def __init__(self, X, y, cache, dhash, jobs=1):
+        self.X = X.to_numpy(dtype=float)
+        self.y = y.to_numpy(dtype=float)
+        self.cache = cache
+        self.dhash = dhash
+        self.folds = cache.splits(dhash, len(y))
+        self.jobs = jobs
+        self.forests = {}
+        self.fits = 0
+        self.cached = 0
+
+    def fold_scores(self, config, n_estimators):
+        """``(mse, r2)`` per fold for ``config`` grown to ``n_estimators`` trees."""
+        params = dict(config, n_estimators=n_estimators)
+        out = []
+        for i, (train, test) in enumerate(self.folds):
+            key = self.cache.score_key(self.dhash, i, params)
+            if key in self.cache.scores:
+                self.cached += 1
+                out.append(self.cache.scores[key])
+                continue
+            # A forest from an earlier rung only needs its extra trees; with
+            # the earlier rungs cached it is fitted fresh at this size.
+            forest_key = (i, tuple(sorted(config.items())))
+            forest = self.forests.get(forest_key)
+            if forest is None:
+                forest = RandomForestRegressor(
+                    random_state=RANDOM_STATE, warm_start=True, n_jobs=self.jobs, **config
+                )
+                self.forests[forest_key] = forest
+            forest.set_params(n_estimators=n_estimators)
+            forest.fit(self.X[train], self.y[train])
+            self.fits += 1
+            pred = forest.predict(self.X[test])
+            score = [
+                float(mean_squared_error(self.y[test], pred)),
+                float(r2_score(self.y[test], pred)),
+            ]
+            self.cache.put(key, score)
+            out.append(score)
+        return np.array(out)
+
+    def run(self, grid, levels):
+        names = sorted(grid)
+        candidates = [
+            dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))
+        ]
+        rungs = []
+        for rung, n_estimators in enumerate(levels):
+            scores = [self.fold_scores(c, n_estimators) for c in candidates]
+            mean_mse = np.array([s[:, 0].mean() for s in scores])
+            rungs.append({"n_estimators": n_estimators, "candidates": len(candidates)})
+            order = np.argsort(mean_mse, kind="stable")
+            if rung == len(levels) - 1:
+                best = order[0]
+                return dict(candidates[best], n_estimators=n_estimators), scores[best], rungs
+            keep = max(1, math.ceil(len(candidates) / HALVING_FACTOR))
+            candidates = [candidates[i] for i in order[:keep]]
+
+
+def tune(X_train, y_train, name="investment", cache=None, jobs=1):
+    """Successive-halving search for ``name``'s grid on the training split.
+
+    Returns the best parameters, the ``(mse, r2)`` fold scores of the best
+    configuration, and a report dict.
+    """
+    spec = SPECS[name]
+    cache = cache if cache is not None else FoldCache()
+    search = _Search(X_train, y_train, cache, data_hash(X_train, y_train), jobs)
+    params, fold_scores, rungs = search.run(spec["grid"], spec["n_estimators"])
+    return params, fold_scores, {"fits": search.fits, "cached": search.cached, "rungs": rungs}
+
+
+def _metrics(model, X_train, X_test, y_train, y_test):
+    out = {}
+    for split, X, y in (("train", X_train, y_train), ("test", X_test, y_test)):
+        pred = model.predict(X)
+        out[f"{split}_r2"] = float(r2_score(y, pred))
+        out[f"{split}_mae"] = float(mean_absolute_error(y, pred))
+        out[f"{split}_rmse"] = float(np.sqrt(mean_squared_error(y, pred)))
+    return out
+
+
+def train(name, data, cache, jobs=1, previous=None):
+    """Fit one model; return its pickle payload and a report dict.
+
+    ``previous`` is the summary of the existing pickle (see ``summary``). When
+    it was trained on the same data with the same parameters the fit is
+    skipped and the payload is ``None``.
+    """
+    spec = SPECS[name]
+    start = time.perf_counter()
+    features = [f for f in spec["features"] if f in data.columns]
+    X_train, X_test, y_train, y_test = train_test_split(
+        data[features],
+        data[spec["target"]],
+        test_size=spec["test_size"],
+        random_state=RANDOM_STATE,
+        shuffle=True,
+    )
+    dhash = data_hash(X_train, y_train)
+    report = {"model": name, "data_hash": dhash, "fits": 0, "cached": 0}
+
+    cv = None
+    if "grid" in spec:
+        params, fold_scores, search = tune(X_train, y_train, name, cache, jobs)
+        cv = fold_scores[:, 1]
+        report.update(search)
+    else:
+        params = dict(spec["params"])
+
+    unchanged = previous is not None and (
+        previous["features"] == features
+        and previous["best_params"] == params
+        and previous["data_hash"] == dhash
+    )
+    if unchanged:
+        report.update(
+            params=params,
+            seconds=time.perf_counter() - start,
+            unchanged=True,
+            **previous["metrics"],
+        )
+        return None, report
+
+    model = RandomForestRegressor(random_state=RANDOM_STATE, n_jobs=jobs, **params)
+    model.fit(X_train, y_train)
+    metrics = _metrics(model, X_train, X_test, y_train, y_test)
+    if cv is not None:
+        metrics.update(cv_mean=float(cv.mean()), cv_std=float(cv.std()))
+
+    fi = pd.DataFrame(
+        {"Feature": features, "Importance": model.feature_importances_}
+    ).sort_values(by="Importance", ascending=False)
+    payload = {
+        "model": model,
+        "features": features,
+        "best_params": params,
+        "metrics": metrics,
+        "feature_importance": fi.to_dict(),
+        "training_date": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "data_hash": dhash,
+    }
+    report.update(params=params, seconds=time.perf_counter() - start, unchanged=False, **metrics)
+    return payload, report
+
+
+def _load(path):
+    import joblib
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return joblib.load(path)
+
+
+def summary(path):
+    """What ``train`` compares against in the pickle at ``path``, or ``None``."""
+    if not Path(path).exists():
+        return None
+    payload = _load(path)
+    if not isinstance(payload, dict) or "data_hash" not in payload:
+        return None
+    return {
+        "features": payload.get("features"),
+        "best_params": payload.get("best_params"),
+        "data_hash": payload["data_hash"],
+        "metrics": {k: float(v) for k, v in payload.get("metrics", {}).items()},
+    }
+
+
+def _export_current(path):
+    """Whether ``path``'s ``.npz`` export is in the current format and from this pickle."""
+    npz = forest.array_path(path)
+    if not npz.exists():
+        return False
+    meta = forest.read_meta(npz)
+    return meta.get("format") == forest.FORMAT_VERSION and meta.get(
+        "source_digest"
+    ) == file_digest(path)
+
+
+def _train_worker(args):
+    name, data, cache_path, jobs, previous = args
+    cache = FoldCache(cache_path)
+    payload, report = train(name, data, cache, jobs, previous)
+    return name, payload, report, cache.new
+
+
+def write_artifact(payload, path):
+    """Pickle atomically so the dashboard never reads a half-written model."""
+    path = Path(path)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(payload, f)
+    tmp.replace(path)
+
+
+def train_all(names=None, out_dir=MODELS_DIR, jobs=None, cache_path=CACHE_PATH):
+    """Train ``names`` (default: all) in parallel and write their pickles.
+
+    Pickles and exports are only rewritten for models that changed.
+    """
+    names = list(names or SPECS)
+    data = prepare(load_features(rebuild_stale=True))
+    jobs = jobs or os.cpu_count() or 1
+    paths = {name: Path(out_dir) / MODELS[name] for name in names}
+    tasks = [
+        (name, data, cache_path, max(1, jobs // len(names)), summary(paths[name]))
+        for name in names
+    ]
+    if jobs == 1 or len(tasks) == 1:
+        results = list(map(_train_worker, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+            results = list(pool.map(_train_worker, tasks))
+
+    cache = FoldCache(cache_path)
+    reports = []
+    for name, payload, report, new in results:
+        cache.merge(new)
+        path = paths[name]
+        if payload is not None:
+            write_artifact(payload, path)
+            forest.export(payload, forest.array_path(path), name=name, source=path)
+        elif not _export_current(path):
+            forest.export(_load(path), forest.array_path(path), name=name, source=path)
+        reports.append(report)
+    cache.save()
+    return reports
+
+
+def build():
+    train_all()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("models", nargs="*", metavar="MODEL", help=f"any of {list(SPECS)}")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--out-dir", type=Path, default=MODELS_DIR)
+    args = parser.parse_args(argv)
+    unknown = sorted(set(args.models) - set(SPECS))
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    for r in train_all(args.models, args.out_dir, args.jobs):
+        print(
+            f"{r['model']:<10} {r['seconds']:6.2f}s  fits={r['fits']:<3} cached={r['cached']:<3}"
+            f" test_r2={r['test_r2']:.4f}  {r['params']}"
+            + ("  (unchanged)" if r["unchanged"] else "")
+        )
+    print(f"total {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
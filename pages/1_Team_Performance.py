@@ -1,12 +1,18 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
+from laliga import figures, profiling
+from laliga.data import load
+from laliga.form import DEFAULT_WINDOW, form_summary, get_store, team_form
+
 st.set_page_config(page_title="Team Performance", layout="wide")
 
+profiling.start_rerun("Team Performance")
+
 st.title("Team Performance Analysis")
 
-df_perf = pd.read_csv("Analysis/CleanedDatasets/Analysis/performance_metrics.csv")
-df_xg = pd.read_csv("Analysis/CleanedDatasets/Analysis/xg_metrics.csv")
+profiling.stage("load")
+df_perf = load("performance_metrics")
+df_xg = load("xg_metrics")
 
 st.subheader("Key Performance Metrics")
 teams = df_perf["Team"].unique()
@@ -17,29 +23,48 @@ if selected_teams:
 else:
     df_filtered = df_perf
 
-st.markdown("### Top 10 Teams by Total Points")
-top_10_points = df_filtered.sort_values(by="TotalPoints", ascending=False).head(10)
-fig_points = px.bar(
-    top_10_points, 
-    x="TotalPoints", 
-    y="Team", 
-    orientation='h',
-    title="Top 10 Teams by Total Points",
-    color="TotalPoints",
-    color_continuous_scale="Viridis",
-    text="TotalPoints"
+store = get_store()
+date_range = st.sidebar.date_input(
+    "Form Date Range",
+    value=(store.first_date.date(), store.last_date.date()),
+    min_value=store.first_date.date(),
+    max_value=store.last_date.date(),
 )
-fig_points.update_layout(yaxis={'categoryorder':'total ascending'})
-st.plotly_chart(fig_points, use_container_width=True)
+# While a range is being picked the widget returns only its start.
+start, end = (tuple(date_range) + (store.last_date.date(),))[:2]
+window = st.sidebar.slider("Form Window (matches)", 3, 38, DEFAULT_WINDOW)
 
-st.divider()
+profiling.stage("points_charts", teams=len(selected_teams))
+st.markdown("### Top 10 Teams by Total Points")
+perf_version = figures.dataset_version("performance_metrics")
+team_key = sorted(selected_teams)
 
-col1, col2 = st.columns(2)
 
-with col1:
-    st.markdown("### Win Rate vs Loss Rate")
-    fig_win_loss = px.scatter(
-        df_filtered, 
+def filter_teams(df, teams):
+    return df[df["Team"].isin(teams)] if teams else df
+
+
+def points_figure(teams):
+    top_10_points = (
+        filter_teams(df_perf, teams).sort_values(by="TotalPoints", ascending=False).head(10)
+    )
+    fig = px.bar(
+        top_10_points, 
+        x="TotalPoints", 
+        y="Team", 
+        orientation='h',
+        title="Top 10 Teams by Total Points",
+        color="TotalPoints",
+        color_continuous_scale="Viridis",
+        text="TotalPoints"
+    )
+    fig.update_layout(yaxis={'categoryorder':'total ascending'})
+    return fig
+
+
+def win_loss_figure(teams):
+    return px.scatter(
+        filter_teams(df_perf, teams), 
         x="WinRate", 
         y="LossRate", 
         text="Team", 
@@ -47,32 +72,94 @@ with col1:
         color="Team",
         title="Win Rate vs Loss Rate"
     )
-    st.plotly_chart(fig_win_loss, use_container_width=True)
 
-with col2:
-    st.markdown("### Goals Breakdown")
-    fig_goals = px.bar(
-        df_filtered, 
+
+def goals_figure(teams):
+    fig = px.bar(
+        filter_teams(df_perf, teams), 
         x="Team", 
         y=["TotalGoalsFor", "TotalGoalsAgainst"], 
         barmode="group",
         title="Goals For vs Goals Against"
     )
-    fig_goals.update_layout(xaxis_tickangle=-90)
+    fig.update_layout(xaxis_tickangle=-90)
+    return fig
+
+
+fig_points = figures.cached("performance.points", perf_version, points_figure, teams=team_key)
+st.plotly_chart(fig_points, use_container_width=True)
+
+st.divider()
+
+col1, col2 = st.columns(2)
+
+with col1:
+    st.markdown("### Win Rate vs Loss Rate")
+    fig_win_loss = figures.cached(
+        "performance.win_loss", perf_version, win_loss_figure, teams=team_key
+    )
+    st.plotly_chart(fig_win_loss, use_container_width=True)
+
+with col2:
+    st.markdown("### Goals Breakdown")
+    fig_goals = figures.cached("performance.goals", perf_version, goals_figure, teams=team_key)
     st.plotly_chart(fig_goals, use_container_width=True)
 
+profiling.stage("xg_chart")
 st.markdown("### Expected Goals (xG) Analysis")
-xg_filtered = df_xg[df_xg["Team"].isin(selected_teams)] if selected_teams else df_xg
-
-fig_xg = px.bar(
-    xg_filtered,
-    x="Team",
-    y=["AvgxG", "AvgxGA"],
-    barmode="group",
-    title="Average xG vs xAG (Expected Goals vs Assisted Goals)"
+
+
+def xg_figure(teams):
+    fig = px.bar(
+        filter_teams(df_xg, teams),
+        x="Team",
+        y=["AvgxG", "AvgxGA"],
+        barmode="group",
+        title="Average xG vs xAG (Expected Goals vs Assisted Goals)"
+    )
+    fig.update_layout(xaxis_tickangle=-90)
+    return fig
+
+
+fig_xg = figures.cached(
+    "performance.xg", figures.dataset_version("xg_metrics"), xg_figure, teams=team_key
 )
-fig_xg.update_layout(xaxis_tickangle=-90)
 st.plotly_chart(fig_xg, use_container_width=True)
 
+profiling.stage("recent_form", window=window, start=start, end=end)
+st.markdown(f"### Recent Form ({start} to {end}, {window}-match window)")
+form_teams = tuple(selected_teams) if selected_teams else tuple(store.teams)
+form = team_form(form_teams, window, start, end)
+
+if form.empty:
+    st.info("No matches for the selected teams in this date range.")
+else:
+    st.dataframe(form_summary(form_teams, window, start, end), use_container_width=True)
+
+    form_version = figures.dataset_version("matches_detailed")
+    form_params = dict(teams=form_teams, window=window, start=start, end=end)
+
+    def form_figure(column, title):
+        def build(teams, window, start, end):
+            return figures.grouped_lines(
+                team_form(teams, window, start, end), "Date", column, "Team", title=title
+            )
+
+        return figures.cached(f"performance.form.{column}", form_version, build, **form_params)
+
+    fig_form = form_figure("FormPPG", f"Points per Game over the Last {window} Matches")
+    st.plotly_chart(fig_form, use_container_width=True)
+
+    col3, col4 = st.columns(2)
+    with col3:
+        fig_xg_trend = form_figure("RollingxGDiff", f"Rolling xG - xGA ({window} Matches)")
+        st.plotly_chart(fig_xg_trend, use_container_width=True)
+    with col4:
+        fig_strength = form_figure("EWStrength", "Exponentially Weighted Strength")
+        st.plotly_chart(fig_strength, use_container_width=True)
+
+profiling.stage("metrics_table")
 st.markdown("### Detailed Metrics Table")
 st.dataframe(df_filtered)
+
+profiling.finish_rerun()
@@ -1,17 +1,20 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+from laliga import figures, profiling
+from laliga.data import load
+from laliga.financial import AVG_TICKET_PRICE
+from laliga.partitions import manifest_version
+from laliga.revenue import ScenarioGrid, attendance_seasons, scenarios
 
 st.set_page_config(page_title="Financial Analysis", layout="wide")
 
-st.title("Financial Analysis")
-
-FILE_PATH = "Analysis/CleanedDatasets/Financial/financial_scores.csv"
+profiling.start_rerun("Financial Analysis")
 
-def load_data():
-    return pd.read_csv(FILE_PATH)
+st.title("Financial Analysis")
 
-df = load_data()
+profiling.stage("load")
+df = load("financial_scores")
 
 st.subheader("Financial Metrics & Scores")
 
@@ -23,31 +26,188 @@ if selected_teams:
 else:
     df_filtered = df
 
+profiling.stage("charts", teams=len(selected_teams))
+finance_version = figures.dataset_version("financial_scores")
+team_key = sorted(selected_teams)
+
+
+def team_bar_figure(column, title, scale, teams):
+    fig = px.bar(
+        df[df["Team"].isin(teams)] if teams else df, 
+        x="Team", 
+        y=column, 
+        title=title,
+        color=column,
+        color_continuous_scale=scale
+    )
+    fig.update_layout(xaxis_tickangle=-90)
+    return fig
+
+
 col1, col2 = st.columns(2)
 
 with col1:
-    fig_avg_att = px.bar(
-        df_filtered, 
-        x="Team", 
-        y="AvgAttendance", 
+    fig_avg_att = figures.cached(
+        "financial.attendance",
+        finance_version,
+        team_bar_figure,
+        column="AvgAttendance",
         title="Average Attendance by Team",
-        color="AvgAttendance",
-        color_continuous_scale="Blues"
+        scale="Blues",
+        teams=team_key,
     )
-    fig_avg_att.update_layout(xaxis_tickangle=-90)
     st.plotly_chart(fig_avg_att, use_container_width=True)
         
 with col2:
-    fig_rev = px.bar(
-        df_filtered, 
-        x="Team", 
-        y="EstimatedMatchdayRevenue", 
+    fig_rev = figures.cached(
+        "financial.revenue",
+        finance_version,
+        team_bar_figure,
+        column="EstimatedMatchdayRevenue",
         title="Estimated Matchday Revenue (€)",
-        color="EstimatedMatchdayRevenue",
-        color_continuous_scale="Greens"
+        scale="Greens",
+        teams=team_key,
     )
-    fig_rev.update_layout(xaxis_tickangle=-90)
     st.plotly_chart(fig_rev, use_container_width=True)
 
+profiling.stage("table")
 st.markdown("### Financial Data")
 st.dataframe(df_filtered)
+
+profiling.stage("scenario_grid")
+st.markdown("### Matchday Revenue Scenarios")
+st.write(
+    "Season revenue from each home match's attendance under a grid of ticket prices, "
+    "stadium capacities and price elasticities. Attendance at the reference price of "
+    f"€{AVG_TICKET_PRICE} is the observed crowd. It scales by (price / {AVG_TICKET_PRICE})"
+    "^-elasticity and is capped by capacity."
+)
+rev_seasons = attendance_seasons()
+c1, c2, c3, c4 = st.columns(4)
+rev_season = c1.selectbox("Season", rev_seasons, index=len(rev_seasons) - 1, key="rev_season")
+price_range = c2.slider("Ticket price (€)", 10, 200, (30, 90), step=5, key="rev_prices")
+capacity_range = c3.slider(
+    "Capacity (x season max crowd)", 0.7, 1.5, (0.9, 1.2), step=0.05, key="rev_capacity"
+)
+elasticity_range = c4.slider(
+    "Price elasticity", 0.0, 2.0, (0.0, 1.5), step=0.1, key="rev_elasticity"
+)
+grid = ScenarioGrid.linspace(
+    (*price_range, 41), (*capacity_range, 7), (*elasticity_range, 11)
+)
+result = scenarios(grid, rev_season)
+st.caption(
+    f"{grid.size:,} scenarios for {len(result.teams)} teams with recorded home "
+    f"attendance in {rev_season}."
+)
+
+profiling.stage("scenario_charts")
+rev_teams = [t for t in result.teams if t in set(selected_teams)] or list(result.teams)
+rev_version = (figures.dataset_version("matches_detailed"), manifest_version(), grid, rev_season)
+
+
+def nearest(options, value):
+    return min(options, key=lambda v: abs(v - value))
+
+
+# No keys: a new grid gives new options, and the selection resets.
+s1, s2, s3 = st.columns(3)
+price = s1.select_slider(
+    "Price (€)", options=grid.prices, value=nearest(grid.prices, AVG_TICKET_PRICE)
+)
+capacity = s2.select_slider(
+    "Capacity", options=grid.capacities, value=nearest(grid.capacities, 1.0)
+)
+elasticity = s3.select_slider(
+    "Elasticity", options=grid.elasticities, value=grid.elasticities[len(grid.elasticities) // 2]
+)
+
+
+def scenario_figure(teams, price, capacity, elasticity):
+    at = result.at(price, capacity, elasticity)
+    at = at[at["Team"].isin(teams)].melt(
+        id_vars="Team",
+        value_vars=["BaselineRevenue", "Revenue"],
+        var_name="Case",
+        value_name="Revenue (€)",
+    )
+    at["Case"] = at["Case"].map(
+        {"BaselineRevenue": f"€{AVG_TICKET_PRICE}, observed", "Revenue": "Scenario"}
+    )
+    fig = px.bar(
+        at, x="Team", y="Revenue (€)", color="Case", barmode="group",
+        title=(
+            f"Season Revenue at €{price:.0f}, capacity x{capacity:.2f}, "
+            f"elasticity {elasticity:.1f}"
+        ),
+    )
+    fig.update_layout(xaxis_tickangle=-90)
+    return fig
+
+
+def spread_figure(teams):
+    spread = result.percentiles()
+    spread = spread[spread["Team"].isin(teams)]
+    fig = go.Figure(
+        [
+            figures.range_segments(
+                spread["Team"], spread["P5"], spread["P95"], horizontal=False,
+                name="P5-P95", line={"width": 6, "color": "rgba(99, 110, 250, 0.35)"},
+            ),
+            figures.range_segments(
+                spread["Team"], spread["P25"], spread["P75"], horizontal=False,
+                name="P25-P75", line={"width": 12, "color": "rgba(99, 110, 250, 0.8)"},
+            ),
+            go.Scatter(
+                x=spread["Team"], y=spread["P50"], mode="markers", name="Median",
+                marker={"color": "#EF553B", "size": 9},
+            ),
+        ]
+    )
+    fig.update_layout(
+        title="Season Revenue Across All Scenarios", yaxis_title="Revenue (€)",
+        xaxis_tickangle=-90,
+    )
+    return fig
+
+
+def price_curve_figure(teams, capacity, elasticity):
+    curve = result.price_curve(capacity, elasticity)
+    return figures.grouped_lines(
+        curve[curve["Team"].isin(teams)], x="Price", y="Revenue", group="Team",
+        title=f"Revenue vs Ticket Price (capacity x{capacity:.2f}, elasticity {elasticity:.1f})",
+    )
+
+
+st.plotly_chart(
+    figures.cached(
+        "financial.scenario", rev_version, scenario_figure,
+        teams=rev_teams, price=price, capacity=capacity, elasticity=elasticity,
+    ),
+    use_container_width=True,
+)
+col3, col4 = st.columns(2)
+with col3:
+    st.plotly_chart(
+        figures.cached("financial.spread", rev_version, spread_figure, teams=rev_teams),
+        use_container_width=True,
+    )
+with col4:
+    st.plotly_chart(
+        figures.cached(
+            "financial.price_curve", rev_version, price_curve_figure,
+            teams=rev_teams, capacity=capacity, elasticity=elasticity,
+        ),
+        use_container_width=True,
+    )
+
+best = result.best_prices(capacity, elasticity)
+st.markdown("#### Revenue-Maximising Price")
+st.dataframe(
+    best[best["Team"].isin(rev_teams)].style.format(
+        {"BestPrice": "€{:.1f}", "BestRevenue": "€{:,.0f}"}
+    ),
+    hide_index=True,
+)
+
+profiling.finish_rerun()
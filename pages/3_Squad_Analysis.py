@@ -1,52 +1,67 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from laliga import figures, profiling
+from laliga.data import load
+from laliga.scouting import GROUPS, get_index as get_player_index
 
 st.set_page_config(page_title="Squad Analysis", layout="wide")
 
-st.title("Squad Analysis")
-
-DATA_DIR = "Analysis/CleanedDatasets/SquadAnalysis"
+profiling.start_rerun("Squad Analysis")
 
+st.title("Squad Analysis")
 
-df_squad = pd.read_csv(f"{DATA_DIR}/squad_value_scores.csv")
-df_players = pd.read_csv(f"{DATA_DIR}/TopPlayersPerTeam.csv")
-df_age = pd.read_csv(f"{DATA_DIR}/AgeProfilePerTeam.csv")
-league_pos = pd.read_csv("Analysis/CleanedDatasets/Analysis/league_positions.csv")
+profiling.stage("load")
+df_squad = load("squad_value_scores")
+df_players = load("top_players")
+df_age = load("age_profile")
+league_pos = load("league_positions")
 
 st.header("League Trend ")
 
 teams_trend = league_pos["Team"].unique()
+latest_season = league_pos[league_pos["Season"] == league_pos["Season"].max()]
 selected_trend_teams = st.multiselect(
     "Select Teams for League Position Trend",
     options=list(teams_trend),
-    default=list(teams_trend),
-)
-filtered_league_pos = (
-    league_pos[league_pos["Team"].isin(selected_trend_teams)]
-    if selected_trend_teams
-    else league_pos
+    default=list(latest_season.sort_values("Position")["Team"].head(5)),
 )
-fig_position_trend = px.line(
-    filtered_league_pos,
-    x="Season",
-    y="Position",
-    color="Team",
-    title=f"League Position Trend for Selected Teams",
-    markers=True,
+profiling.stage("league_trend", teams=len(selected_trend_teams))
+
+
+def position_trend_figure(teams):
+    filtered = league_pos[league_pos["Team"].isin(teams)] if teams else league_pos
+    fig = figures.grouped_lines(
+        filtered,
+        x="Season",
+        y="Position",
+        group="Team",
+        markers=True,
+        title="League Position Trend for Selected Teams",
+    )
+    fig.update_yaxes(autorange="reversed", title="Position (1=Top)")
+    return fig
+
+
+fig_position_trend = figures.cached(
+    "squad.position_trend",
+    figures.dataset_version("league_positions"),
+    position_trend_figure,
+    teams=sorted(selected_trend_teams),
 )
-fig_position_trend.update_yaxes(autorange="reversed", title="Position (1=Top)")
 st.plotly_chart(fig_position_trend, use_container_width=True)
 
 
 st.header("Squad Overview")
 
+profiling.stage("squad_value")
 col1, col2 = st.columns(2)
 
-with col1:
-    st.subheader("Squad Value Score")
-    fig_val = px.bar(
+squad_version = figures.dataset_version("squad_value_scores")
+
+
+def squad_value_figure():
+    fig = px.bar(
         df_squad,
         x="SquadValueScore",
         y="Team",
@@ -55,29 +70,28 @@ with col1:
         color="SquadValueScore",
         color_continuous_scale="Viridis",
     )
-    fig_val.update_layout(yaxis={"categoryorder": "total ascending"})
-    st.plotly_chart(fig_val, use_container_width=True)
+    fig.update_layout(yaxis={"categoryorder": "total ascending"})
+    return fig
 
-with col2:
-    st.subheader("Age Range & Average")
 
+def age_range_figure():
     df_sorted_age = df_squad.sort_values(by="AvgAge_y", ascending=False)
 
-    fig_age = go.Figure()
-
-    for idx, row in df_sorted_age.iterrows():
-        fig_age.add_trace(
-            go.Scatter(
-                x=[row["MinAge"], row["MaxAge"]],
-                y=[row["Team"], row["Team"]],
-                mode="lines",
-                line=dict(color="lightgray", width=2),
-                showlegend=False,
-                hoverinfo="skip",
-            )
+    fig = go.Figure()
+
+    # All min-max bars as one segmented trace rather than one trace per team.
+    fig.add_trace(
+        figures.range_segments(
+            df_sorted_age["Team"],
+            df_sorted_age["MinAge"],
+            df_sorted_age["MaxAge"],
+            line=dict(color="lightgray", width=2),
+            showlegend=False,
+            hoverinfo="skip",
         )
+    )
 
-    fig_age.add_trace(
+    fig.add_trace(
         go.Scatter(
             x=df_sorted_age["MinAge"],
             y=df_sorted_age["Team"],
@@ -87,7 +101,7 @@ with col2:
         )
     )
 
-    fig_age.add_trace(
+    fig.add_trace(
         go.Scatter(
             x=df_sorted_age["MaxAge"],
             y=df_sorted_age["Team"],
@@ -97,7 +111,7 @@ with col2:
         )
     )
 
-    fig_age.add_trace(
+    fig.add_trace(
         go.Scatter(
             x=df_sorted_age["AvgAge_y"],
             y=df_sorted_age["Team"],
@@ -109,7 +123,7 @@ with col2:
         )
     )
 
-    fig_age.update_layout(
+    fig.update_layout(
         title="Squad Age Range (Min - Avg - Max)",
         xaxis_title="Age (Years)",
         yaxis=dict(title=None, automargin=True),
@@ -117,33 +131,55 @@ with col2:
         showlegend=True,
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
     )
+    return fig
+
 
+with col1:
+    st.subheader("Squad Value Score")
+    fig_val = figures.cached("squad.value", squad_version, squad_value_figure)
+    st.plotly_chart(fig_val, use_container_width=True)
+
+with col2:
+    st.subheader("Age Range & Average")
+
+    profiling.stage("age_range")
+    fig_age = figures.cached("squad.age_range", squad_version, age_range_figure)
     st.plotly_chart(fig_age, use_container_width=True)
 
 st.divider()
 
 st.header("Age Profile Distribution")
 
-df_age_melted = df_age.melt(
-    id_vars=["Team"],
-    value_vars=["YoungPlayers", "PrimePlayers", "ExperiencedPlayers"],
-    var_name="AgeGroup",
-    value_name="Count",
-)
+profiling.stage("age_profile")
+
+
+def age_profile_figure():
+    df_age_melted = df_age.melt(
+        id_vars=["Team"],
+        value_vars=["YoungPlayers", "PrimePlayers", "ExperiencedPlayers"],
+        var_name="AgeGroup",
+        value_name="Count",
+    )
 
-fig_stack = px.bar(
-    df_age_melted,
-    x="Team",
-    y="Count",
-    color="AgeGroup",
-    title="Player Age Distribution per Team",
-    color_discrete_map={
-        "YoungPlayers": "#66c2a5",
-        "PrimePlayers": "#fc8d62",
-        "ExperiencedPlayers": "#8da0cb",
-    },
+    fig = px.bar(
+        df_age_melted,
+        x="Team",
+        y="Count",
+        color="AgeGroup",
+        title="Player Age Distribution per Team",
+        color_discrete_map={
+            "YoungPlayers": "#66c2a5",
+            "PrimePlayers": "#fc8d62",
+            "ExperiencedPlayers": "#8da0cb",
+        },
+    )
+    fig.update_layout(xaxis_tickangle=-90)
+    return fig
+
+
+fig_stack = figures.cached(
+    "squad.age_profile", figures.dataset_version("age_profile"), age_profile_figure
 )
-fig_stack.update_layout(xaxis_tickangle=-90)
 st.plotly_chart(fig_stack, use_container_width=True)
 
 st.divider()
@@ -152,13 +188,18 @@ st.header("About Team")
 
 selected_team = st.selectbox("Select Team for Details", df_squad["Team"].unique())
 
+profiling.stage("team_details", team=selected_team)
 if selected_team:
     st.subheader(f"Top Key Players: {selected_team}")
-    team_players = (
-        df_players[df_players["Team"] == selected_team]
-        .sort_values(by="PlayerScore", ascending=False)
-        .head(5)
-    )
+
+    def top_five(team):
+        return (
+            df_players[df_players["Team"] == team]
+            .sort_values(by="PlayerScore", ascending=False)
+            .head(5)
+        )
+
+    team_players = top_five(selected_team)
 
     st.dataframe(
         team_players[
@@ -168,16 +209,25 @@ if selected_team:
         use_container_width=True,
     )
 
-    fig_players = px.bar(
-        team_players,
-        x="PlayerScore",
-        y="Player",
-        orientation="h",
-        title="Top 5 Players by Player Score",
-        color="PlayerScore",
-        text_auto=".1f",
+    def top_players_figure(team):
+        fig = px.bar(
+            top_five(team),
+            x="PlayerScore",
+            y="Player",
+            orientation="h",
+            title="Top 5 Players by Player Score",
+            color="PlayerScore",
+            text_auto=".1f",
+        )
+        fig.update_layout(yaxis={"categoryorder": "total ascending"})
+        return fig
+
+    fig_players = figures.cached(
+        "squad.top_players",
+        figures.dataset_version("top_players"),
+        top_players_figure,
+        team=selected_team,
     )
-    fig_players.update_layout(yaxis={"categoryorder": "total ascending"})
     st.plotly_chart(fig_players, use_container_width=True)
 
     team_stats = df_squad[df_squad["Team"] == selected_team].iloc[0]
@@ -188,5 +238,100 @@ if selected_team:
     m3.metric("xG", f"{team_stats.get('TotalxG', 0):.1f}")
     m4.metric("Unique Used Players", team_stats.get("UniquePlayers", 0))
 
+st.divider()
+
+st.header("Player Similarity")
+st.write(
+    "Players whose per-90 profile (shots, xG, chance creation, passing, carries and "
+    "defending) is closest to the chosen player's, among players with at least 270 minutes."
+)
+
+profiling.stage("similarity_index")
+player_index = get_player_index()
+scout_players = player_index.players
+team_top = df_players[df_players["Team"] == selected_team].sort_values(
+    "PlayerScore", ascending=False
+)["Player"]
+default_player = next((p for p in team_top if p in player_index.rows), scout_players[0])
+
+s1, s2, s3, s4 = st.columns([2, 1, 2, 1])
+scout_player = s1.selectbox(
+    "Player", scout_players, index=scout_players.index(default_player), key="scout_player"
+)
+scout_group = s2.selectbox("Position", ["Any"] + GROUPS, key="scout_group")
+age_bounds = (int(player_index.ages.min()), int(player_index.ages.max()))
+scout_ages = s3.slider("Age", *age_bounds, age_bounds, key="scout_ages")
+scout_k = s4.number_input("Results", 3, 25, 10, key="scout_k")
+
+profiling.stage("similarity_search", player=scout_player)
+similar = player_index.similar(
+    scout_player,
+    k=scout_k,
+    group=None if scout_group == "Any" else scout_group,
+    min_age=scout_ages[0],
+    max_age=scout_ages[1],
+)
+if similar.empty:
+    st.info("No players match these filters.")
+else:
+    st.dataframe(
+        similar[
+            [
+                "Similarity",
+                "Player",
+                "Team",
+                "Position",
+                "Age",
+                "Minutes",
+                "Expected Goals (xG) p90",
+                "Expected Assists (xAG) p90",
+                "Progressive Passes p90",
+                "Progressive Carries p90",
+                "Tackles p90",
+            ]
+        ].style.format(precision=2).format({"Age": "{:.0f}"}),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+    def profile_figure(player, matches):
+        rows = [player_index.find(player)] + [
+            player_index.find(p, t) for p, t in matches
+        ]
+        profiles = player_index.profiles(rows)
+        labels = [f.removesuffix(" p90") for f in profiles.index]
+        fig = go.Figure(
+            [
+                go.Scatterpolar(
+                    r=list(profiles.iloc[:, i]) + [profiles.iloc[0, i]],
+                    theta=labels + labels[:1],
+                    name=name,
+                    fill="toself" if i == 0 else None,
+                    opacity=1 if i == 0 else 0.7,
+                )
+                for i, name in enumerate(profiles.columns)
+            ]
+        )
+        fig.update_layout(
+            title="Per-90 Profile (standard deviations from the league mean)",
+            polar={"radialaxis": {"range": [-2.5, 4]}},
+            height=550,
+        )
+        return fig
+
+    st.plotly_chart(
+        figures.cached(
+            "squad.similarity_profile",
+            figures.dataset_version("players_clean"),
+            profile_figure,
+            player=scout_player,
+            matches=list(zip(similar["Player"].head(3), similar["Team"].head(3))),
+        ),
+        use_container_width=True,
+    )
+
+profiling.stage("raw_data")
 with st.expander("View Raw Squad Data"):
     st.dataframe(df_squad)
+
+profiling.finish_rerun()
@@ -1,42 +1,26 @@
 import streamlit as st
 import pandas as pd
-import joblib
+import plotly.graph_objects as go
+from laliga import figures, profiling
+from laliga.explanations import team_explanation
+from laliga.features import features_version, load_features
+from laliga.models import get_model
+from laliga.sensitivity import feature_range, response_surface
 
 st.set_page_config(page_title="Predictions", layout="wide")
+profiling.start_rerun("Predictions")
 st.title("Model Predictions")
 st.markdown(
     "Predict a team's **Target Score** based on their performance, financial, and squad metrics using a trained Random Forest model."
 )
 
-MODEL_PATH = "Analysis/src/laliga_rf_model.pkl"
-DATASETS_DIR = "Analysis/CleanedDatasets"
+profiling.stage("load")
+model_data = get_model("investment")
 
-model_data = joblib.load(MODEL_PATH)
+df_data = load_features()
 
-perf_metrics = pd.read_csv(f"{DATASETS_DIR}/Analysis/performance_metrics.csv")
-xg_metrics = pd.read_csv(f"{DATASETS_DIR}/Analysis/xg_metrics.csv")
-squad_scores = pd.read_csv(f"{DATASETS_DIR}/SquadAnalysis/squad_value_scores.csv")
-financial_scores = pd.read_csv(f"{DATASETS_DIR}/Financial/attendance_metrics.csv")
-
-df_data = pd.merge(perf_metrics, squad_scores, on="Team", how="left")
-df_data = pd.merge(df_data, financial_scores, on="Team", how="left")
-df_data = pd.merge(df_data, xg_metrics, on="Team", how="left")
-
-model = model_data
-input_features = [
-    "AvgLeaguePosition",
-    "GoalDifference",
-    "xGDifference",
-    "PointsPerGame",
-    "WinRate",
-    "SquadValueScore",
-    "AvgAttendance",
-    "AvgAge_x",
-]
-
-if isinstance(model_data, dict):
-    model = model_data.get("model")
-    input_features = model_data.get("features", input_features)
+model = model_data.model
+input_features = model_data.features
 
 st.sidebar.header("Prediction Inputs")
 mode = st.sidebar.radio("Mode", ["Existing Team", "Custom Team"])
@@ -45,6 +29,7 @@ if mode == "Existing Team":
     teams = df_data["Team"].unique()
     selected_team = st.sidebar.selectbox("Select Team", teams)
 
+    profiling.stage("predict", team=selected_team)
     team_data = df_data[df_data["Team"] == selected_team].iloc[0]
 
     st.subheader(f"Current Stats for {selected_team}")
@@ -62,6 +47,26 @@ if mode == "Existing Team":
     st.metric("Score", f"{prediction:.2f}")
     st.info("More the score, better the overall team investment prediction.")
 
+    profiling.stage("explanation", team=selected_team)
+    st.subheader("Why this score?")
+    st.caption(
+        "How far each feature moves this team's score from the model's average "
+        "prediction (TreeSHAP)."
+    )
+
+    def explanation_figure(team):
+        base, score, contributions, inputs = team_explanation("investment", team)
+        return figures.waterfall(base, score, contributions, inputs, title=team)
+
+    fig_explain = figures.cached(
+        "predictions.explanation",
+        (model_data.version, features_version()),
+        explanation_figure,
+        team=selected_team,
+    )
+    st.plotly_chart(fig_explain, use_container_width=True)
+
+    profiling.stage("what_if", team=selected_team)
     st.divider()
     st.markdown(f"Adjust values to see how the score changes for **{selected_team}**.")
 
@@ -108,7 +113,80 @@ if mode == "Existing Team":
         delta=f"{new_pred - prediction:.2f}",
     )
 
+    st.divider()
+    st.subheader("Sensitivity Surface")
+    st.markdown(
+        f"Predicted score for **{selected_team}** across a grid of two features, "
+        "with every other feature held at the team's current value."
+    )
+
+    col_x, col_y, col_n = st.columns(3)
+    x_feature = col_x.selectbox(
+        "X Feature", input_features, index=input_features.index("SquadValueScore")
+    )
+    y_options = [f for f in input_features if f != x_feature]
+    y_feature = col_y.selectbox(
+        "Y Feature",
+        y_options,
+        index=y_options.index("WinRate") if "WinRate" in y_options else 0,
+    )
+    resolution = col_n.slider("Grid Resolution", 20, 150, 100, step=10)
+
+    profiling.stage("surface", x=x_feature, y=y_feature, resolution=resolution)
+    surface = response_surface(
+        model_data,
+        selected_team,
+        input_data,
+        x_feature,
+        y_feature,
+        feature_range(df_data[x_feature], x_feature),
+        feature_range(df_data[y_feature], y_feature),
+        n=resolution,
+    )
+
+    profiling.stage("surface_figure", resolution=resolution)
+
+    def surface_figure(team, x_feature, y_feature, resolution):
+        fig = go.Figure(
+            go.Contour(
+                x=surface.x,
+                y=surface.y,
+                z=surface.z,
+                colorscale="Viridis",
+                colorbar=dict(title="Score"),
+                contours=dict(showlabels=True),
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=[input_data[x_feature]],
+                y=[input_data[y_feature]],
+                mode="markers",
+                marker=dict(color="white", size=12, line=dict(color="black", width=2)),
+                name=team,
+            )
+        )
+        fig.update_layout(
+            title=f"Predicted Score: {x_feature} vs {y_feature}",
+            xaxis_title=x_feature,
+            yaxis_title=y_feature,
+            height=550,
+        )
+        return fig
+
+    fig_surface = figures.cached(
+        "predictions.surface",
+        (model_data.version, features_version()),
+        surface_figure,
+        team=selected_team,
+        x_feature=x_feature,
+        y_feature=y_feature,
+        resolution=resolution,
+    )
+    st.plotly_chart(fig_surface, use_container_width=True)
+
 elif mode == "Custom Team":
+    profiling.stage("custom_team")
     st.subheader("Custom Team Prediction")
 
     col1, col2 = st.columns(2)
@@ -139,3 +217,5 @@ elif mode == "Custom Team":
     if st.button("Predict"):
         pred = model.predict(pd.DataFrame([custom_input]))[0]
         st.success(f"Predicted Target Score: **{pred:.2f}**")
+
+profiling.finish_rerun()
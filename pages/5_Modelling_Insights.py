@@ -1,35 +1,42 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import joblib
-import pickle
-from sklearn.metrics import r2_score
+from laliga import figures, profiling
+from laliga.data import load
+from laliga.elo import expected_score, rating_history
+from laliga.explanations import team_explanation
+from laliga.features import features_version, load_features
+from laliga.h2h import get_index as get_h2h_index
+from laliga.matchups import get_matchups
+from laliga.models import get_model, r2_score
+from laliga.scoring import recommendation
+from laliga.simulation import cached_simulate
 
 st.set_page_config(page_title="Modelling Insights", layout="wide")
+profiling.start_rerun("Modelling Insights")
 st.title("Future Predictions")
 
-BASE_PATH = "Analysis/CleanedDatasets"
-MODEL_PATH = "Analysis/src/laliga_rf_model.pkl"
-SPORTING_MODEL_PATH = "Analysis/src/sporting_rf_model.pkl"
-
-perf = pd.read_csv(f"{BASE_PATH}/Analysis/performance_metrics.csv")
-squad = pd.read_csv(f"{BASE_PATH}/SquadAnalysis/squad_value_scores.csv")
-fin = pd.read_csv(f"{BASE_PATH}/Financial/financial_scores.csv")
-xg = pd.read_csv(f"{BASE_PATH}/Analysis/xg_metrics.csv")
-
-df = perf.merge(
-    squad[
-        [ "Team","SquadValueScore","AvgAge_x","TotalPlayers","YoungPlayers","PrimePlayers","ExperiencedPlayers",]
-    ],
-    on="Team",
-    how="left",
+profiling.stage("load")
+df = load_features()
+
+investment_model_data = get_model("investment")
+sporting_model_data = get_model("sporting")
+model_version = (
+    investment_model_data.version,
+    sporting_model_data.version,
+    features_version(),
 )
-df = df.merge(fin[["Team", "AvgAttendance", "FinancialScore"]], on="Team", how="left")
-df = df.merge(xg[["Team", "AvgxG", "xGDifference"]], on="Team", how="left")
 
-investment_model_data = joblib.load(MODEL_PATH)
-with open(SPORTING_MODEL_PATH, "rb") as f:
-    sporting_model_data = pickle.load(f)
+
+def explanation_figure(model, team):
+    base, prediction, contributions, inputs = team_explanation(model, team)
+    label = "Investment Score" if model == "investment" else "Sporting Strength"
+    fmt = ".2f" if model == "investment" else ".3f"
+    return figures.waterfall(
+        base, prediction, contributions, inputs, title=f"{team}: {label}", fmt=fmt
+    )
+
+
 tab1, tab2 = st.tabs(["Investment Analysis", "Sporting Performance & Predictions"])
 with tab1:
     st.header("Investment Recommendation Engine")
@@ -40,12 +47,14 @@ with tab1:
         """
     )
 
-    model = investment_model_data["model"]
-    model_features = investment_model_data["features"]
+    model = investment_model_data.model
+    model_features = investment_model_data.features
 
+    profiling.stage("investment_predict")
     X_invest = df[model_features].copy()
     df["InvestmentScore"] = model.predict(X_invest)
 
+    profiling.stage("investment_charts")
     investment_rankings = df.sort_values(
         "InvestmentScore", ascending=False
     ).reset_index(drop=True)
@@ -63,48 +72,69 @@ with tab1:
         f"{investment_rankings['InvestmentScore'].median():.1f}",
     )
     col3.metric(
-        "Model Confidence (R²)", f"{investment_model_data['metrics']['test_r2']:.3f}"
+        "Model Confidence (R²)", f"{investment_model_data.metrics['test_r2']:.3f}"
     )
 
     st.subheader("Top 10 Investment Opportunities")
 
-    def get_color(rank):
-        if rank <= 3:
-            return "Strong Buy"
-        if rank <= 7:
-            return "Moderate Buy"
-        return "High Risk / Hold"
-
-    investment_rankings["Recommendation"] = investment_rankings["Rank"].apply(get_color)
-
-    fig_invest = px.bar(
-        investment_rankings.head(10),
-        x="InvestmentScore",
-        y="Team",
-        orientation="h",
-        color="Recommendation",
-        color_discrete_map={
-            "Strong Buy": "#00CC96",
-            "Moderate Buy": "#636EFA",
-            "High Risk / Hold": "#EF553B",
-        },
-        text_auto=".1f",
-        title="Investment Scores (Top 10)",
-    )
+    investment_rankings["Recommendation"] = investment_rankings["Rank"].apply(recommendation)
+
+    def investment_figure():
+        return px.bar(
+            investment_rankings.head(10),
+            x="InvestmentScore",
+            y="Team",
+            orientation="h",
+            color="Recommendation",
+            color_discrete_map={
+                "Strong Buy": "#00CC96",
+                "Moderate Buy": "#636EFA",
+                "High Risk / Hold": "#EF553B",
+            },
+            text_auto=".1f",
+            title="Investment Scores (Top 10)",
+        )
+
+    fig_invest = figures.cached("modelling.investment", model_version, investment_figure)
     st.plotly_chart(fig_invest, use_container_width=True)
 
     st.subheader("Basis of Investment ?")
-    fi_data = pd.DataFrame(investment_model_data["feature_importance"])
-    fi_data = fi_data.sort_values("Importance", ascending=True)
-    fig_fi = px.bar(
-        fi_data,
-        x="Importance",
-        y="Feature",
-        orientation="h",
+
+    def importance_figure(model, title):
+        artifact = investment_model_data if model == "investment" else sporting_model_data
+        return px.bar(
+            artifact.feature_importance.sort_values("Importance", ascending=True),
+            x="Importance",
+            y="Feature",
+            orientation="h",
+            title=title,
+        )
+
+    fig_fi = figures.cached(
+        "modelling.importance",
+        model_version,
+        importance_figure,
+        model="investment",
         title="Investment Model: Feature Importance",
     )
     st.plotly_chart(fig_fi, use_container_width=True)
 
+    profiling.stage("investment_explanation")
+    st.subheader("Why this score?")
+    explain_team = st.selectbox(
+        "Team", investment_rankings["Team"], index=0, key="explain_investment"
+    )
+    st.plotly_chart(
+        figures.cached(
+            "modelling.explanation",
+            model_version,
+            explanation_figure,
+            model="investment",
+            team=explain_team,
+        ),
+        use_container_width=True,
+    )
+
 
 with tab2:
     st.header("Sporting Performance Predictor")
@@ -114,10 +144,11 @@ with tab2:
         """
     )
 
-    sporting_model = sporting_model_data["model"]
-    sporting_features = sporting_model_data["features"]
+    sporting_model = sporting_model_data.model
+    sporting_features = sporting_model_data.features
 
-    X_sport = df[sporting_features].fillna(0)
+    profiling.stage("sporting_predict")
+    X_sport = df[sporting_features].copy()
     y_sport = df["WinRate"] if "WinRate" in df.columns else None
 
     df["Sportingstrength"] = sporting_model.predict(X_sport)
@@ -126,25 +157,38 @@ with tab2:
         r2_score(y_sport, df["Sportingstrength"]) if y_sport is not None else None
     )
 
+    profiling.stage("sporting_charts")
     col1, col2 = st.columns(2)
     col1.metric("Sporting Model Accuracy (R²)", f"{sport_r2:.3f}")
 
-    fi_sport = pd.DataFrame(
-        {
-            "Feature": sporting_features,
-            "Importance": sporting_model.feature_importances_,
-        }
-    ).sort_values("Importance", ascending=True)
-
-    fig_sport_fi = px.bar(
-        fi_sport,
-        x="Importance",
-        y="Feature",
-        orientation="h",
+    fig_sport_fi = figures.cached(
+        "modelling.importance",
+        model_version,
+        importance_figure,
+        model="sporting",
         title="Sporting Model: Feature Importance",
     )
     col2.plotly_chart(fig_sport_fi, use_container_width=True)
 
+    profiling.stage("sporting_explanation")
+    st.write("#### Why this strength?")
+    explain_team = st.selectbox(
+        "Team",
+        df.sort_values("Sportingstrength", ascending=False)["Team"],
+        index=0,
+        key="explain_sporting",
+    )
+    st.plotly_chart(
+        figures.cached(
+            "modelling.explanation",
+            model_version,
+            explanation_figure,
+            model="sporting",
+            team=explain_team,
+        ),
+        use_container_width=True,
+    )
+
     st.divider()
     st.subheader("Next Match Prediction")
     st.write(
@@ -159,39 +203,102 @@ with tab2:
         "Select Opponent (Away)", df["Team"].unique(), index=1
     )
 
+    profiling.stage("next_match", home=home_team, away=away_team)
+    matchups = get_matchups()
+
     if home_team != away_team:
-        home_strength = df.loc[df["Team"] == home_team, "Sportingstrength"].values[0]
-        away_strength = df.loc[df["Team"] == away_team, "Sportingstrength"].values[0]
         # Log5 Probability
-        denom = home_strength * (1 - away_strength) + away_strength * (
-            1 - home_strength
-        )
-        win_prob_home = (
-            (home_strength * (1 - away_strength)) / denom if denom != 0 else 0.5
-        )
+        win_prob_home = matchups.log5_home_win(home_team, away_team)
 
         st.write("### Predicted Outcome")
-        prob_data = pd.DataFrame(
-            {
-                "Result": [f"{home_team} Win", f"{away_team} Win"],
-                "Probability": [win_prob_home, 1 - win_prob_home],
-            }
-        )
+        def match_figure(home, away):
+            prob_data = pd.DataFrame(
+                {
+                    "Result": [f"{home} Win", f"{away} Win"],
+                    "Probability": [win_prob_home, 1 - win_prob_home],
+                }
+            )
+            return px.pie(
+                prob_data,
+                names="Result",
+                values="Probability",
+                color="Result",
+                color_discrete_map={
+                    f"{home} Win": "#636EFA",
+                    f"{away} Win": "#EF553B",
+                },
+                hole=0.4,
+            )
 
-        fig_match = px.pie(
-            prob_data,
-            names="Result",
-            values="Probability",
-            color="Result",
-            color_discrete_map={
-                f"{home_team} Win": "#636EFA",
-                f"{away_team} Win": "#EF553B",
-            },
-            hole=0.4,
+        fig_match = figures.cached(
+            "modelling.match", model_version, match_figure, home=home_team, away=away_team
         )
         st.plotly_chart(fig_match, use_container_width=True)
 
-        st.write("#### Head-to-Head Stats Comparison")
+        p_home, p_draw, p_away = matchups.outcome(home_team, away_team)
+        st.caption("With home advantage and draws modelled:")
+        m1, m2, m3 = st.columns(3)
+        m1.metric(f"{home_team} Win", f"{p_home:.1%}")
+        m2.metric("Draw", f"{p_draw:.1%}")
+        m3.metric(f"{away_team} Win", f"{p_away:.1%}")
+
+        st.write("#### Elo Ratings")
+        ratings = load("elo_ratings").set_index("Team")["Elo"]
+        if home_team in ratings.index and away_team in ratings.index:
+            e1, e2, e3 = st.columns(3)
+            e1.metric(f"{home_team} Elo", f"{ratings[home_team]:.0f}")
+            e2.metric(f"{away_team} Elo", f"{ratings[away_team]:.0f}")
+            e3.metric(
+                f"{home_team} Expected Score",
+                f"{expected_score(ratings[home_team], ratings[away_team]):.2f}",
+            )
+            st.caption(
+                "Ratings replay every league match since 1995-96, with home advantage and "
+                "larger moves for wider margins. Expected score counts a draw as half a win."
+            )
+
+            def elo_figure(home, away):
+                return figures.grouped_lines(
+                    rating_history([home, away]),
+                    x="Date",
+                    y="EloAfter",
+                    group="Team",
+                    title="Elo Rating History",
+                )
+
+            st.plotly_chart(
+                figures.cached(
+                    "modelling.elo",
+                    figures.dataset_version("elo_history"),
+                    elo_figure,
+                    home=home_team,
+                    away=away_team,
+                ),
+                use_container_width=True,
+            )
+
+        st.write("#### Head-to-Head Record")
+        h2h = get_h2h_index()
+        first_season, last_season = st.select_slider(
+            "Seasons",
+            options=h2h.seasons,
+            value=(h2h.seasons[0], h2h.seasons[-1]),
+            key="h2h_seasons",
+        )
+        if home_team in h2h.index and away_team in h2h.index:
+            record = h2h.pair(home_team, away_team, first_season, last_season)
+            st.caption(
+                f"{home_team}'s results against {away_team}, {first_season} to "
+                f"{last_season}. Home rows are games at {home_team}'s ground; xG per "
+                "match counts only matches with xG data."
+            )
+            st.dataframe(
+                record.style.format(precision=2, na_rep="-"), use_container_width=True
+            )
+        else:
+            st.info("No head-to-head matches recorded for this pair.")
+
+        st.write("#### Season Stats Comparison")
         h2h_data = (
             df[df["Team"].isin([home_team, away_team])].set_index("Team").transpose()
         )
@@ -200,3 +307,77 @@ with tab2:
         )
     else:
         st.warning("Please select different teams.")
+
+    st.download_button(
+        "Download All-Pairs Probability Table",
+        matchups.to_frame().to_csv(index=False),
+        file_name="match_probabilities.csv",
+        mime="text/csv",
+    )
+
+    profiling.stage("simulation_inputs")
+    st.divider()
+    st.subheader("Season Simulation")
+    st.write(
+        "Play out the remaining fixtures of the current season many times using "
+        "Sporting Strength, home advantage and the league draw rate."
+    )
+
+    n_sims = st.select_slider(
+        "Number of Simulations",
+        options=[10_000, 50_000, 100_000, 200_000],
+        value=100_000,
+    )
+    if st.button("Run Simulation"):
+        st.session_state["season_sim"] = True
+
+    if st.session_state.get("season_sim"):
+        profiling.stage("season_simulation", n_sims=n_sims)
+        sim = cached_simulate(n_sims=n_sims)
+        sim_table = sim.summary()
+        st.caption(
+            f"{sim.n_sims:,} simulations of {len(sim.fixtures)} remaining "
+            f"{sim.season} fixtures."
+        )
+
+        def simulation_figure(n_sims):
+            fig = px.bar(
+                sim_table.melt(
+                    id_vars="Team",
+                    value_vars=["Title", "Top4", "Relegation"],
+                    var_name="Outcome",
+                    value_name="Probability",
+                ),
+                x="Team",
+                y="Probability",
+                color="Outcome",
+                barmode="group",
+                title="Title, Top 4 and Relegation Probabilities",
+            )
+            fig.update_layout(xaxis_tickangle=-90)
+            return fig
+
+        fig_sim = figures.cached(
+            "modelling.simulation",
+            sim.version,
+            simulation_figure,
+            n_sims=n_sims,
+        )
+        st.plotly_chart(fig_sim, use_container_width=True)
+
+        st.dataframe(
+            sim_table.style.format(
+                {
+                    "Title": "{:.1%}",
+                    "Top4": "{:.1%}",
+                    "Relegation": "{:.1%}",
+                    "ExpectedPoints": "{:.1f}",
+                    "PointsStd": "{:.1f}",
+                    "ExpectedPosition": "{:.1f}",
+                }
+            ),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+profiling.finish_rerun()
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from laliga.data import write_dataset
+
+
+def test_unchanged_rewrite_is_byte_identical(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text("Team,TotalxG,MinAge\nA,22.300000000000004,19\nB,0.1,\n")
+    df = pd.DataFrame({"Team": ["A", "B"], "TotalxG": [22.3, 0.1], "MinAge": [19.0, None]})
+    before = path.read_bytes()
+    assert not write_dataset(path, df)
+    assert path.read_bytes() == before
+
+
+def test_whole_floats_keep_integer_columns(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text("Team,MinAge\nA,19\nB,18\n")
+    assert not write_dataset(path, pd.DataFrame({"Team": ["A", "B"], "MinAge": [19.0, 18.0]}))
+
+
+def test_real_changes_are_written(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text("Team,TotalxG\nA,22.300000000000004\nB,0.1\n")
+    assert write_dataset(path, pd.DataFrame({"Team": ["A", "B"], "TotalxG": [22.3, 0.2]}))
+    assert path.read_text() == "Team,TotalxG\nA,22.300000000000004\nB,0.2\n"
+    assert write_dataset(path, pd.DataFrame({"Team": ["A"], "TotalxG": [1.5]}))
+    assert path.read_text() == "Team,TotalxG\nA,1.5\n"
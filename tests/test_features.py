@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from laliga import features
+from laliga.data import dataset_path, file_digest
+
+
+def test_moved_timestamps_are_hashed_once(monkeypatch, tmp_path):
+    path = dataset_path("xg_metrics")
+    st = path.stat()
+    hashed = []
+    monkeypatch.setattr(features, "file_digest", lambda p: hashed.append(p) or file_digest(p))
+    stamps = tmp_path / "feature_stamps.json"
+    try:
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        assert not features.is_stale(stamps_path=stamps)
+        assert path in hashed
+        hashed.clear()
+        assert not features.is_stale(stamps_path=stamps)
+        assert hashed == []
+    finally:
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def test_pages_never_rebuild(monkeypatch):
+    monkeypatch.setattr(features, "is_stale", lambda *a, **k: True)
+    monkeypatch.setattr(features, "build", lambda *a, **k: pytest.fail("rebuilt"))
+    assert len(features.load_features())
@@ -0,0 +1,83 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from laliga import forest
+from laliga.features import load_features
+from laliga.models import MODELS, MODELS_DIR
+
+
+def _walk(model):
+    walker = copy.copy(model)
+    walker.tables = None
+    return walker
+
+
+def _with_gaps(X, rate, seed):
+    X = X.copy()
+    rng = np.random.default_rng(seed)
+    X[rng.random(X.shape) < rate] = np.nan
+    return X
+
+
+@pytest.fixture(scope="module")
+def trained():
+    """A forest trained on data with gaps, so NaN goes left at some splits, right at others."""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 5))
+    y = X[:, 0] * 3 + np.where(np.isnan(X[:, 1]), 5.0, X[:, 1]) + rng.normal(size=400)
+    X = _with_gaps(X, 0.15, 1)
+    model = RandomForestRegressor(n_estimators=20, max_leaf_nodes=40, random_state=0)
+    return model.fit(pd.DataFrame(X, columns=list("abcde")), y)
+
+
+def test_missing_directions_are_learned(trained):
+    directions = np.concatenate(
+        [est.tree_.missing_go_to_left[est.tree_.children_left >= 0] for est in trained.estimators_]
+    )
+    assert directions.any() and not directions.all()
+
+
+def test_predict_matches_sklearn_with_missing_values(trained):
+    array = forest.ArrayForest.from_sklearn(trained)
+    assert array.tables is not None
+    X = pd.DataFrame(_with_gaps(np.random.default_rng(2).normal(size=(300, 5)), 0.3, 3))
+    X.columns = list("abcde")
+    expected = trained.predict(X)
+    np.testing.assert_array_equal(array.predict(X), expected)
+    np.testing.assert_array_equal(_walk(array).predict(X), expected)
+
+
+def test_export_round_trip(trained, tmp_path):
+    path = forest.export({"model": trained}, tmp_path / "model.npz", name="toy")
+    loaded, meta = forest.load(path)
+    assert meta["format"] == forest.FORMAT_VERSION
+    X = pd.DataFrame(_with_gaps(np.random.default_rng(4).normal(size=(50, 5)), 0.5, 5))
+    X.columns = list("abcde")
+    np.testing.assert_array_equal(loaded.predict(X), trained.predict(X))
+
+
+def test_deep_trees_fall_back_to_the_level_walk():
+    rng = np.random.default_rng(6)
+    X = _with_gaps(rng.normal(size=(600, 3)), 0.1, 7)
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, rng.normal(size=600))
+    array = forest.ArrayForest.from_sklearn(model)
+    assert array.tables is None
+    rows = _with_gaps(rng.normal(size=(200, 3)), 0.3, 8)
+    np.testing.assert_array_equal(array.predict(rows), model.predict(rows))
+
+
+@pytest.mark.parametrize("name", list(MODELS))
+def test_exports_match_pickles_on_team_rows(name):
+    joblib = pytest.importorskip("joblib")
+    payload = joblib.load(MODELS_DIR / MODELS[name])
+    model = payload["model"] if isinstance(payload, dict) else payload
+    array, _ = forest.load(forest.array_path(MODELS_DIR / MODELS[name]))
+    X = load_features()[list(array.feature_names_in_)]
+    assert X.isna().any(axis=1).any()
+    expected = model.predict(X)
+    np.testing.assert_array_equal(array.predict(X), expected)
+    np.testing.assert_array_equal(_walk(array).predict(X), expected)
@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from laliga import cleaning, incremental
+from laliga.data import DATASETS_DIR, RAW_DIR, load
+
+
+@pytest.fixture
+def restore_datasets():
+    """Put back any cleaned file the test rewrites, so a failure cannot corrupt the tree."""
+    before = {p: p.read_bytes() for p in DATASETS_DIR.rglob("*") if p.is_file()}
+    yield
+    for path in DATASETS_DIR.rglob("*"):
+        if path.is_file() and path not in before:
+            path.unlink()
+    for path, data in before.items():
+        if not path.exists() or path.read_bytes() != data:
+            path.write_bytes(data)
+
+
+def test_cleaning_resets_a_stale_watermark(restore_datasets):
+    matches = load("matches_5y").sort_values("Date", kind="stable")
+    detailed = load("matches_detailed").sort_values("date", kind="stable")
+    cut = matches["Date"].iloc[-40]
+    incremental.IncrementalState.from_cleaned(
+        matches[matches["Date"] < cut], detailed[detailed["date"] < cut]
+    ).save()
+
+    cleaning.build()
+    assert incremental.ingest(
+        pd.read_csv(RAW_DIR / "LaLiga_Matches.csv"), pd.read_csv(RAW_DIR / "matches_laliga.csv")
+    ) == (0, 0)
+    assert len(load("matches_5y")) == len(matches)
+    assert len(load("matches_detailed")) == len(detailed)
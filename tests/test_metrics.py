@@ -0,0 +1,29 @@
+import pytest
+
+from laliga import metrics
+from laliga.data import diff_against_disk, load
+
+TABLES = [
+    "league_positions",
+    "performance_metrics",
+    "xg_metrics",
+    "home_away_metrics",
+    "h2h_details",
+    "h2h_metrics",
+    "team_performance_summary",
+]
+
+
+@pytest.fixture(scope="module")
+def tables():
+    return metrics.compute_all(load("matches_5y"), load("matches_detailed"))
+
+
+def test_every_analysis_table_is_built(tables):
+    assert sorted(tables) == sorted(TABLES)
+
+
+@pytest.mark.parametrize("name", TABLES)
+def test_matches_committed_csv(tables, name):
+    failures = diff_against_disk({name: tables[name]})
+    assert not failures, failures[0][1]